@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+from openhands_server.utils.metrics import Histogram, HistogramInfo
+
+T = TypeVar("T")
+
+
+class ExecutorLaneStats(BaseModel):
+    workers: int
+    # Calls running, and calls waiting for a worker
+    active: int
+    queued: int
+    # Time calls spent waiting for a worker, in seconds
+    queue_wait: HistogramInfo
+
+
+@dataclass
+class ExecutorLane:
+    """A thread pool with queue wait metrics"""
+
+    name: str
+    max_workers: int
+    _executor: ThreadPoolExecutor | None = field(default=None, init=False)
+    _active: int = field(default=0, init=False)
+    _queued: int = field(default=0, init=False)
+    _queue_wait: Histogram = field(default_factory=Histogram, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=f"conversation-{self.name}",
+            )
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+        dequeued = False
+
+        def dequeue() -> bool:
+            # Called with the lock held, so a call leaves the queue exactly once
+            nonlocal dequeued
+            if dequeued:
+                return False
+            dequeued = True
+            self._queued -= 1
+            return True
+
+        def call():
+            # Runs in the worker thread
+            with self._lock:
+                dequeue()
+                self._active += 1
+                self._queue_wait.observe(time.perf_counter() - submitted_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, call)
+        finally:
+            # A call cancelled (Or rejected on shutdown) before it started never runs
+            with self._lock:
+                dequeue()
+
+    def get_stats(self) -> ExecutorLaneStats:
+        with self._lock:
+            return ExecutorLaneStats(
+                workers=self.max_workers,
+                active=self._active,
+                queued=self._queued,
+                queue_wait=self._queue_wait.get_info(),
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+@dataclass
+class LanedConversationExecutor:
+    """
+    Threads for running agent conversations, kept apart from the default executor so that
+    long running conversations cannot starve other blocking work. Run loops, which last as
+    long as the agent is working, and short control operations (pause, send_message, close)
+    have separate lanes, so control operations are not stuck behind busy run loops. If the run
+    lane is full, new conversations wait for a worker - queue wait shows when this happens.
+    """
+
+    run_workers: int = 16
+    control_workers: int = 4
+    _run_lane: ExecutorLane = field(init=False)
+    _control_lane: ExecutorLane = field(init=False)
+
+    def __post_init__(self):
+        self._run_lane = ExecutorLane("run", self.run_workers)
+        self._control_lane = ExecutorLane("control", self.control_workers)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a conversation loop"""
+        return await self._run_lane.run(fn, *args, **kwargs)
+
+    async def control(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a short control operation"""
+        return await self._control_lane.run(fn, *args, **kwargs)
+
+    def get_stats(self) -> dict[str, ExecutorLaneStats]:
+        return {
+            "run": self._run_lane.get_stats(),
+            "control": self._control_lane.get_stats(),
+        }
+
+    def shutdown(self):
+        self._run_lane.shutdown()
+        self._control_lane.shutdown()
+
+
+_conversation_executor = None
+
+
+def get_default_conversation_executor() -> LanedConversationExecutor:
+    global _conversation_executor
+    if _conversation_executor:
+        return _conversation_executor
+    _conversation_executor = LanedConversationExecutor()
+    return _conversation_executor
@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy import (
+    DateTime,
+    Engine,
+    Float,
+    Index,
+    String,
+    Text,
+    create_engine,
+    delete,
+    func,
+    inspect,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from openhands_server.local_conversation.model import (
+    ConversationSortOrder,
+    StoredLocalConversation,
+)
+from openhands_server.utils.page_cursor import PageCursor
+
+logger = logging.getLogger(__name__)
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _ConversationRecord(_Base):
+    __tablename__ = "conversation"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    title: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Naive UTC, as sqlite does not store time zones
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
+    # The full stored conversation, so that searches do not read meta files
+    meta_json: Mapped[str] = mapped_column(Text)
+    # When the row was written (Seconds since the epoch). Meta files modified after this are
+    # read again on reconcile
+    indexed_at: Mapped[float] = mapped_column(Float)
+
+    __table_args__ = (
+        Index("ix_conversation_created_at_id", "created_at", "id"),
+        Index("ix_conversation_updated_at_id", "updated_at", "id"),
+    )
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+@dataclass
+class ConversationIndex:
+    """
+    SQLite index of conversation metadata, supporting sorted, filtered and keyset paginated
+    queries. The meta.json file of each conversation remains the source of truth - the index
+    may be deleted at any time and rebuilt from them, and is reconciled with them on startup.
+    """
+
+    db_path: Path
+    _engine: Engine = field(init=False)
+
+    def __post_init__(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._engine = create_engine(f"sqlite:///{self.db_path}")
+        _Base.metadata.create_all(self._engine)
+        columns = inspect(self._engine).get_columns(_ConversationRecord.__tablename__)
+        if "indexed_at" not in {column["name"] for column in columns}:
+            # Written by an older version. The index is derived from the meta files, so it is
+            # recreated rather than migrated, and repopulated by the next reconcile
+            _Base.metadata.drop_all(self._engine)
+            _Base.metadata.create_all(self._engine)
+
+    # Writes
+
+    def _upsert(self, conversations: list[StoredLocalConversation]):
+        if not conversations:
+            return
+        indexed_at = time.time()
+        values = [
+            {
+                "id": conversation.id.hex,
+                "title": conversation.title,
+                "created_at": _naive_utc(conversation.created_at),
+                "updated_at": _naive_utc(conversation.updated_at),
+                "meta_json": conversation.model_dump_json(),
+                "indexed_at": indexed_at,
+            }
+            for conversation in conversations
+        ]
+        statement = insert(_ConversationRecord)
+        statement = statement.on_conflict_do_update(
+            index_elements=[_ConversationRecord.id],
+            set_={
+                "title": statement.excluded.title,
+                "created_at": statement.excluded.created_at,
+                "updated_at": statement.excluded.updated_at,
+                "meta_json": statement.excluded.meta_json,
+                "indexed_at": statement.excluded.indexed_at,
+            },
+        )
+        with Session(self._engine) as session, session.begin():
+            session.execute(statement, values)
+
+    async def upsert(self, conversation: StoredLocalConversation):
+        await asyncio.to_thread(self._upsert, [conversation])
+
+    def _remove(self, conversation_id: UUID):
+        with Session(self._engine) as session, session.begin():
+            session.execute(
+                delete(_ConversationRecord).where(
+                    _ConversationRecord.id == conversation_id.hex
+                )
+            )
+
+    async def remove(self, conversation_id: UUID):
+        await asyncio.to_thread(self._remove, conversation_id)
+
+    def _read_meta_file(self, meta_file: Path) -> StoredLocalConversation | None:
+        try:
+            return StoredLocalConversation.model_validate_json(meta_file.read_text())
+        except Exception:
+            logger.exception(f"error_reading_conversation:{meta_file.parent}")
+            return None
+
+    def _read_meta_files(self, file_store_path: Path) -> list[StoredLocalConversation]:
+        conversations = []
+        if file_store_path.exists():
+            for conversation_dir in file_store_path.iterdir():
+                meta_file = conversation_dir / "meta.json"
+                if not meta_file.is_file():
+                    continue
+                conversation = self._read_meta_file(meta_file)
+                if conversation:
+                    conversations.append(conversation)
+        return conversations
+
+    def _rebuild(self, file_store_path: Path) -> int:
+        conversations = self._read_meta_files(file_store_path)
+        with Session(self._engine) as session, session.begin():
+            session.execute(delete(_ConversationRecord))
+        self._upsert(conversations)
+        return len(conversations)
+
+    async def rebuild(self, file_store_path: Path) -> int:
+        """Replace the content of the index with the meta files under the path given, returning
+        the number of conversations indexed"""
+        return await asyncio.to_thread(self._rebuild, file_store_path)
+
+    def _reconcile(self, file_store_path: Path) -> int:
+        with Session(self._engine) as session:
+            indexed = dict(
+                session.execute(
+                    select(_ConversationRecord.id, _ConversationRecord.indexed_at)
+                ).all()
+            )
+        # Only meta files modified since their row was written are read
+        changed = []
+        if file_store_path.exists():
+            for conversation_dir in file_store_path.iterdir():
+                meta_file = conversation_dir / "meta.json"
+                try:
+                    modified_at = meta_file.stat().st_mtime
+                except OSError:
+                    continue
+                indexed_at = indexed.pop(conversation_dir.name, None)
+                if indexed_at is not None and modified_at <= indexed_at:
+                    continue
+                conversation = self._read_meta_file(meta_file)
+                if conversation:
+                    changed.append(conversation)
+        # Anything left in the index no longer has a meta file
+        removed = list(indexed)
+        with Session(self._engine) as session, session.begin():
+            # Batched to stay within the sqlite limit on bound parameters
+            for start in range(0, len(removed), 500):
+                session.execute(
+                    delete(_ConversationRecord).where(
+                        _ConversationRecord.id.in_(removed[start : start + 500])
+                    )
+                )
+        self._upsert(changed)
+        return len(changed) + len(removed)
+
+    async def reconcile(self, file_store_path: Path) -> int:
+        """Bring the index in line with the meta files under the path given (e.g.: those written
+        while the index was stale), returning the number of conversations added, updated or
+        removed. Meta files not modified since they were indexed are skipped unread"""
+        return await asyncio.to_thread(self._reconcile, file_store_path)
+
+    # Reads
+
+    def _count(self) -> int:
+        with Session(self._engine) as session:
+            return session.scalar(select(func.count()).select_from(_ConversationRecord))
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count)
+
+    def _get(self, conversation_id: UUID) -> StoredLocalConversation | None:
+        with Session(self._engine) as session:
+            meta_json = session.scalar(
+                select(_ConversationRecord.meta_json).where(
+                    _ConversationRecord.id == conversation_id.hex
+                )
+            )
+        if meta_json is None:
+            return None
+        return StoredLocalConversation.model_validate_json(meta_json)
+
+    async def get(self, conversation_id: UUID) -> StoredLocalConversation | None:
+        return await asyncio.to_thread(self._get, conversation_id)
+
+    def _search(
+        self,
+        title__contains: str | None,
+        created_at__gte: datetime | None,
+        created_at__lt: datetime | None,
+        sort_order: ConversationSortOrder,
+        page_id: str | None,
+        limit: int,
+    ) -> tuple[list[StoredLocalConversation], str | None]:
+        if sort_order in (
+            ConversationSortOrder.UPDATED_AT,
+            ConversationSortOrder.UPDATED_AT_DESC,
+        ):
+            sort_column = _ConversationRecord.updated_at
+        else:
+            sort_column = _ConversationRecord.created_at
+        descending = sort_order in (
+            ConversationSortOrder.CREATED_AT_DESC,
+            ConversationSortOrder.UPDATED_AT_DESC,
+        )
+
+        query = select(
+            sort_column, _ConversationRecord.id, _ConversationRecord.meta_json
+        )
+        if title__contains:
+            # Escaped, so that % and _ in the search are not wildcards
+            query = query.where(
+                _ConversationRecord.title.contains(title__contains, autoescape=True)
+            )
+        if created_at__gte:
+            query = query.where(
+                _ConversationRecord.created_at >= _naive_utc(created_at__gte)
+            )
+        if created_at__lt:
+            query = query.where(
+                _ConversationRecord.created_at < _naive_utc(created_at__lt)
+            )
+
+        cursor = PageCursor.decode(page_id)
+        if cursor:
+            key = tuple_(sort_column, _ConversationRecord.id)
+            value = tuple_(_naive_utc(cursor.created_at), cursor.id)
+            query = query.where(key < value if descending else key > value)
+        if descending:
+            query = query.order_by(sort_column.desc(), _ConversationRecord.id.desc())
+        else:
+            query = query.order_by(sort_column, _ConversationRecord.id)
+
+        # Fetch one extra row to determine whether there is another page
+        with Session(self._engine) as session:
+            rows = session.execute(query.limit(limit + 1)).all()
+        next_page_id = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            sort_value, id, _ = rows[-1]
+            next_page_id = PageCursor(sort_value.replace(tzinfo=UTC), id).encode()
+        conversations = [
+            StoredLocalConversation.model_validate_json(meta_json)
+            for _, _, meta_json in rows
+        ]
+        return conversations, next_page_id
+
+    async def search(
+        self,
+        title__contains: str | None = None,
+        created_at__gte: datetime | None = None,
+        created_at__lt: datetime | None = None,
+        sort_order: ConversationSortOrder = ConversationSortOrder.CREATED_AT_DESC,
+        page_id: str | None = None,
+        limit: int = 100,
+    ) -> tuple[list[StoredLocalConversation], str | None]:
+        """Search for conversations, returning a page of results and the id of the next page.
+        The page id is a cursor on the sort column, so it is only valid for the same sort order"""
+        return await asyncio.to_thread(
+            self._search,
+            title__contains,
+            created_at__gte,
+            created_at__lt,
+            sort_order,
+            page_id,
+            limit,
+        )
+
+    def close(self):
+        self._engine.dispose()
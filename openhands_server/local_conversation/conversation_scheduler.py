@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(order=True)
+class _Waiting:
+    # Ordered by priority (Highest first), then by arrival
+    sort_key: tuple[int, int]
+    conversation_id: UUID = field(compare=False)
+    user_id: str | None = field(compare=False)
+    start: Callable[[], Awaitable[None]] = field(compare=False)
+
+
+@dataclass
+class ConversationScheduler:
+    """
+    Admission control for conversation runs. At most max_running conversations run at once,
+    and further starts wait in a queue. When a slot is free, the highest priority waiting start
+    is admitted. Between starts of equal priority, the user with the fewest running
+    conversations goes first (And then the earliest request), so one user submitting a burst
+    of conversations cannot hold up everyone else.
+    """
+
+    max_running: int = 8
+    _running: dict[UUID, str | None] = field(default_factory=dict, init=False)
+    _running_by_user: Counter = field(default_factory=Counter, init=False)
+    # Waiting starts for each user, as heaps
+    _waiting: dict[str | None, list[_Waiting]] = field(default_factory=dict, init=False)
+    _waiting_ids: set[UUID] = field(default_factory=set, init=False)
+    # Starts submitted while the conversation was still running, queued once its run finishes
+    _resubmits: dict[UUID, _Waiting] = field(default_factory=dict, init=False)
+    _sequence: itertools.count = field(default_factory=itertools.count, init=False)
+    # Queue positions, computed on demand and discarded whenever the queue changes
+    _positions: dict[UUID, int] | None = field(default=None, init=False)
+
+    def submit(
+        self,
+        conversation_id: UUID,
+        start: Callable[[], Awaitable[None]],
+        user_id: str | None = None,
+        priority: int = 0,
+    ) -> int | None:
+        """Start a conversation now if there is a free slot, or queue it. Return the queue
+        position (Starting from 0), or None if it was started. A conversation which is still
+        running (e.g.: resumed before its paused run has ended) is queued again once its run
+        finishes, and None is returned"""
+        if conversation_id in self._waiting_ids:
+            return self.get_queue_position(conversation_id)
+        waiting = _Waiting(
+            (-priority, next(self._sequence)), conversation_id, user_id, start
+        )
+        if conversation_id in self._running:
+            self._resubmits[conversation_id] = waiting
+            return None
+        self._push(waiting)
+        self._dispatch()
+        return self.get_queue_position(conversation_id)
+
+    def _push(self, waiting: _Waiting):
+        heapq.heappush(self._waiting.setdefault(waiting.user_id, []), waiting)
+        self._waiting_ids.add(waiting.conversation_id)
+        self._positions = None
+
+    def finished(self, conversation_id: UUID):
+        """Release the slot of a conversation whose run has ended, admitting the next start"""
+        if conversation_id not in self._running:
+            return
+        user_id = self._running.pop(conversation_id)
+        self._running_by_user[user_id] -= 1
+        if not self._running_by_user[user_id]:
+            del self._running_by_user[user_id]
+        self._positions = None
+        resubmit = self._resubmits.pop(conversation_id, None)
+        if resubmit is not None:
+            self._push(resubmit)
+        self._dispatch()
+
+    def cancel(self, conversation_id: UUID) -> bool:
+        """Remove a conversation from the queue, or release its slot if running"""
+        self._resubmits.pop(conversation_id, None)
+        if conversation_id in self._running:
+            self.finished(conversation_id)
+            return True
+        if conversation_id not in self._waiting_ids:
+            return False
+        self._waiting_ids.discard(conversation_id)
+        for user_id, heap in list(self._waiting.items()):
+            remaining = [
+                waiting
+                for waiting in heap
+                if waiting.conversation_id != conversation_id
+            ]
+            if len(remaining) != len(heap):
+                heapq.heapify(remaining)
+                if remaining:
+                    self._waiting[user_id] = remaining
+                else:
+                    del self._waiting[user_id]
+        self._positions = None
+        return True
+
+    def _next_user(
+        self, running_by_user: Counter, waiting: dict[str | None, list[_Waiting]]
+    ) -> str | None:
+        return min(
+            waiting,
+            key=lambda user_id: (
+                waiting[user_id][0].sort_key[0],
+                running_by_user[user_id],
+                waiting[user_id][0].sort_key[1],
+            ),
+        )
+
+    def _dispatch(self):
+        while self._waiting and len(self._running) < self.max_running:
+            user_id = self._next_user(self._running_by_user, self._waiting)
+            heap = self._waiting[user_id]
+            waiting = heapq.heappop(heap)
+            if not heap:
+                del self._waiting[user_id]
+            self._waiting_ids.discard(waiting.conversation_id)
+            self._running[waiting.conversation_id] = user_id
+            self._running_by_user[user_id] += 1
+            self._positions = None
+            asyncio.create_task(self._start(waiting))
+
+    async def _start(self, waiting: _Waiting):
+        try:
+            await waiting.start()
+        except Exception:
+            logger.exception(f"conversation_start_failed:{waiting.conversation_id}")
+            self.finished(waiting.conversation_id)
+
+    def is_queued(self, conversation_id: UUID) -> bool:
+        return conversation_id in self._waiting_ids
+
+    def get_queue_position(self, conversation_id: UUID) -> int | None:
+        """Get the number of starts ahead of a queued conversation, or None if it is not queued.
+        Positions assume that running conversations do not finish in the meantime"""
+        if conversation_id not in self._waiting_ids:
+            return None
+        if self._positions is None:
+            # Replay the admission order over a copy of the queue
+            running_by_user = Counter(self._running_by_user)
+            waiting = {user_id: list(heap) for user_id, heap in self._waiting.items()}
+            positions = {}
+            while waiting:
+                user_id = self._next_user(running_by_user, waiting)
+                heap = waiting[user_id]
+                positions[heapq.heappop(heap).conversation_id] = len(positions)
+                if not heap:
+                    del waiting[user_id]
+                running_by_user[user_id] += 1
+            self._positions = positions
+        return self._positions[conversation_id]
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    @property
+    def queued_count(self) -> int:
+        return len(self._waiting_ids)
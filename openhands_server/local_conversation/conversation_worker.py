@@ -0,0 +1,340 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+from openhands_server.local_conversation.model import ConversationStatus
+
+logger = logging.getLogger(__name__)
+
+# Invoked in the parent with the conversation id, kind, source and json of each event
+EventHandler = Callable[[UUID, str, str | None, str], Awaitable[None]]
+# Invoked in the parent with the conversation id when a run loop in a worker ends
+RunFinishedHandler = Callable[[UUID], None]
+
+
+class ConversationWorkerError(Exception):
+    """Raised when a call to a conversation worker fails, or the worker has exited"""
+
+
+@dataclass
+class ConversationWorker:
+    """
+    Parent side of a subprocess which runs a shard of conversations, so that agent steps run
+    on their own core rather than contending for the GIL of the server process. Control calls
+    are sent over a pipe as (request id, method, args), and answered with results. Events of
+    the conversations in the worker are sent back over the same pipe and passed to on_event.
+    If the worker process dies, pending calls fail, the run loops of its conversations are
+    reported as finished, and a new process is spawned after restart_delay seconds. The
+    conversations stay assigned to the worker and report as stopped until they are resumed.
+    """
+
+    on_event: EventHandler
+    on_run_finished: RunFinishedHandler | None = None
+    name: str = "conversation-worker"
+    # Seconds to wait before respawning a worker process which died. None disables respawning
+    restart_delay: float | None = 1
+    _process: multiprocessing.process.BaseProcess | None = field(
+        default=None, init=False
+    )
+    _conn: Connection | None = field(default=None, init=False)
+    _send_lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+    _request_ids: Any = field(default_factory=itertools.count, init=False)
+    _pending: dict[int, asyncio.Future] = field(default_factory=dict, init=False)
+    # Messages are handled in order by a single task, so events are stored in order
+    _inbox: asyncio.Queue | None = field(default=None, init=False)
+    _task: asyncio.Task | None = field(default=None, init=False)
+    # Set once the pipe is closed, after pending calls have failed
+    _exited: bool = field(default=False, init=False)
+    _stopping: bool = field(default=False, init=False)
+    conversation_ids: set[UUID] = field(default_factory=set, init=False)
+
+    async def start(self):
+        if self._process is not None:
+            return
+        # Spawn rather than fork, as forking a process with running threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_worker_main, args=(child_conn,), name=self.name, daemon=True
+        )
+        await asyncio.to_thread(self._process.start)
+        child_conn.close()
+        self._exited = False
+        loop = asyncio.get_running_loop()
+        self._inbox = asyncio.Queue()
+        self._task = asyncio.create_task(self._handle_messages())
+        threading.Thread(
+            target=self._read,
+            args=(loop, self._conn, self._inbox),
+            name=f"{self.name}-reader",
+            daemon=True,
+        ).start()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def _read(
+        self, loop: asyncio.AbstractEventLoop, conn: Connection, inbox: asyncio.Queue
+    ):
+        try:
+            while True:
+                message = conn.recv()
+                loop.call_soon_threadsafe(inbox.put_nowait, message)
+        except (EOFError, OSError):
+            pass
+        try:
+            loop.call_soon_threadsafe(inbox.put_nowait, None)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+    async def _handle_messages(self):
+        while True:
+            message = await self._inbox.get()
+            if message is None:
+                break
+            if message[0] == "event":
+                _, conversation_id, kind, source, event_json = message
+                try:
+                    await self.on_event(conversation_id, kind, source, event_json)
+                except Exception:
+                    logger.exception(
+                        f"conversation_worker_event_error:{conversation_id}"
+                    )
+            elif message[0] == "run_finished":
+                if self.on_run_finished:
+                    self.on_run_finished(message[1])
+            else:
+                _, request_id, ok, value = message
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(ConversationWorkerError(value))
+        self._exited = True
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConversationWorkerError(f"{self.name} exited"))
+        self._pending.clear()
+        if self._stopping:
+            return
+        logger.error(f"conversation_worker_exited:{self.name}:{self._process.exitcode}")
+        if self.on_run_finished:
+            for conversation_id in list(self.conversation_ids):
+                self.on_run_finished(conversation_id)
+        if self.restart_delay is not None:
+            await asyncio.sleep(self.restart_delay)
+            await self._restart()
+
+    async def _restart(self):
+        """Replace a worker process which died with a new one"""
+        process, conn = self._process, self._conn
+        await asyncio.to_thread(process.join)
+        conn.close()
+        self._process = self._conn = None
+        await self.start()
+        logger.info(f"conversation_worker_restarted:{self.name}")
+
+    async def call(self, method: str, *args) -> Any:
+        """Invoke a method in the worker, returning its result"""
+        # Once the pipe is closed nothing will answer, even if the process has not been reaped
+        if self._exited or not self.alive:
+            raise ConversationWorkerError(f"{self.name} is not running")
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                self._conn.send((request_id, method, args))
+        except OSError as e:
+            self._pending.pop(request_id, None)
+            raise ConversationWorkerError(f"{self.name} is not running") from e
+        return await future
+
+    async def stop(self, timeout: float = 10):
+        if self._process is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self.call("shutdown"), timeout)
+        except (TimeoutError, ConversationWorkerError):
+            pass
+        await asyncio.to_thread(self._process.join, timeout)
+        if self._process.is_alive():
+            self._process.kill()
+        self._conn.close()
+        if self._task:
+            self._task.cancel()
+        self._process = self._conn = self._task = None
+        self._stopping = False
+
+
+@dataclass
+class ConversationWorkerPool:
+    """
+    Subprocesses among which conversations are sharded. Each new conversation is assigned
+    to the worker running the fewest conversations.
+    """
+
+    on_event: EventHandler
+    on_run_finished: RunFinishedHandler | None = None
+    num_workers: int = field(default_factory=lambda: multiprocessing.cpu_count())
+    _workers: list[ConversationWorker] = field(default_factory=list, init=False)
+
+    async def start(self):
+        if self._workers:
+            return
+        for index in range(self.num_workers):
+            worker = ConversationWorker(
+                on_event=self.on_event,
+                on_run_finished=self.on_run_finished,
+                name=f"conversation-worker-{index}",
+            )
+            await worker.start()
+            self._workers.append(worker)
+
+    async def stop(self):
+        await asyncio.gather(*(worker.stop() for worker in self._workers))
+        self._workers.clear()
+
+    def assign(self, conversation_id: UUID) -> ConversationWorker:
+        """Get the worker for a conversation, assigning one if necessary"""
+        for worker in self._workers:
+            if conversation_id in worker.conversation_ids:
+                return worker
+        workers = [worker for worker in self._workers if worker.alive] or self._workers
+        worker = min(workers, key=lambda worker: len(worker.conversation_ids))
+        worker.conversation_ids.add(conversation_id)
+        return worker
+
+    def release(self, conversation_id: UUID):
+        for worker in self._workers:
+            worker.conversation_ids.discard(conversation_id)
+
+
+# Child process
+
+
+def _worker_main(conn: Connection):
+    """Entry point of a worker process. Requests are read on the main thread, and each
+    conversation runs in its own thread"""
+    from openhands.sdk import Conversation, LocalFileStore, Message
+
+    from openhands_server.local_conversation.model import StoredLocalConversation
+
+    send_lock = threading.Lock()
+    conversations: dict[UUID, Any] = {}
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    def callback_for(conversation_id: UUID):
+        def callback(event):
+            send(
+                (
+                    "event",
+                    conversation_id,
+                    type(event).__name__,
+                    getattr(event, "source", None),
+                    event.model_dump_json(),
+                )
+            )
+
+        return callback
+
+    def run_in_thread(conversation_id: UUID, conversation):
+        def run():
+            try:
+                conversation.run()
+            finally:
+                send(("run_finished", conversation_id))
+
+        threading.Thread(
+            target=run, name=f"conversation-{conversation_id.hex}", daemon=True
+        ).start()
+
+    def start(
+        conversation_id: UUID, stored_json: str, file_store_path: str, working_dir: str
+    ) -> bool:
+        conversation = conversations.get(conversation_id)
+        if conversation:
+            with conversation.state as state:
+                if state.agent_finished:
+                    return False
+                if not state.agent_paused and not state.agent_waiting_for_confirmation:
+                    return False
+            run_in_thread(conversation_id, conversation)
+            return True
+        stored = StoredLocalConversation.model_validate_json(stored_json)
+        conversation = Conversation(
+            agent=stored.agent.create_agent(working_dir),
+            callbacks=[callback_for(conversation_id)],
+            persist_filestore=LocalFileStore(Path(file_store_path) / "events"),
+        )
+        conversations[conversation_id] = conversation
+        run_in_thread(conversation_id, conversation)
+        return True
+
+    def pause(conversation_id: UUID):
+        conversation = conversations.get(conversation_id)
+        if conversation:
+            conversation.pause()
+
+    def close(conversation_id: UUID):
+        conversation = conversations.pop(conversation_id, None)
+        if conversation:
+            conversation.close()
+
+    def send_message(conversation_id: UUID, message_json: str):
+        conversations[conversation_id].send_message(
+            Message.model_validate_json(message_json)
+        )
+
+    def get_status(conversation_id: UUID) -> str:
+        conversation = conversations.get(conversation_id)
+        if not conversation:
+            return ConversationStatus.STOPPED.value
+        with conversation.state as state:
+            if state.agent_paused:
+                return ConversationStatus.PAUSED.value
+            if state.agent_finished:
+                return ConversationStatus.FINISHED.value
+        return ConversationStatus.RUNNING.value
+
+    methods = {
+        "start": start,
+        "pause": pause,
+        "close": close,
+        "send_message": send_message,
+        "get_status": get_status,
+    }
+    while True:
+        try:
+            request_id, method, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        if method == "shutdown":
+            for conversation in conversations.values():
+                try:
+                    conversation.close()
+                except Exception:
+                    logger.exception("conversation_worker_close_error")
+            send(("result", request_id, True, None))
+            return
+        try:
+            send(("result", request_id, True, methods[method](*args)))
+        except Exception as e:
+            logger.exception(f"conversation_worker_call_error:{method}")
+            send(("result", request_id, False, f"{type(e).__name__}: {e}"))
@@ -1,60 +1,145 @@
-
-
-from dataclasses import dataclass, field
-from datetime import UTC, datetime
+import asyncio
 import logging
+import shutil
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime
 from mailbox import Message
-import os
 from pathlib import Path
-import shutil
 from uuid import UUID, uuid4
 
+from openhands_server.local_conversation.conversation_executor import (
+    ExecutorLaneStats,
+    LanedConversationExecutor,
+)
+from openhands_server.local_conversation.conversation_index import ConversationIndex
+from openhands_server.local_conversation.conversation_scheduler import (
+    ConversationScheduler,
+)
+from openhands_server.local_conversation.conversation_worker import (
+    ConversationWorkerPool,
+)
+from openhands_server.local_conversation.event_store import EventStore
 from openhands_server.local_conversation.local_conversation import LocalConversation
-from openhands_server.local_conversation.service import LocalConversationService
-from openhands_server.local_conversation.model import LocalConversationInfo, LocalConversationPage, StartConversationRequest, StoredLocalConversation
-
+from openhands_server.local_conversation.manager import LocalConversationService
+from openhands_server.local_conversation.meta_persister import MetaPersister
+from openhands_server.local_conversation.model import (
+    ConversationSortOrder,
+    ConversationStatus,
+    LocalConversationInfo,
+    LocalConversationPage,
+    StartConversationRequest,
+    StoredEvent,
+    StoredLocalConversation,
+)
+from openhands_server.utils.pub_sub import OverflowPolicy
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class DefaultLocalConversationService(LocalConversationService):
-    """ Conversation service which stores to a local context. """
+    """
+    Conversation service which stores to a local context. The meta.json file of each
+    conversation is the source of truth, and is mirrored to a SQLite index for searches. The
+    index is rebuilt from the meta files on startup if it is empty (e.g.: if it was deleted).
+    Updates caused by events are written behind, at most once per meta_write_debounce seconds.
+    """
 
     file_store_path: Path = field(default=Path("/workspace/conversations"))
     workspace_path: Path = field(default=Path("/workspace"))
+    # Defaults to index.db in the file store path
+    index_path: Path | None = None
+    meta_write_debounce: float = 1
+    # Threads on which conversations run. If not given, the service creates its own and shuts
+    # it down on exit - an executor passed in is left running for its owner
+    executor: LanedConversationExecutor | None = None
+    _owns_executor: bool = field(default=False, init=False)
+    # Number of worker processes among which conversations are sharded, so that they can use
+    # more than one core. If 0, conversations run in executor threads in this process
+    process_workers: int = 0
+    _worker_pool: ConversationWorkerPool | None = field(default=None, init=False)
+    # Max conversations running at once (Further starts are QUEUED), and the default
+    # priority of the runs of each user
+    max_running_conversations: int = 8
+    user_priorities: dict[str, int] = field(default_factory=dict)
+    _scheduler: ConversationScheduler = field(init=False)
     _running_conversations: dict[UUID, LocalConversation] = field(default_factory=dict)
+    _index: ConversationIndex = field(init=False)
+    _meta_persister: MetaPersister = field(init=False)
 
-    async def get_local_conversation(self, conversation_id: UUID) -> LocalConversationInfo:
-        conversation = self._running_conversations.get(id)
+    def __post_init__(self):
+        if self.executor is None:
+            self.executor = LanedConversationExecutor()
+            self._owns_executor = True
+        self._index = ConversationIndex(
+            self.index_path or self.file_store_path / "index.db"
+        )
+        self._meta_persister = MetaPersister(
+            save=self._save_meta, debounce=self.meta_write_debounce
+        )
+        self._scheduler = ConversationScheduler(
+            max_running=self.max_running_conversations
+        )
+        if self.process_workers:
+            self._worker_pool = ConversationWorkerPool(
+                on_event=self._on_worker_event,
+                on_run_finished=self._scheduler.finished,
+                num_workers=self.process_workers,
+            )
+
+    async def _to_info(self, stored: StoredLocalConversation) -> LocalConversationInfo:
+        conversation = self._running_conversations.get(stored.id)
         if conversation is not None:
+            if self._scheduler.is_queued(stored.id):
+                return LocalConversationInfo(
+                    **conversation.stored.model_dump(),
+                    status=ConversationStatus.QUEUED,
+                    queue_position=self._scheduler.get_queue_position(stored.id),
+                )
             status = await conversation.get_status()
-            return LocalConversationInfo(**conversation.stored.model_dump(), status=status)
-        
-        meta_file = self.file_store_path / conversation_id.hex / "meta.json"
-        json_str = meta_file.read_text()
+            return LocalConversationInfo(
+                **conversation.stored.model_dump(), status=status
+            )
         # This works because the only field defined is status which defaults to stopped
-        conversation = LocalConversationInfo.model_validate_json(json_str)
-        return conversation
-    
-    async def search_local_conversations(self, page_id: str | None = None, limit: int = 100) -> LocalConversationPage:
-        items = []
-        for conversation_dir in self.file_store_path.iterdir():
-            if page_id:
-                if page_id != conversation_dir.name:
-                    continue
-                page_id = None
-            try:
-                if limit < 0:
-                    return LocalConversationPage(items=items, next_page_id=conversation_dir.name)
-                conversation_id = UUID(conversation_dir.name)
-                conversation = self.get_local_conversation(conversation_id)
-                items.append(conversation)
-            except Exception:
-                logger.exception('error_reading_conversation:{conversation_dir}', stack_info=True)
-        return LocalConversationPage(items=items)
+        return LocalConversationInfo(**stored.model_dump())
 
-    async def batch_get_local_conversations(self, conversation_ids: list[UUID]) -> list[LocalConversationInfo | None]:
+    async def get_local_conversation(
+        self, conversation_id: UUID
+    ) -> LocalConversationInfo | None:
+        conversation = self._running_conversations.get(conversation_id)
+        if conversation is not None:
+            return await self._to_info(conversation.stored)
+        stored = await self._index.get(conversation_id)
+        if stored is None:
+            return None
+        return await self._to_info(stored)
+
+    async def search_local_conversations(
+        self,
+        title__contains: str | None = None,
+        created_at__gte: datetime | None = None,
+        created_at__lt: datetime | None = None,
+        sort_order: ConversationSortOrder = ConversationSortOrder.CREATED_AT_DESC,
+        page_id: str | None = None,
+        limit: int = 100,
+    ) -> LocalConversationPage:
+        stored, next_page_id = await self._index.search(
+            title__contains=title__contains,
+            created_at__gte=created_at__gte,
+            created_at__lt=created_at__lt,
+            sort_order=sort_order,
+            page_id=page_id,
+            limit=limit,
+        )
+        return LocalConversationPage(
+            items=[await self._to_info(conversation) for conversation in stored],
+            next_page_id=next_page_id,
+        )
+
+    async def batch_get_local_conversations(
+        self, conversation_ids: list[UUID]
+    ) -> list[LocalConversationInfo | None]:
         conversations = []
         for conversation_id in conversation_ids:
             try:
@@ -64,35 +149,213 @@ class DefaultLocalConversationService(LocalConversationService):
                 conversations.append(None)
         return conversations
 
-    # Write Methods
+    # Events
 
-    async def start_local_conversation(self, request: StartConversationRequest) -> UUID:
-        """ Start a local conversation and return its id. """
-        conversation_id = uuid4(),
-        stored = StoredLocalConversation(id=conversation_id, **request.model_dump())
+    async def read_events(
+        self, conversation_id: UUID, offset: int = 0, limit: int = 100
+    ) -> list[StoredEvent] | None:
+        conversation = self._running_conversations.get(conversation_id)
+        if conversation is not None:
+            return await conversation.event_store.read(offset, limit)
+        conversation_path = self.file_store_path / conversation_id.hex
+        if not (conversation_path / "meta.json").exists():
+            return None
+        event_store = EventStore(conversation_path / "event_log", read_only=True)
+        try:
+            return await event_store.read(offset, limit)
+        finally:
+            event_store.close()
+
+    async def iter_events(
+        self,
+        conversation_id: UUID,
+        offset: int | None = None,
+        limit: int = 100,
+        kind__eq: str | None = None,
+        source__eq: str | None = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[StoredEvent] | None:
+        conversation = self._running_conversations.get(conversation_id)
+        if conversation is not None:
+            event_store = conversation.event_store
+        elif (self.file_store_path / conversation_id.hex / "meta.json").exists():
+            event_store = EventStore(
+                self.file_store_path / conversation_id.hex / "event_log", read_only=True
+            )
+        else:
+            return None
+
+        async def iter_events():
+            try:
+                async for event in event_store.iter_events(
+                    offset, limit, kind__eq, source__eq, reverse
+                ):
+                    yield event
+            finally:
+                if conversation is None:
+                    event_store.close()
+
+        return iter_events()
+
+    async def subscribe_to_events(
+        self,
+        conversation_id: UUID,
+        callback: Callable[[StoredEvent], Awaitable[None]],
+        on_disconnect: Callable[[], None] | None = None,
+    ) -> UUID | None:
+        conversation = self._running_conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        return conversation.subscribe(
+            callback,
+            overflow_policy=OverflowPolicy.DISCONNECT,
+            on_disconnect=on_disconnect,
+        )
+
+    async def unsubscribe_from_events(
+        self, conversation_id: UUID, subscriber_id: UUID
+    ) -> bool:
+        conversation = self._running_conversations.get(conversation_id)
+        if conversation is None:
+            return False
+        return conversation.unsubscribe(subscriber_id)
+
+    async def rebuild_index(self) -> int:
+        """Rebuild the search index from the meta files, returning the number of conversations"""
+        count = await self._index.rebuild(self.file_store_path)
+        logger.info(f"conversation_index_rebuilt:{count}")
+        return count
+
+    async def _on_worker_event(
+        self, conversation_id: UUID, kind: str, source: str | None, event_json: str
+    ):
+        conversation = self._running_conversations.get(conversation_id)
+        if conversation is None:
+            logger.warning(f"worker_event_for_unknown_conversation:{conversation_id}")
+            return
+        await conversation.on_worker_event(kind, source, event_json)
+
+    def _submit(self, conversation: LocalConversation):
+        """Queue a run of the conversation with the scheduler"""
+        stored = conversation.stored
+        priority = stored.priority
+        if priority is None:
+            priority = self.user_priorities.get(stored.user_id, 0)
+
+        async def start():
+            if not await conversation.start():
+                # Nothing to run (e.g.: already finished), so the slot is free again
+                self._scheduler.finished(stored.id)
+
+        position = self._scheduler.submit(stored.id, start, stored.user_id, priority)
+        if position is not None:
+            logger.info(f"conversation_queued:{stored.id}:{position}")
+
+    async def _save_meta(self, conversation: LocalConversation):
+        """Save the meta file of a conversation and update the index to match"""
+        await conversation.save_meta()
+        await self._index.upsert(conversation.stored)
+
+    def _add_conversation(self, stored: StoredLocalConversation) -> LocalConversation:
+        """Create the local conversation for a stored conversation and track it as running"""
         conversation = LocalConversation(
             stored=stored,
-            file_store_path=self.file_store_path / conversation_id.hex / "conversation",
-            working_dir=self.workspace_path / conversation_id.hex,
+            file_store_path=self.file_store_path / stored.id.hex,
+            working_dir=self.workspace_path / stored.id.hex,
+            executor=self.executor,
+            worker=self._worker_pool.assign(stored.id) if self._worker_pool else None,
+            on_run_finished=self._scheduler.finished,
         )
-        conversation.subscribe(_EventListener(self, conversation_id))
-        self._running_conversations[id] = conversation
-        return id
+        conversation.subscribe(_EventListener(self, conversation))
+        self._running_conversations[stored.id] = conversation
+        return conversation
+
+    async def _load_stored(
+        self, conversation_id: UUID
+    ) -> StoredLocalConversation | None:
+        """Load a stored conversation from its meta file, falling back to the index"""
+        meta_file = self.file_store_path / conversation_id.hex / "meta.json"
+        if meta_file.is_file():
+            meta_json = await asyncio.to_thread(meta_file.read_text)
+            return StoredLocalConversation.model_validate_json(meta_json)
+        return await self._index.get(conversation_id)
+
+    # Write Methods
+
+    async def start_local_conversation(self, request: StartConversationRequest) -> UUID:
+        """Start a local conversation and return its id."""
+        conversation_id = uuid4()
+        stored = StoredLocalConversation(id=conversation_id, **request.model_dump())
+        conversation = self._add_conversation(stored)
+        await self._save_meta(conversation)
+        self._submit(conversation)
+        return conversation_id
 
     async def pause_local_conversation(self, conversation_id: UUID) -> bool:
         conversation = self._running_conversations.get(conversation_id)
-        await conversation.pause()
+        if conversation is None:
+            return False
+        if self._scheduler.is_queued(conversation_id):
+            # Not started yet, so leave the queue
+            self._scheduler.cancel(conversation_id)
+        else:
+            await conversation.pause()
+        await self._meta_persister.flush(conversation_id)
+        return True
 
     async def resume_local_conversation(self, conversation_id: UUID) -> bool:
         conversation = self._running_conversations.get(conversation_id)
-        await conversation.start()
+        if conversation is None:
+            # Not loaded since the server started
+            stored = await self._load_stored(conversation_id)
+            if stored is None:
+                return False
+            conversation = self._add_conversation(stored)
+        self._submit(conversation)
+        return True
 
     async def delete_local_conversation(self, conversation_id: UUID) -> bool:
-        conversation = self._running_conversations.pop(conversation_id)
+        conversation_path = self.file_store_path / conversation_id.hex
+        conversation = self._running_conversations.pop(conversation_id, None)
+        if (
+            conversation is None
+            and not conversation_path.exists()
+            and await self._index.get(conversation_id) is None
+        ):
+            return False
         if conversation:
             await conversation.close()
-        shutil.rmtree(self.file_store_path / conversation_id.hex)
-        shutil.rmtree(self.workspace_path / conversation_id.hex)
+        self._meta_persister.discard(conversation_id)
+        self._scheduler.cancel(conversation_id)
+        if self._worker_pool:
+            self._worker_pool.release(conversation_id)
+        await self._index.remove(conversation_id)
+        for path in (conversation_path, self.workspace_path / conversation_id.hex):
+            if path.exists():
+                shutil.rmtree(path)
+        return True
+
+    # Lifecycle methods
+
+    async def __aenter__(self):
+        count = await self._index.reconcile(self.file_store_path)
+        if count:
+            logger.info(f"conversation_index_reconciled:{count}")
+        if self._worker_pool:
+            await self._worker_pool.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self._worker_pool:
+            await self._worker_pool.stop()
+        await self._meta_persister.flush_all()
+        self._index.close()
+        if self._owns_executor:
+            self.executor.shutdown()
+
+    def get_executor_stats(self) -> dict[str, ExecutorLaneStats]:
+        """Get thread usage and queue wait for each lane of the conversation executor"""
+        return self.executor.get_stats()
 
     @classmethod
     def get_instance(cls) -> LocalConversationService:
@@ -101,8 +364,9 @@ class DefaultLocalConversationService(LocalConversationService):
 
 @dataclass
 class _EventListener:
+    service: DefaultLocalConversationService
     conversation: LocalConversation
 
     async def __call__(self, message: Message):
-        # Saving also updates the updated_at timestamp
-        self.conversation.save()
+        self.conversation.touch()
+        self.service._meta_persister.mark_dirty(self.conversation)
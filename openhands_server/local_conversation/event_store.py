@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from openhands.sdk.event import Event
+
+from openhands_server.local_conversation.model import StoredEvent
+from openhands_server.utils.segmented_log import SegmentedLog
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventStore:
+    """
+    Append only log of the events of a conversation, stored in a segmented log with one JSON
+    record per event. Each event is assigned the next offset as it is appended, so clients can
+    resume from the last offset they saw, and any offset can be read without scanning.
+    """
+
+    path: Path
+    max_segment_bytes: int = 16 * 1024 * 1024
+    # Read without creating or modifying any files (e.g.: for conversations which are not running)
+    read_only: bool = False
+    _log: SegmentedLog | None = field(default=None, init=False)
+    _open_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+    # Held while assigning offsets to appends
+    _lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+
+    async def open(self) -> SegmentedLog:
+        """Open the log if it is not already open. Opening recovers the end of the log, so is
+        done off the event loop"""
+        if self._log is None:
+            async with self._open_lock:
+                if self._log is None:
+                    self._log = await asyncio.to_thread(
+                        SegmentedLog,
+                        self.path,
+                        self.max_segment_bytes,
+                        read_only=self.read_only,
+                    )
+        return self._log
+
+    async def append(self, event: Event) -> StoredEvent:
+        """Append an event, returning it with its offset"""
+        return await self.append_record(
+            type(event).__name__,
+            getattr(event, "source", None),
+            event.model_dump(mode="json"),
+        )
+
+    async def append_record(
+        self, kind: str, source: str | None, event: dict[str, Any]
+    ) -> StoredEvent:
+        """Append an event which has already been serialized (e.g.: by a worker process)"""
+        log = await self.open()
+        async with self._lock:
+            stored = StoredEvent(
+                offset=log.next_offset, kind=kind, source=source, event=event
+            )
+            await asyncio.to_thread(log.append, stored.model_dump_json().encode())
+            return stored
+
+    async def read(self, offset: int = 0, limit: int = 100) -> list[StoredEvent]:
+        """Read up to limit events starting at the offset given"""
+        log = await self.open()
+        records = await asyncio.to_thread(log.read, offset, limit)
+        return [StoredEvent.model_validate_json(record) for record in records]
+
+    async def tail(self, limit: int = 100) -> list[StoredEvent]:
+        """Read the last limit events"""
+        log = await self.open()
+        records = await asyncio.to_thread(log.tail, limit)
+        return [StoredEvent.model_validate_json(record) for record in records]
+
+    async def iter_events(
+        self,
+        offset: int | None = None,
+        limit: int = 100,
+        kind__eq: str | None = None,
+        source__eq: str | None = None,
+        reverse: bool = False,
+        chunk_size: int = 256,
+    ) -> AsyncIterator[StoredEvent]:
+        """Yield up to limit events matching the filters given, starting at offset (Inclusive) and
+        moving forwards, or backwards if reverse is set. Events are read a chunk at a time, so the
+        history is never loaded into memory as a whole"""
+        log = await self.open()
+        if offset is None:
+            offset = log.next_offset - 1 if reverse else 0
+        remaining = limit
+        while remaining > 0:
+            if reverse:
+                if offset < 0:
+                    return
+                start = max(0, offset - chunk_size + 1)
+                records = await asyncio.to_thread(log.read, start, offset - start + 1)
+                records.reverse()
+                offset = start - 1
+            else:
+                records = await asyncio.to_thread(log.read, offset, chunk_size)
+                if not records:
+                    return
+                offset += len(records)
+            for record in records:
+                event = StoredEvent.model_validate_json(record)
+                if kind__eq is not None and event.kind != kind__eq:
+                    continue
+                if source__eq is not None and event.source != source__eq:
+                    continue
+                yield event
+                remaining -= 1
+                if not remaining:
+                    return
+
+    async def count(self) -> int:
+        log = await self.open()
+        return log.next_offset
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
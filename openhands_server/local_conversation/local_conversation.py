@@ -1,17 +1,34 @@
-
-
 import asyncio
+import json
+import os
+import tempfile
+from collections.abc import Callable
 from dataclasses import dataclass, field
 from datetime import UTC, datetime
 from pathlib import Path
 from uuid import UUID
 
 from openhands.sdk import Conversation, LocalFileStore, Message
-from openhands.sdk.utils.async_utils import AsyncCallbackWrapper, AsyncConversationCallback
-
-from openhands_server.local_conversation.agent_info import AgentInfo
-from openhands_server.local_conversation.model import ConversationStatus, StoredLocalConversation
-from openhands_server.utils.pub_sub import PubSub
+from openhands.sdk.event import Event
+from openhands.sdk.utils.async_utils import (
+    AsyncCallbackWrapper,
+    AsyncConversationCallback,
+)
+
+from openhands_server.local_conversation.conversation_executor import (
+    LanedConversationExecutor,
+    get_default_conversation_executor,
+)
+from openhands_server.local_conversation.conversation_worker import (
+    ConversationWorker,
+    ConversationWorkerError,
+)
+from openhands_server.local_conversation.event_store import EventStore
+from openhands_server.local_conversation.model import (
+    ConversationStatus,
+    StoredLocalConversation,
+)
+from openhands_server.utils.pub_sub import OverflowPolicy, PubSub, SubscriberStats
 
 
 @dataclass
@@ -22,63 +39,147 @@ class LocalConversation:
     _lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
     _conversation: Conversation | None = field(default=None, init=False)
     _pub_sub: PubSub = field(default_factory=PubSub, init=False)
+    _event_store: EventStore = field(init=False)
+    executor: LanedConversationExecutor = field(
+        default_factory=get_default_conversation_executor
+    )
+    # If set, the conversation runs in this worker process rather than in executor threads
+    worker: ConversationWorker | None = None
+    # Invoked with the conversation id when a run loop in this process ends
+    on_run_finished: Callable[[UUID], None] | None = None
+
+    def __post_init__(self):
+        self._event_store = EventStore(self.file_store_path / "event_log")
+
+    @property
+    def event_store(self) -> EventStore:
+        return self._event_store
 
     async def load_meta(self):
         meta_file = self.file_store_path / "meta.json"
         self.stored = StoredLocalConversation.model_validate_json(meta_file.read_text())
 
-    async def save_meta(self):
+    def touch(self):
+        """Mark the conversation as updated. The change is not saved until save_meta is called"""
         self.stored.updated_at = datetime.now(UTC)
-        meta_file = self.file_store_path / "meta.json"
-        meta_file.write_text(self.self.stored.model_dump_json())
 
-    async def start(self):
+    async def save_meta(self):
+        """Write the meta file atomically, off the event loop"""
+        await asyncio.to_thread(
+            _write_atomic,
+            self.file_store_path / "meta.json",
+            self.stored.model_dump_json(),
+        )
+
+    async def start(self) -> bool:
+        """Start or resume the run loop, returning False if there was nothing to run"""
+        # Open the event store before any events can arrive, so appends never wait on opening
+        await self._event_store.open()
+        if self.worker:
+            return await self.worker.call(
+                "start",
+                self.stored.id,
+                self.stored.model_dump_json(),
+                str(self.file_store_path),
+                str(self.working_dir),
+            )
         async with self._lock:
             if self._conversation:
                 with self._conversation.state as state:
                     # Agent has finished
                     if state.agent_finished:
-                        return
-                    
+                        return False
+
                     # Agent is already running
-                    if not state.agent_paused and not state.agent_waiting_for_confirmation:
-                        return
+                    if (
+                        not state.agent_paused
+                        and not state.agent_waiting_for_confirmation
+                    ):
+                        return False
 
-                self._conversation.run()
-            
-            agent = self.agent.create_agent(self.working_dir)
+                asyncio.create_task(self._run(self._conversation))
+                return True
+
+            agent = self.stored.agent.create_agent(self.working_dir)
             conversation = Conversation(
-                agent=agent, 
-                callbacks=[AsyncCallbackWrapper(self._pub_sub)],
-                persist_filestore=LocalFileStore(self.file_store_path / "events"))
+                agent=agent,
+                callbacks=[AsyncCallbackWrapper(self._on_event)],
+                persist_filestore=LocalFileStore(self.file_store_path / "events"),
+            )
             self._conversation = conversation
-            loop = asyncio.get_running_loop()
-            asyncio.create_task(loop.run_in_executor(None, conversation.run))
+            asyncio.create_task(self._run(conversation))
+            return True
+
+    async def _run(self, conversation: Conversation):
+        try:
+            await self.executor.run(conversation.run)
+        finally:
+            if self.on_run_finished:
+                self.on_run_finished(self.stored.id)
+
+    async def _on_event(self, event: Event):
+        """Store the event, so that it has an offset, before publishing it to subscribers"""
+        stored = await self._event_store.append(event)
+        await self._pub_sub(stored)
+
+    async def on_worker_event(self, kind: str, source: str | None, event_json: str):
+        """Store and publish an event forwarded from the worker process"""
+        stored = await self._event_store.append_record(
+            kind, source, json.loads(event_json)
+        )
+        await self._pub_sub(stored)
 
     async def pause(self):
+        if self.worker:
+            await self.worker.call("pause", self.stored.id)
+            return
         async with self._lock:
             if self._conversation:
-                loop = asyncio.get_running_loop()
-                asyncio.create_task(loop.run_in_executor(None, self._conversation.pause))
+                asyncio.create_task(self.executor.control(self._conversation.pause))
 
     async def close(self):
-         async with self._lock:
+        if self.worker:
+            await self.worker.call("close", self.stored.id)
+            return
+        async with self._lock:
             if self._conversation:
-                loop = asyncio.get_running_loop()
-                asyncio.create_task(loop.run_in_executor(None, self._conversation.close))
+                asyncio.create_task(self.executor.control(self._conversation.close))
 
     async def send_message(self, message: Message):
+        if self.worker:
+            await self.worker.call(
+                "send_message", self.stored.id, message.model_dump_json()
+            )
+            return
         async with self._lock:
-            loop = asyncio.get_running_loop()
-            asyncio.create_task(loop.run_in_executor(None, self._conversation.send_message, message))
-
-    def subscribe(self, callback: AsyncConversationCallback) -> UUID:
-        return self._pub_sub.subscribe(callback)
+            asyncio.create_task(
+                self.executor.control(self._conversation.send_message, message)
+            )
+
+    def subscribe(
+        self,
+        callback: AsyncConversationCallback,
+        overflow_policy: OverflowPolicy | None = None,
+        on_disconnect: Callable[[], None] | None = None,
+    ) -> UUID:
+        return self._pub_sub.subscribe(
+            callback, overflow_policy=overflow_policy, on_disconnect=on_disconnect
+        )
 
     def unsubscribe(self, callback_id: UUID) -> bool:
         return self._pub_sub.unsubscribe(callback_id)
 
+    def get_subscriber_stats(self) -> list[SubscriberStats]:
+        return self._pub_sub.get_stats()
+
     async def get_status(self) -> ConversationStatus:
+        if self.worker:
+            try:
+                return ConversationStatus(
+                    await self.worker.call("get_status", self.stored.id)
+                )
+            except ConversationWorkerError:
+                return ConversationStatus.STOPPED
         async with self._lock:
             if not self._conversation:
                 return ConversationStatus.STOPPED
@@ -88,3 +189,16 @@ class LocalConversation:
                 if state.agent_finished:
                     return ConversationStatus.FINISHED
             return ConversationStatus.RUNNING
+
+
+def _write_atomic(path: Path, text: str):
+    """Write to a temp file and rename it into place, so that readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as file:
+        file.write(text)
+        # Without this, a crash soon after the rename may leave an empty file in its place
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(file.name, path)
@@ -1,10 +1,16 @@
-
-
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime
 from uuid import UUID
 
-from openhands_server.local_conversation.model import LocalConversationInfo, StartConversationRequest
-from openhands_server.sandboxed_conversation.sandboxed_conversation_models import LocalConversationPage
+from openhands_server.local_conversation.model import (
+    ConversationSortOrder,
+    LocalConversationInfo,
+    LocalConversationPage,
+    StartConversationRequest,
+    StoredEvent,
+)
+from openhands_server.utils.import_utils import get_impl
 
 
 class LocalConversationService(ABC):
@@ -16,52 +22,114 @@ class LocalConversationService(ABC):
     to another url or process.
     """
 
-    async def search_local_conversations(self, user_id: UUID, page_id: str | None = None, limit: int = 100) -> SandboxedConversationPage:
-        """Search for local conversations"""
-
+    @abstractmethod
+    async def search_local_conversations(
+        self,
+        title__contains: str | None = None,
+        created_at__gte: datetime | None = None,
+        created_at__lt: datetime | None = None,
+        sort_order: ConversationSortOrder = ConversationSortOrder.CREATED_AT_DESC,
+        page_id: str | None = None,
+        limit: int = 100,
+    ) -> LocalConversationPage:
+        """Search for local conversations. A page_id is only valid for the sort order it was
+        returned with"""
 
-    async def get_local_conversation(self, user_id: UUID, conversation_id: UUID) -> SandboxedConversationInfo:
+    @abstractmethod
+    async def get_local_conversation(
+        self, conversation_id: UUID
+    ) -> LocalConversationInfo | None:
         """Get a single local conversation info. Return None if the conversation was not found."""
 
-
-    async def batch_get_local_conversations(self, conversation_ids: list[UUID]) -> list[SandboxedConversationInfo | None]:
+    @abstractmethod
+    async def batch_get_local_conversations(
+        self, conversation_ids: list[UUID]
+    ) -> list[LocalConversationInfo | None]:
         """Get a batch of local conversations. Return None for any conversation which was not found."""
 
+    # Events
+
+    @abstractmethod
+    async def read_events(
+        self, conversation_id: UUID, offset: int = 0, limit: int = 100
+    ) -> list[StoredEvent] | None:
+        """Read events of a conversation starting at the offset given. Return None if the conversation was not found."""
+
+    @abstractmethod
+    async def iter_events(
+        self,
+        conversation_id: UUID,
+        offset: int | None = None,
+        limit: int = 100,
+        kind__eq: str | None = None,
+        source__eq: str | None = None,
+        reverse: bool = False,
+    ) -> AsyncIterator[StoredEvent] | None:
+        """Get an iterator over the events of a conversation matching the filters given, starting at
+        offset and moving forwards (Or backwards if reverse is set). Return None if the conversation was
+        not found."""
+
+    @abstractmethod
+    async def subscribe_to_events(
+        self,
+        conversation_id: UUID,
+        callback: Callable[[StoredEvent], Awaitable[None]],
+        on_disconnect: Callable[[], None] | None = None,
+    ) -> UUID | None:
+        """Subscribe to new events of a running conversation. Return None if the conversation is not running.
+        on_disconnect is invoked if the subscriber falls too far behind and is disconnected."""
+
+    @abstractmethod
+    async def unsubscribe_from_events(
+        self, conversation_id: UUID, subscriber_id: UUID
+    ) -> bool:
+        """Unsubscribe from the events of a conversation"""
 
     # Write Methods
 
-    async def start_local_conversation(self, request: StartSandboxedConversationRequest) -> UUID:
-        """ Start a local conversation and return its id. """
+    @abstractmethod
+    async def start_local_conversation(self, request: StartConversationRequest) -> UUID:
+        """Start a local conversation and return its id. The run may be QUEUED until a slot is free."""
 
+    @abstractmethod
     async def pause_local_conversation(self, conversation_id: UUID) -> bool:
-        """ Pause a local conversation. """
+        """Pause a local conversation (Or remove it from the queue if QUEUED)."""
 
+    @abstractmethod
     async def resume_local_conversation(self, conversation_id: UUID) -> bool:
-        """ Resume a local conversation. """
+        """Resume a local conversation, loading it if it was not running (e.g.: after a restart).
+        Return False if the conversation was not found."""
 
+    @abstractmethod
     async def delete_local_conversation(self, conversation_id: UUID) -> bool:
-        """ Delete a local conversation. Stop it if it is running. """
+        """Delete a local conversation. Stop it if it is running. Return False if the
+        conversation was not found."""
 
     # Lifecycle methods
 
-    async def __aenter__():
-        """Start using this runtime image service"""
+    @abstractmethod
+    async def __aenter__(self):
+        """Start using this local conversation service"""
 
-    async def __aexit__():
-        """Stop using this runtime image service"""
+    @abstractmethod
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Stop using this local conversation service"""
 
     @classmethod
     @abstractmethod
     def get_instance(cls) -> "LocalConversationService":
-        """ Get an instance of runtime image service """
+        """Get an instance of local conversation service"""
 
 
 _local_conversation_service = None
+# Named rather than imported, as the implementation imports this module
+_DEFAULT_IMPL = "openhands_server.local_conversation.default_local_conversation_manager.DefaultLocalConversationService"
 
 
-def get_default_local_conversation_service():
+def get_default_local_conversation_service() -> LocalConversationService:
     global _local_conversation_service
     if _local_conversation_service:
         return _local_conversation_service
-    _local_conversation_service = get_impl(LocalConversationService)
+    impl = get_impl(LocalConversationService, _DEFAULT_IMPL)
+    _local_conversation_service = impl.get_instance()
     return _local_conversation_service
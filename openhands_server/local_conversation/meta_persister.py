@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+if TYPE_CHECKING:
+    from openhands_server.local_conversation.local_conversation import (
+        LocalConversation,
+    )
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MetaPersister:
+    """
+    Write behind persistence for conversation metadata. Changes to a conversation are
+    coalesced, so that it is written at most once per debounce window however many events
+    arrive in that window. Pending writes must be flushed before a conversation is paused or
+    the service shuts down.
+    """
+
+    # Invoked to write a conversation
+    save: Callable[["LocalConversation"], Awaitable[None]]
+    debounce: float = 1
+    _dirty: dict[UUID, "LocalConversation"] = field(default_factory=dict, init=False)
+    _tasks: dict[UUID, asyncio.Task] = field(default_factory=dict, init=False)
+    # Serializes writes, so that a flush waits for any write already in progress
+    _locks: dict[UUID, asyncio.Lock] = field(default_factory=dict, init=False)
+
+    def mark_dirty(self, conversation: "LocalConversation"):
+        """Schedule a write of the conversation, unless one is already pending"""
+        conversation_id = conversation.stored.id
+        self._dirty[conversation_id] = conversation
+        if conversation_id not in self._tasks:
+            self._tasks[conversation_id] = asyncio.create_task(
+                self._write_later(conversation_id)
+            )
+
+    async def _write_later(self, conversation_id: UUID):
+        await asyncio.sleep(self.debounce)
+        # Remove the task before writing, so that changes made during the write are not lost
+        self._tasks.pop(conversation_id, None)
+        await self._write(conversation_id)
+
+    async def _write(self, conversation_id: UUID):
+        async with self._locks.setdefault(conversation_id, asyncio.Lock()):
+            conversation = self._dirty.pop(conversation_id, None)
+            if conversation is None:
+                return
+            try:
+                await self.save(conversation)
+            except Exception:
+                logger.exception(f"conversation_meta_write_failed:{conversation_id}")
+
+    async def flush(self, conversation_id: UUID):
+        """Write any pending changes to the conversation immediately"""
+        task = self._tasks.pop(conversation_id, None)
+        if task:
+            task.cancel()
+        await self._write(conversation_id)
+
+    async def flush_all(self):
+        for conversation_id in list(self._dirty):
+            await self.flush(conversation_id)
+
+    def discard(self, conversation_id: UUID):
+        """Drop any pending changes to the conversation (e.g.: because it is being deleted)"""
+        task = self._tasks.pop(conversation_id, None)
+        if task:
+            task.cancel()
+        self._dirty.pop(conversation_id, None)
+        self._locks.pop(conversation_id, None)
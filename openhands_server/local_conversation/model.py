@@ -1,25 +1,41 @@
-
-
 from datetime import UTC, datetime
 from enum import Enum
+from typing import Any
 from uuid import UUID
+
 from pydantic import BaseModel, Field
 
 from openhands_server.local_conversation.agent_info import AgentInfo
-from openhands_server.local_conversation.tool import ToolInfo
 
 
 # TODO: Review these status with Calvin & Xingyao
 class ConversationStatus(Enum):
-    RUNNING = 'RUNNING'
-    PAUSED = 'PAUSED'
-    FINISHED = 'FINISHED'
-    STOPPED = 'STOPPED'
+    RUNNING = "RUNNING"
+    PAUSED = "PAUSED"
+    FINISHED = "FINISHED"
+    STOPPED = "STOPPED"
+    # Waiting for the scheduler to admit the run
+    QUEUED = "QUEUED"
+
+
+class ConversationSortOrder(Enum):
+    CREATED_AT = "CREATED_AT"
+    CREATED_AT_DESC = "CREATED_AT_DESC"
+    UPDATED_AT = "UPDATED_AT"
+    UPDATED_AT_DESC = "UPDATED_AT_DESC"
 
 
 class StartConversationRequest(BaseModel):
     title: str | None
     agent: AgentInfo
+    user_id: str | None = Field(
+        default=None,
+        description="User on whose behalf the conversation runs, for fair scheduling",
+    )
+    priority: int | None = Field(
+        default=None,
+        description="Runs with a higher priority are admitted first. Defaults to the priority of the user",
+    )
 
 
 class StoredLocalConversation(StartConversationRequest):
@@ -27,11 +43,30 @@ class StoredLocalConversation(StartConversationRequest):
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
+
 class LocalConversationInfo(StoredLocalConversation):
-    """ Information about a conversation running locally without a Runtime sandbox. """
+    """Information about a conversation running locally without a Runtime sandbox."""
+
     status: ConversationStatus = ConversationStatus.STOPPED
+    queue_position: int | None = Field(
+        default=None, description="Number of runs ahead of this conversation, if QUEUED"
+    )
 
 
 class LocalConversationPage(BaseModel):
     items: list[LocalConversationInfo]
     next_page_id: str | None = None
+
+
+class StoredEvent(BaseModel):
+    """An event of a conversation, with its position in the event log of the conversation."""
+
+    offset: int = Field(
+        description="Position of the event in the conversation, starting from 0"
+    )
+    kind: str = Field(description="Type of the event")
+    source: str | None = Field(
+        default=None, description="Origin of the event (e.g.: agent, user, environment)"
+    )
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    event: dict[str, Any]
@@ -1,50 +1,237 @@
 """Local Conversation router for OpenHands Server."""
 
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Annotated
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
 
-from openhands import get_impl, get_user_id
+from fastapi import (
+    APIRouter,
+    Header,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
 
-from openhands_server.local_conversation.service import LocalConversationService
-from openhands_server.local_conversation.model import LocalConversationInfo, LocalConversationPage
+from openhands_server.local_conversation.manager import (
+    LocalConversationService,
+    get_default_local_conversation_service,
+)
+from openhands_server.local_conversation.model import (
+    ConversationSortOrder,
+    LocalConversationInfo,
+    LocalConversationPage,
+    StartConversationRequest,
+    StoredEvent,
+)
 from openhands_server.utils.success import Success
 
-router = APIRouter(prefix="/local-conversations")
-local_conversation_service: LocalConversationService = get_impl(LocalConversationService)()
-router.lifespan(local_conversation_service)
+local_conversation_service: LocalConversationService = (
+    get_default_local_conversation_service()
+)
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    async with local_conversation_service:
+        yield
+
+
+router = APIRouter(prefix="/local-conversations", lifespan=_lifespan)
 
 # LocalConversations are not available in the outer nesting container. They do not currently have permissions
 # as all validation is through the session_api_key
 
 # Read methods
 
+
 @router.get("/search")
-async def search_local_conversations(page_id: str | None = None, limit: int = 100) -> LocalConversationPage:
+async def search_local_conversations(
+    title__contains: str | None = None,
+    created_at__gte: datetime | None = None,
+    created_at__lt: datetime | None = None,
+    sort_order: ConversationSortOrder = ConversationSortOrder.CREATED_AT_DESC,
+    page_id: str | None = None,
+    limit: int = 100,
+) -> LocalConversationPage:
     assert limit > 0
     assert limit <= 100
-    return await local_conversation_service.search_local_conversations(page_id, limit)
+    return await local_conversation_service.search_local_conversations(
+        title__contains=title__contains,
+        created_at__gte=created_at__gte,
+        created_at__lt=created_at__lt,
+        sort_order=sort_order,
+        page_id=page_id,
+        limit=limit,
+    )
 
 
 @router.get("/{id}")
 async def get_local_conversation(id: UUID) -> LocalConversationInfo:
-    local_conversation = await local_conversation_service.get_local_conversation(conversation_id)
+    local_conversation = await local_conversation_service.get_local_conversation(id)
     if local_conversation is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND)
     return local_conversation
 
 
 @router.get("/")
-async def batch_get_local_conversations(ids: list[UUID]) -> list[LocalConversationInfo | None]:
+async def batch_get_local_conversations(
+    ids: list[UUID],
+) -> list[LocalConversationInfo | None]:
     assert len(ids) < 100
-    local_conversations = await local_conversation_service.batch_get_local_conversations(ids)
+    local_conversations = (
+        await local_conversation_service.batch_get_local_conversations(ids)
+    )
     return local_conversations
 
 
+# Events
+
+# Number of stored events read at a time when replaying to a client
+EVENT_REPLAY_PAGE_SIZE = 100
+
+
+@router.get("/{id}/events")
+async def search_local_conversation_events(
+    id: UUID,
+    offset: Annotated[
+        int | None,
+        Query(
+            title="Offset of the first event (Defaults to the first event, or the last if reverse)",
+            ge=0,
+        ),
+    ] = None,
+    limit: Annotated[int, Query(title="The max number of events", gt=0, le=1000)] = 100,
+    kind__eq: str | None = None,
+    source__eq: str | None = None,
+    reverse: bool = False,
+) -> StreamingResponse:
+    """Page through the events of a conversation as newline delimited JSON. To get the next
+    page, pass the offset after the last event returned (Or before it, if reverse). A page with
+    fewer than limit events is the last."""
+    events = await local_conversation_service.iter_events(
+        id,
+        offset=offset,
+        limit=limit,
+        kind__eq=kind__eq,
+        source__eq=source__eq,
+        reverse=reverse,
+    )
+    if events is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    async def generate():
+        async for event in events:
+            yield event.model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+async def _iter_events(
+    conversation_id: UUID, offset: int
+) -> AsyncIterator[StoredEvent]:
+    """Yield the stored events of a conversation from the offset given, followed by live
+    events. Subscribing before the replay means no event is missed in between - any event
+    received both ways is only yielded once. Ends if the client falls too far behind."""
+    queue: asyncio.Queue[StoredEvent | None] = asyncio.Queue(maxsize=1)
+    subscriber_id = await local_conversation_service.subscribe_to_events(
+        conversation_id,
+        queue.put,
+        on_disconnect=lambda: asyncio.get_running_loop().create_task(queue.put(None)),
+    )
+    try:
+        while True:
+            events = await local_conversation_service.read_events(
+                conversation_id, offset, EVENT_REPLAY_PAGE_SIZE
+            )
+            for event in events or []:
+                yield event
+                offset = event.offset + 1
+            if not events or len(events) < EVENT_REPLAY_PAGE_SIZE:
+                break
+        if subscriber_id is None:
+            # Not running, so there will be no live events
+            return
+        while True:
+            event = await queue.get()
+            if event is None:
+                return
+            if event.offset < offset:
+                continue
+            yield event
+            offset = event.offset + 1
+    finally:
+        if subscriber_id is not None:
+            await local_conversation_service.unsubscribe_from_events(
+                conversation_id, subscriber_id
+            )
+
+
+@router.websocket("/{id}/events/socket")
+async def stream_local_conversation_events_socket(
+    websocket: WebSocket, id: UUID, offset: int = 0
+):
+    """Stream events of a conversation as JSON text messages, starting from the offset given
+    (The offset after the last event seen when reconnecting)"""
+    if await local_conversation_service.read_events(id, offset, 0) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async def send_events():
+        async for event in _iter_events(id, offset):
+            await websocket.send_text(event.model_dump_json())
+
+    async def wait_for_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(wait_for_disconnect())
+    done, pending = await asyncio.wait(
+        {sender, receiver}, return_when=asyncio.FIRST_COMPLETED
+    )
+    for task in pending:
+        task.cancel()
+    if sender in done:
+        # The stream ended (Conversation not running or client too slow)
+        await websocket.close()
+
+
+@router.get("/{id}/events/stream")
+async def stream_local_conversation_events(
+    id: UUID,
+    offset: int = 0,
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """Server sent events fallback for the events socket. Browsers reconnect with a
+    Last-Event-ID header, which takes precedence over the offset"""
+    if await local_conversation_service.read_events(id, offset, 0) is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id) + 1
+
+    async def generate():
+        async for event in _iter_events(id, offset):
+            yield f"id: {event.offset}\nevent: {event.kind}\ndata: {event.model_dump_json()}\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
 # Write Methods
 
+
 @router.post("/")
-async def start_local_conversation() -> UUID:
-    id = await local_conversation_service.start_local_conversation()
+async def start_local_conversation(request: StartConversationRequest) -> UUID:
+    id = await local_conversation_service.start_local_conversation(request)
     return id
 
 
@@ -52,14 +239,15 @@ async def start_local_conversation() -> UUID:
 async def pause_local_conversation(id: UUID) -> Success:
     paused = await local_conversation_service.pause_local_conversation(id)
     if not paused:
-        raise HTTPException(status.HTTP_400_BAD_REQUEST) 
+        raise HTTPException(status.HTTP_400_BAD_REQUEST)
     return Success()
 
+
 @router.post("/{id}/resume")
 async def resume_local_conversation(id: UUID) -> Success:
     paused = await local_conversation_service.resume_local_conversation(id)
     if not paused:
-        raise HTTPException(status.HTTP_400_BAD_REQUEST) 
+        raise HTTPException(status.HTTP_400_BAD_REQUEST)
     return Success()
 
 
@@ -67,5 +255,5 @@ async def resume_local_conversation(id: UUID) -> Success:
 async def delete_local_conversation(id: UUID) -> Success:
     deleted = await local_conversation_service.delete_local_conversation(id)
     if not deleted:
-        raise HTTPException(status.HTTP_400_BAD_REQUEST) 
+        raise HTTPException(status.HTTP_400_BAD_REQUEST)
     return Success()
@@ -6,8 +6,10 @@ from uuid import UUID
 from fastapi import APIRouter
 
 from openhands.sdk.utils.async_utils import AsyncCallbackWrapper
+from openhands_server.local_conversation.conversation_executor import (
+    get_default_conversation_executor,
+)
 from openhands_server.models.conversation_start_request import ConversationStartRequest
-from openhands_server.utils.conversation_executor import ConversationExecutor
 from openhands_server.utils.pub_sub import PubSub
 
 router = APIRouter(prefix="/conversation", tags=["conversations"])
@@ -40,8 +42,8 @@ async def start_conversation(request: ConversationStartRequest):
     
     pubsub = PubSub()
     conversation = request.create_conversation(cwd, [AsyncCallbackWrapper(pubsub)])
-    conversation_executor = ConversationExecutor(conversation, pubsub)
-    asyncio.create_task(conversation_executor.run_async)
+    # Run on the shared conversation executor, rather than the default executor
+    asyncio.create_task(get_default_conversation_executor().run(conversation.run))
 
 
 @router.post("/pause/{id}")
@@ -0,0 +1,45 @@
+import logging
+from dataclasses import dataclass, field
+
+from docker.errors import APIError
+
+from openhands_server.sandbox.docker_sandbox_cache import DockerSandboxCache
+from openhands_server.sandbox.port_allocator import PortAllocator
+from openhands_server.sandbox.sandbox_delete_queue import SandboxDeleteQueue
+from openhands_server.utils.async_docker import AsyncDocker, get_default_async_docker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DockerHost:
+    """
+    A docker daemon on which sandboxes may be placed. Each host has its own docker access
+    layer, port range, sandbox cache and delete pipeline. The cache and delete pipeline are
+    created by the sandbox service which owns the host.
+    """
+
+    name: str = "local"
+    async_docker: AsyncDocker = field(default_factory=get_default_async_docker)
+    # Pattern for urls of sandboxes on this host, and the address used to probe their readiness
+    exposed_url_pattern: str = "http://localhost:{port}"
+    readiness_host: str = "localhost"
+    port_allocator: PortAllocator = field(default_factory=PortAllocator)
+    # Upper bound on the number of sandboxes placed on this host (None for no limit)
+    max_sandboxes: int | None = None
+    cache: DockerSandboxCache | None = field(default=None, init=False)
+    delete_queue: SandboxDeleteQueue | None = field(default=None, init=False)
+    cpus: float = field(default=0, init=False)
+    memory: int = field(default=0, init=False)
+
+    async def load_capacity(self):
+        """Load the number of cpus and total memory from the daemon"""
+        try:
+            info = await self.async_docker.run(
+                (await self.async_docker.ensure_client()).info
+            )
+        except APIError:
+            logger.exception(f"docker_host_info_failed:{self.name}")
+            return
+        self.cpus = float(info.get("NCPU") or 0)
+        self.memory = int(info.get("MemTotal") or 0)
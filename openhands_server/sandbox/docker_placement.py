@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class HostLoad:
+    """Capacity and current load of a docker host, used when placing new sandboxes"""
+
+    name: str
+    cpus: float
+    memory: int
+    cpus_reserved: float = 0
+    memory_reserved: int = 0
+    sandbox_count: int = 0
+    max_sandboxes: int | None = None
+
+    def fits(self, cpus: float, memory: int) -> bool:
+        if self.max_sandboxes is not None and self.sandbox_count >= self.max_sandboxes:
+            return False
+        return (
+            self.cpus_reserved + cpus <= self.cpus
+            and self.memory_reserved + memory <= self.memory
+        )
+
+    def free_fraction_after(self, cpus: float, memory: int) -> float:
+        """Fraction of the scarcer resource which would remain free after placing a sandbox"""
+        cpu_free = (
+            (self.cpus - self.cpus_reserved - cpus) / self.cpus if self.cpus else 0
+        )
+        memory_free = (
+            (self.memory - self.memory_reserved - memory) / self.memory
+            if self.memory
+            else 0
+        )
+        return min(cpu_free, memory_free)
+
+
+def choose_host(loads: list[HostLoad], cpus: float, memory: int) -> str | None:
+    """
+    Choose a host for a new sandbox requiring the cpus and memory given, returning None if no
+    host has room. Hosts are bin packed (best fit): the host which would be left with the least
+    free capacity is chosen, so that large sandboxes can still be placed on emptier hosts.
+    Ties go to the host running the fewest sandboxes.
+    """
+    candidates = [load for load in loads if load.fits(cpus, memory)]
+    if not candidates:
+        return None
+    best = min(
+        candidates,
+        key=lambda load: (load.free_fraction_after(cpus, memory), load.sandbox_count),
+    )
+    return best.name
@@ -0,0 +1,257 @@
+import asyncio
+import itertools
+import logging
+from bisect import bisect_left, insort
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import UUID
+
+from docker.errors import APIError, NotFound
+
+from openhands_server.sandbox.sandbox_models import SandboxInfo
+from openhands_server.utils.async_docker import AsyncDocker
+from openhands_server.utils.docker_events import DockerEventStream
+from openhands_server.utils.page_cursor import PageCursor, page_newest_first
+
+logger = logging.getLogger(__name__)
+
+# Label applied to every container created by the sandbox service, so that listings and
+# event subscriptions can be filtered by the daemon rather than in python
+MANAGED_LABEL = "openhands.managed"
+
+# Container events which change the info we report for a sandbox
+_CONTAINER_EVENTS = ["create", "start", "pause", "unpause", "die", "destroy", "rename"]
+
+
+@dataclass
+class DockerSandboxCache:
+    """
+    In memory cache of SandboxInfo for the sandboxes on a docker host. The cache is loaded
+    with a full listing of containers on startup, after which it is kept current by following
+    the docker events stream. A full resync is run periodically (And whenever the event stream
+    reconnects) to correct any drift. Each write is versioned by when it started reading from
+    the daemon, so a resync which started listing before a refresh (Or a removal) does not
+    overwrite it with an older view. Sandboxes are indexed by user and sorted by
+    (created_at, id), so a page of the sandboxes of a user is found by seeking to its cursor -
+    the cost scales with the page size rather than the number of containers on the host.
+    """
+
+    async_docker: AsyncDocker
+    # Converts a docker container to SandboxInfo, returning None for containers which are not sandboxes
+    to_sandbox_info: Callable[[Any], SandboxInfo | None]
+    resync_interval: float = 300
+    # Name prefixes of sandbox containers, which are also listed by name so that containers
+    # created before the managed label was applied are still found. Events are filtered by
+    # label, so changes to these containers are picked up on refresh or resync
+    legacy_name_prefixes: list[str] = field(default_factory=list)
+    _sandboxes: dict[UUID, SandboxInfo] = field(default_factory=dict, init=False)
+    # Docker container id to sandbox id, so that destroyed containers can be discarded
+    _sandbox_ids: dict[str, UUID] = field(default_factory=dict, init=False)
+    # Sorted keys of all sandboxes and of the sandboxes of each user
+    _keys: list[PageCursor] = field(default_factory=list, init=False)
+    _user_keys: dict[str, list[PageCursor]] = field(default_factory=dict, init=False)
+    # Version of the write which last changed each sandbox (Kept after the sandbox is removed,
+    # until the next resync, so that stale writes cannot bring it back)
+    _versions: dict[UUID, int] = field(default_factory=dict, init=False)
+    _version_counter: itertools.count = field(
+        default_factory=itertools.count, init=False
+    )
+    _loaded: asyncio.Event = field(default_factory=asyncio.Event, init=False)
+    _resync_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+    _event_stream: DockerEventStream | None = field(default=None, init=False)
+    _resync_task: asyncio.Task | None = field(default=None, init=False)
+
+    async def start(self):
+        if self._event_stream is not None:
+            return
+        self._event_stream = DockerEventStream(
+            async_docker=self.async_docker,
+            callback=self._on_event,
+            filters={
+                "type": "container",
+                "event": _CONTAINER_EVENTS,
+                "label": [f"{MANAGED_LABEL}=true"],
+            },
+            on_reconnect=self.resync,
+        )
+        await self._event_stream.start()
+        await self.resync()
+        self._resync_task = asyncio.create_task(self._resync_periodically())
+
+    async def stop(self):
+        if self._event_stream is not None:
+            await self._event_stream.stop()
+            self._event_stream = None
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+
+    async def list_containers(self) -> list[Any]:
+        """List the containers with the managed label, along with any unlabelled containers
+        matching the legacy name prefixes"""
+        containers = await self.async_docker.list_containers(
+            all=True, filters={"label": f"{MANAGED_LABEL}=true"}
+        )
+        container_ids = {container.id for container in containers}
+        for prefix in self.legacy_name_prefixes:
+            # The name filter matches anywhere in the name, so the prefix is checked here
+            for container in await self.async_docker.list_containers(
+                all=True, filters={"name": prefix}
+            ):
+                if container.id not in container_ids and container.name.startswith(
+                    prefix
+                ):
+                    container_ids.add(container.id)
+                    containers.append(container)
+        return containers
+
+    async def resync(self):
+        """Replace the content of the cache with a full listing from the daemon, keeping any
+        sandboxes changed since the listing started"""
+        async with self._resync_lock:
+            version = next(self._version_counter)
+            containers = await self.list_containers()
+            listed = []
+            for container in containers:
+                sandbox_info = self.to_sandbox_info(container)
+                if sandbox_info and self._versions.get(sandbox_info.id, -1) < version:
+                    listed.append((container.id, sandbox_info))
+            newer = {
+                container_id: self._sandboxes[sandbox_id]
+                for container_id, sandbox_id in self._sandbox_ids.items()
+                if self._versions.get(sandbox_id, -1) > version
+            }
+            self._versions = {
+                sandbox_id: sandbox_version
+                for sandbox_id, sandbox_version in self._versions.items()
+                if sandbox_version > version
+            }
+            self._sandboxes = {}
+            self._sandbox_ids = {}
+            self._keys = []
+            self._user_keys = {}
+            for container_id, sandbox_info in listed:
+                self._put(container_id, sandbox_info)
+                self._versions[sandbox_info.id] = version
+            for container_id, sandbox_info in newer.items():
+                self._put(container_id, sandbox_info)
+            self._loaded.set()
+
+    async def _resync_periodically(self):
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            try:
+                await self.resync()
+            except APIError:
+                logger.exception("sandbox_cache_resync_failed")
+
+    async def _ensure_loaded(self):
+        if not self._loaded.is_set():
+            await self.resync()
+
+    async def _on_event(self, event: dict):
+        actor = event.get("Actor") or {}
+        container_id = actor.get("ID") or event.get("id")
+        if not container_id:
+            return
+        if event.get("Action") == "destroy":
+            self._discard_container(container_id)
+            return
+        await self.refresh(container_id)
+
+    def _put(self, container_id: str, sandbox_info: SandboxInfo):
+        existing = self._sandboxes.get(sandbox_info.id)
+        if existing:
+            self._remove_keys(existing)
+        self._sandboxes[sandbox_info.id] = sandbox_info
+        self._sandbox_ids[container_id] = sandbox_info.id
+        key = _key(sandbox_info)
+        insort(self._keys, key)
+        insort(self._user_keys.setdefault(sandbox_info.user_id, []), key)
+
+    def _remove_keys(self, sandbox_info: SandboxInfo):
+        key = _key(sandbox_info)
+        _remove_sorted(self._keys, key)
+        user_keys = self._user_keys.get(sandbox_info.user_id)
+        if user_keys is not None:
+            _remove_sorted(user_keys, key)
+            if not user_keys:
+                del self._user_keys[sandbox_info.user_id]
+
+    def _discard_container(self, container_id: str, version: int | None = None):
+        sandbox_id = self._sandbox_ids.get(container_id)
+        if sandbox_id is None:
+            return
+        if version is None:
+            version = next(self._version_counter)
+        if self._versions.get(sandbox_id, -1) > version:
+            return
+        del self._sandbox_ids[container_id]
+        self._versions[sandbox_id] = version
+        sandbox_info = self._sandboxes.pop(sandbox_id, None)
+        if sandbox_info:
+            self._remove_keys(sandbox_info)
+
+    async def refresh(self, container_id: str) -> SandboxInfo | None:
+        """Reload the info for a single container (By docker id or name) from the daemon"""
+        version = next(self._version_counter)
+        try:
+            container = await self.async_docker.get_container(container_id)
+        except NotFound:
+            self._discard_container(container_id, version)
+            return None
+        sandbox_info = self.to_sandbox_info(container)
+        if sandbox_info is None:
+            self._discard_container(container.id, version)
+            return None
+        if self._versions.get(sandbox_info.id, -1) > version:
+            # Changed by a later write while this one was reading
+            return self._sandboxes.get(sandbox_info.id)
+        self._put(container.id, sandbox_info)
+        self._versions[sandbox_info.id] = version
+        return sandbox_info
+
+    def discard(self, id: UUID):
+        """Remove a sandbox from the cache"""
+        version = next(self._version_counter)
+        for container_id, sandbox_id in list(self._sandbox_ids.items()):
+            if sandbox_id == id:
+                self._discard_container(container_id, version)
+        # Even if not cached, so that a resync already listing does not add it
+        self._versions[id] = version
+
+    # Read methods
+
+    async def search(
+        self, user_id: str | None = None, page_id: str | None = None, limit: int = 100
+    ) -> tuple[list[SandboxInfo], str | None]:
+        """Get a page of sandboxes, newest first, optionally filtered by user. Return the
+        sandboxes and the id of the next page"""
+        await self._ensure_loaded()
+        keys = self._keys if user_id is None else self._user_keys.get(user_id, [])
+        page, next_page_id = page_newest_first(keys, page_id, limit)
+        sandboxes = [self._sandboxes[UUID(key.id)] for key in page]
+        return sandboxes, next_page_id
+
+    async def all(self) -> list[SandboxInfo]:
+        await self._ensure_loaded()
+        return list(self._sandboxes.values())
+
+    async def get(self, id: UUID) -> SandboxInfo | None:
+        await self._ensure_loaded()
+        return self._sandboxes.get(id)
+
+    async def batch_get(self, ids: list[UUID]) -> list[SandboxInfo | None]:
+        await self._ensure_loaded()
+        return [self._sandboxes.get(id) for id in ids]
+
+
+def _key(sandbox_info: SandboxInfo) -> PageCursor:
+    return PageCursor(sandbox_info.created_at, str(sandbox_info.id))
+
+
+def _remove_sorted(keys: list[PageCursor], key: PageCursor):
+    index = bisect_left(keys, key)
+    if index < len(keys) and keys[index] == key:
+        del keys[index]
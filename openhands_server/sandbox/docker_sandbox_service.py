@@ -1,90 +1,375 @@
-
 import asyncio
+import heapq
+import logging
 import secrets
-import socket
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
 from uuid import UUID, uuid4
 
-import docker
-from docker.errors import APIError, NotFound
+from docker.errors import APIError, ContainerError, ImageNotFound, NotFound
 from pydantic import SecretStr
 
+from openhands_server.sandbox.docker_host import DockerHost
+from openhands_server.sandbox.docker_placement import HostLoad, choose_host
+from openhands_server.sandbox.docker_sandbox_cache import (
+    MANAGED_LABEL,
+    DockerSandboxCache,
+)
+from openhands_server.sandbox.sandbox_delete_queue import SandboxDeleteQueue
+from openhands_server.sandbox.sandbox_errors import SandboxError
 from openhands_server.sandbox.sandbox_models import (
+    DeleteQueueStats,
+    IdleReaperStats,
     SandboxInfo,
     SandboxPage,
+    SandboxServiceStats,
+    SandboxSnapshotInfo,
     SandboxStatus,
+    WarmPoolStats,
 )
+from openhands_server.sandbox.sandbox_reaper import SandboxIdleReaper
 from openhands_server.sandbox.sandbox_service import (
     SandboxService,
 )
-from openhands_server.sandbox_spec.docker_sandbox_spec_service import DockerSandboxSpecService
-from openhands_server.sandbox_spec.sandbox_spec_service import (
-    get_default_sandbox_spec_service,
+from openhands_server.sandbox_spec.docker_sandbox_spec_service import (
+    DockerSandboxSpecService,
 )
+from openhands_server.sandbox_spec.sandbox_spec_models import (
+    SandboxResourceProfile,
+    SandboxSpecInfo,
+    SandboxSpecStatus,
+)
+from openhands_server.utils.date_utils import utc_now
+from openhands_server.utils.metrics import Histogram, HistogramInfo
+from openhands_server.utils.page_cursor import PageCursor
+
+logger = logging.getLogger(__name__)
+
+# Labels applied to snapshot images
+SNAPSHOT_LABEL = "openhands.snapshot_id"
+SNAPSHOT_OF_LABEL = "openhands.snapshot_of"
+# Label applied to workspace template volumes
+TEMPLATE_LABEL = "openhands.template_of"
+# Label applied to the volume recording the owner of a sandbox claimed from the warm pool
+CLAIM_LABEL = "openhands.claim_of"
+# Exit codes of a container stopped by SIGTERM or SIGKILL
+_STOPPED_EXIT_CODES = (0, 128 + 9, 128 + 15)
+
 
 @dataclass
 class VolumeMount:
+    """Additional mount for every sandbox (e.g.: A read only package cache). host_path may be a
+    path on the docker host or the name of a volume"""
+
     host_path: str
     container_path: str
-    mode: str = 'rw'
+    mode: str = "rw"
+
+
+@dataclass
+class WorkspaceTemplate:
+    """Initial content for the workspace of sandboxes. The template volume is populated once on
+    each host by running setup_command in the sandbox spec image with the volume mounted at the
+    working dir, and is then copied into the workspace of each new sandbox"""
+
+    volume: str
+    setup_command: str | list[str] | None = None
 
 
 @dataclass
 class ExposedPort:
-    """Exposed port. A free port will be found for this and an environment variable set"""
+    """Exposed port. A host port will be leased for this and an environment variable set"""
+
     name: str
     description: str
 
 
 @dataclass
 class DockerSandboxService(SandboxService):
-
-    client: docker.DockerClient = field(default=None)
+    # Docker daemons on which sandboxes are placed
+    hosts: list[DockerHost] = field(default_factory=lambda: [DockerHost()])
     container_name_prefix: str = "openhands-runtime-"
-    exposed_url_pattern: str = "http://localhost:{port}"
-    sandbox_spec_service: DockerSandboxSpecService = field(default_factory=DockerSandboxSpecService.get_instance)
+    sandbox_spec_service: DockerSandboxSpecService = field(
+        default_factory=DockerSandboxSpecService.get_instance
+    )
     mounts: list[VolumeMount] = field(default_factory=list)
-    exposed_port: list[ExposedPort] = field(default_factory=lambda: [
-        ExposedPort("APPLICATION_SERVER_PORT", 'The port on which the application server runs within the container')
-    ])
-
-    def _get_client(self) -> docker.DockerClient:
-        """Get Docker client, creating it if necessary"""
-        if self.client is None:
-            self.client = docker.from_env()
-        return self.client
-
-    def _find_unused_port(self) -> int:
-        """Find an unused port on the host machine"""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(('', 0))
-            s.listen(1)
-            port = s.getsockname()[1]
-        return port
+    exposed_port: list[ExposedPort] = field(
+        default_factory=lambda: [
+            ExposedPort(
+                "APPLICATION_SERVER_PORT",
+                "The port on which the application server runs within the container",
+            )
+        ]
+    )
+    # Resources assumed when placing sandboxes which have no cpu / memory limit
+    sandbox_cpus: float = 1
+    sandbox_memory: int = 2 * 1024**3
+    warm_container_name_prefix: str = "openhands-warm-"
+    # Number of pre-started, unassigned sandboxes to keep for each sandbox spec id
+    warm_pool_sizes: dict[str, int] = field(default_factory=dict)
+    # Warm sandboxes for each spec, as (host name, container id)
+    _warm_pool: dict[str, deque[tuple[str, UUID]]] = field(
+        default_factory=dict, init=False
+    )
+    _warm_pool_stats: WarmPoolStats = field(default_factory=WarmPoolStats, init=False)
+    _refill_tasks: dict[str, asyncio.Task] = field(default_factory=dict, init=False)
+    # Docker labels are immutable once a container is created, so the owner of a sandbox
+    # claimed from the warm pool is recorded in the labels of a companion claim volume, and
+    # loaded from these on startup
+    _claimed_owners: dict[UUID, str] = field(default_factory=dict, init=False)
+    # Seconds between full resyncs of the sandbox cache with the daemon
+    cache_resync_interval: float = 300
+    # Seconds without activity after which a sandbox is paused / stopped / deleted (None to disable)
+    idle_pause_after: float | None = None
+    idle_stop_after: float | None = None
+    idle_delete_after: float | None = None
+    idle_check_interval: float = 60
+    _idle_reaper: SandboxIdleReaper = field(init=False)
+    # Network bytes in + out of each sandbox when its activity was last sampled
+    _network_bytes: dict[UUID, int] = field(default_factory=dict, init=False)
+    # Readiness probe against the application server of new sandboxes. The sandbox is ready once
+    # a GET of readiness_path returns a 2xx status
+    readiness_path: str = "/alive"
+    readiness_timeout: float = 120
+    readiness_initial_delay: float = 0.1
+    readiness_max_delay: float = 2
+    _starting: set[UUID] = field(default_factory=set, init=False)
+    _readiness_failed: set[UUID] = field(default_factory=set, init=False)
+    _readiness_tasks: set[asyncio.Task] = field(default_factory=set, init=False)
+    _startup_latency: dict[str, dict[str, Histogram]] = field(
+        default_factory=dict, init=False
+    )
+    # Kill containers on delete rather than waiting for a graceful stop
+    delete_kill: bool = False
+    delete_volume_batch_size: int = 16
+    delete_max_attempts: int = 5
+    _deleting: set[UUID] = field(default_factory=set, init=False)
+    # Sandboxes whose containers are stopped (exited), which hold no cpu or memory
+    _stopped: set[UUID] = field(default_factory=set, init=False)
+    # Resources of sandboxes placed on each host but not yet counted in its load, as
+    # (host name, cpus, memory). Placement is serialized, so concurrent starts see each other
+    _placing: list[tuple[str, float, int]] = field(default_factory=list, init=False)
+    _placement_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+    # Host ports leased to each sandbox, so they can be released even if its container is
+    # already gone by the time it is deleted
+    _sandbox_ports: dict[UUID, list[int]] = field(default_factory=dict, init=False)
+    # Repository for images committed from sandboxes, and the image used to copy volumes
+    snapshot_repository: str = "openhands-snapshot"
+    volume_helper_image: str = "busybox:latest"
+    # Copy volumes with `cp --reflink=auto`, so that copies are copy on write where the docker
+    # host filesystem supports it (btrfs / xfs). Requires a helper image with GNU cp (e.g.: debian)
+    volume_helper_reflink: bool = False
+    # Workspace templates by sandbox spec id
+    workspace_templates: dict[str, WorkspaceTemplate] = field(default_factory=dict)
+    _template_locks: dict[tuple[str, str], asyncio.Lock] = field(
+        default_factory=dict, init=False
+    )
+
+    def __post_init__(self):
+        assert self.hosts
+        assert len({host.name for host in self.hosts}) == len(self.hosts)
+        if not self.sandbox_spec_service.prewarm_hosts:
+            self.sandbox_spec_service.prewarm_hosts = [
+                host.async_docker for host in self.hosts
+            ]
+        for host in self.hosts:
+            host.cache = DockerSandboxCache(
+                async_docker=host.async_docker,
+                to_sandbox_info=self._container_to_runtime_info_fn(host),
+                resync_interval=self.cache_resync_interval,
+                legacy_name_prefixes=[
+                    self.container_name_prefix,
+                    self.warm_container_name_prefix,
+                ],
+            )
+            host.delete_queue = SandboxDeleteQueue(
+                async_docker=host.async_docker,
+                on_container_removed=self._on_container_removed_fn(host),
+                on_done=self._on_delete_done,
+                kill=self.delete_kill,
+                volume_batch_size=self.delete_volume_batch_size,
+                max_attempts=self.delete_max_attempts,
+            )
+        self._idle_reaper = SandboxIdleReaper(
+            sandbox_service=self,
+            pause_after=self.idle_pause_after,
+            stop_after=self.idle_stop_after,
+            delete_after=self.idle_delete_after,
+            check_interval=self.idle_check_interval,
+        )
+
+    # Hosts
+
+    def _get_host(self, name: str) -> DockerHost | None:
+        for host in self.hosts:
+            if host.name == name:
+                return host
+        return None
+
+    async def _find_host(self, id: UUID) -> DockerHost | None:
+        """Find the host on which a sandbox was placed"""
+        for host in self.hosts:
+            if await host.cache.get(id):
+                return host
+        return None
+
+    def _requested_resources(
+        self, resources: SandboxResourceProfile
+    ) -> tuple[float, int]:
+        """Get the cpus and memory to reserve for a sandbox with the limits given, falling
+        back to the defaults for any which are unlimited"""
+        return (
+            resources.cpus or self.sandbox_cpus,
+            resources.memory or self.sandbox_memory,
+        )
+
+    async def _get_host_load(self, host: DockerHost) -> HostLoad:
+        if not host.cpus:
+            await host.load_capacity()
+        load = HostLoad(
+            name=host.name,
+            cpus=host.cpus,
+            memory=host.memory,
+            max_sandboxes=host.max_sandboxes,
+        )
+        for sandbox_info in await host.cache.all():
+            # Stopped sandboxes release their resources, but paused ones keep memory resident
+            if sandbox_info.status in (SandboxStatus.DELETING, SandboxStatus.ERROR):
+                continue
+            if sandbox_info.id in self._stopped:
+                continue
+            cpus, memory = self._requested_resources(sandbox_info.resources)
+            load.cpus_reserved += cpus
+            load.memory_reserved += memory
+            load.sandbox_count += 1
+        warm_count = sum(
+            1
+            for pool in self._warm_pool.values()
+            for host_name, _ in pool
+            if host_name == host.name
+        )
+        # Warm sandboxes are assumed to have the default resources
+        load.cpus_reserved += warm_count * self.sandbox_cpus
+        load.memory_reserved += warm_count * self.sandbox_memory
+        load.sandbox_count += warm_count
+        for host_name, cpus, memory in self._placing:
+            if host_name == host.name:
+                load.cpus_reserved += cpus
+                load.memory_reserved += memory
+                load.sandbox_count += 1
+        return load
+
+    @asynccontextmanager
+    async def _place(self, cpus: float, memory: int) -> AsyncIterator[DockerHost]:
+        """Choose the host for a new sandbox. Its resources are reserved on the host until the
+        context exits, by which time the sandbox must be counted in the load of the host"""
+        if len(self.hosts) == 1:
+            yield self.hosts[0]
+            return
+        async with self._placement_lock:
+            loads = await asyncio.gather(
+                *(self._get_host_load(host) for host in self.hosts)
+            )
+            host_name = choose_host(list(loads), cpus, memory)
+            if host_name is None:
+                raise SandboxError("No docker host has capacity for a new sandbox")
+            placing = (host_name, cpus, memory)
+            self._placing.append(placing)
+        try:
+            yield self._get_host(host_name)
+        finally:
+            self._placing.remove(placing)
+
+    # Ports
+
+    def _container_host_ports(self, container) -> list[int]:
+        """Get the host ports bound by a container"""
+        port_bindings = container.attrs.get("HostConfig", {}).get("PortBindings") or {}
+        host_ports = []
+        for host_bindings in port_bindings.values():
+            for host_binding in host_bindings or []:
+                try:
+                    host_ports.append(int(host_binding["HostPort"]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+        return host_ports
+
+    def _release_sandbox_ports(self, host: DockerHost, id: UUID, container=None):
+        """Release the ports leased to a sandbox, using those recorded when it was started or
+        loaded, or failing that the bindings of its container"""
+        host_ports = self._sandbox_ports.pop(id, None)
+        if host_ports is None:
+            host_ports = (
+                self._container_host_ports(container) if container is not None else []
+            )
+        for host_port in host_ports:
+            host.port_allocator.release(host_port)
+
+    async def _load_port_leases(self, host: DockerHost):
+        """Rebuild port leases from the port bindings of existing containers"""
+        containers = await host.cache.list_containers()
+        host_ports = []
+        for container in containers:
+            container_host_ports = self._container_host_ports(container)
+            host_ports.extend(container_host_ports)
+            container_id = self._runtime_id_from_container_name(container.name)
+            if container_id is None and container.name.startswith(
+                self.warm_container_name_prefix
+            ):
+                try:
+                    container_id = UUID(
+                        container.name[len(self.warm_container_name_prefix) :]
+                    )
+                except ValueError:
+                    pass
+            if container_id is not None:
+                self._sandbox_ports[container_id] = container_host_ports
+        host.port_allocator.reset(host_ports)
 
     def _container_name_from_id(self, container_id: UUID) -> str:
         """Generate container name from UUID"""
         return f"{self.container_name_prefix}{container_id}"
 
+    def _claim_volume_name_from_id(self, container_id: UUID) -> str:
+        """Generate the name of the claim volume of a sandbox claimed from the warm pool"""
+        return f"openhands-claim-{container_id}"
+
+    def _warm_container_name_from_id(self, container_id: UUID) -> str:
+        """Generate the name of an unassigned warm pool container from UUID"""
+        return f"{self.warm_container_name_prefix}{container_id}"
+
     def _runtime_id_from_container_name(self, container_name: str) -> UUID | None:
         """Extract runtime ID from container name"""
         if not container_name.startswith(self.container_name_prefix):
             return None
-        
-        uuid_str = container_name[len(self.container_name_prefix):]
+
+        uuid_str = container_name[len(self.container_name_prefix) :]
         try:
             return UUID(uuid_str)
         except ValueError:
             return None
 
-    def _docker_status_to_runtime_status(self, docker_status: str) -> SandboxStatus:
-        """Convert Docker container status to SandboxStatus"""
+    def _docker_status_to_runtime_status(
+        self, docker_status: str, state: dict | None = None
+    ) -> SandboxStatus:
+        """Convert Docker container status (And State, for exited containers) to SandboxStatus"""
+        if docker_status.lower() == "exited" and state is not None:
+            # A stop exits on SIGTERM (Or SIGKILL after the stop timeout). Any other exit, or
+            # running out of memory, is a crash rather than a hibernated sandbox
+            if (
+                state.get("OOMKilled")
+                or state.get("ExitCode") not in _STOPPED_EXIT_CODES
+            ):
+                return SandboxStatus.ERROR
         status_mapping = {
             "running": SandboxStatus.RUNNING,
             "paused": SandboxStatus.PAUSED,
-            "exited": SandboxStatus.DELETED,
+            # Stopped containers are hibernated sandboxes, which resume_sandbox restarts
+            "exited": SandboxStatus.PAUSED,
             "created": SandboxStatus.STARTING,
             "restarting": SandboxStatus.STARTING,
             "removing": SandboxStatus.DELETED,
@@ -92,7 +377,15 @@ class DockerSandboxService(SandboxService):
         }
         return status_mapping.get(docker_status.lower(), SandboxStatus.ERROR)
 
-    def _container_to_runtime_info(self, container) -> SandboxInfo | None:
+    def _container_to_runtime_info_fn(self, host: DockerHost):
+        def container_to_runtime_info(container) -> SandboxInfo | None:
+            return self._container_to_runtime_info(host, container)
+
+        return container_to_runtime_info
+
+    def _container_to_runtime_info(
+        self, host: DockerHost, container
+    ) -> SandboxInfo | None:
         """Convert Docker container to SandboxInfo"""
         # Extract runtime ID from container name
         runtime_id = self._runtime_id_from_container_name(container.name)
@@ -101,36 +394,51 @@ class DockerSandboxService(SandboxService):
 
         # Get user_id and sandbox_spec_id from labels
         labels = container.labels or {}
-        user_id_str = labels.get("user_id")
+        user_id_str = labels.get("user_id") or self._claimed_owners.get(runtime_id)
         sandbox_spec_id = labels.get("sandbox_spec_id")
-        
+
         if not user_id_str or not sandbox_spec_id:
             return None
 
+        if container.status == "exited":
+            self._stopped.add(runtime_id)
+        else:
+            self._stopped.discard(runtime_id)
+
         # Convert Docker status to runtime status
-        status = self._docker_status_to_runtime_status(container.status)
+        status = self._docker_status_to_runtime_status(
+            container.status, container.attrs.get("State")
+        )
+        if runtime_id in self._deleting:
+            status = SandboxStatus.DELETING
+        elif status == SandboxStatus.RUNNING:
+            # Running containers are STARTING until the application server is ready
+            if runtime_id in self._starting:
+                status = SandboxStatus.STARTING
+            elif runtime_id in self._readiness_failed:
+                status = SandboxStatus.ERROR
 
         # Parse creation time
         created_str = container.attrs.get("Created", "")
         try:
             created_at = datetime.fromisoformat(created_str.replace("Z", "+00:00"))
         except (ValueError, AttributeError):
-            created_at = datetime.now()
+            created_at = utc_now()
 
         # Generate URL and session key for running containers
         url = None
         session_api_key = None
-        
+
         if status == SandboxStatus.RUNNING:
             # Get the first exposed port mapping
             port_bindings = container.attrs.get("NetworkSettings", {}).get("Ports", {})
             if port_bindings:
-                for container_port, host_bindings in port_bindings.items():
+                for host_bindings in port_bindings.values():
                     if host_bindings:
                         host_port = host_bindings[0]["HostPort"]
-                        url = self.exposed_url_pattern.format(port=host_port)
+                        url = host.exposed_url_pattern.format(port=host_port)
                         break
-            
+
             # Generate session API key
             session_api_key = SecretStr(secrets.token_urlsafe(32))
 
@@ -141,191 +449,1014 @@ class DockerSandboxService(SandboxService):
             status=status,
             url=url,
             session_api_key=session_api_key,
+            resources=self._container_resources(container),
             created_at=created_at,
         )
 
+    def _container_resources(self, container) -> SandboxResourceProfile:
+        """Get the effective resource limits of a container"""
+        host_config = container.attrs.get("HostConfig") or {}
+        nano_cpus = host_config.get("NanoCpus") or 0
+        tmpfs = host_config.get("Tmpfs") or {}
+        working_dir = (container.attrs.get("Config") or {}).get("WorkingDir")
+        tmpfs_size = None
+        if working_dir in tmpfs:
+            for option in tmpfs[working_dir].split(","):
+                if option.startswith("size="):
+                    try:
+                        tmpfs_size = int(option[len("size=") :])
+                    except ValueError:
+                        pass
+        return SandboxResourceProfile(
+            cpus=nano_cpus / 1e9 if nano_cpus else None,
+            cpuset_cpus=host_config.get("CpusetCpus") or None,
+            memory=host_config.get("Memory") or None,
+            pids_limit=host_config.get("PidsLimit") or None,
+            tmpfs_working_dir=working_dir in tmpfs,
+            tmpfs_size=tmpfs_size,
+        )
+
     async def search_sandboxes(
         self, user_id: UUID | None = None, page_id: str | None = None, limit: int = 100
     ) -> SandboxPage:
-        """Search for sandboxes"""
+        """Search for sandboxes across all hosts"""
         try:
-            # Get all containers with our prefix
-            all_containers = self._get_client().containers.list(all=True)
-            sandboxes = []
-
-            for container in all_containers:
-                if container.name.startswith(self.container_name_prefix):
-                    runtime_info = self._container_to_runtime_info(container)
-                    if runtime_info:
-                        # Filter by user_id if specified
-                        if user_id is None or runtime_info.user_id == str(user_id):
-                            sandboxes.append(runtime_info)
-
-            # Sort by creation time (newest first)
-            sandboxes.sort(key=lambda x: x.created_at, reverse=True)
-
-            # Apply pagination
-            start_idx = 0
-            if page_id:
-                try:
-                    start_idx = int(page_id)
-                except ValueError:
-                    start_idx = 0
-
-            end_idx = start_idx + limit
-            paginated_containers = sandboxes[start_idx:end_idx]
-
-            # Determine next page ID
-            next_page_id = None
-            if end_idx < len(sandboxes):
-                next_page_id = str(end_idx)
-
-            return SandboxPage(
-                items=paginated_containers, next_page_id=next_page_id
+            # Served from memory, sorted by creation time (newest first). Each host returns
+            # its own page following the cursor, and these are merged.
+            pages = await asyncio.gather(
+                *(
+                    host.cache.search(
+                        None if user_id is None else str(user_id), page_id, limit
+                    )
+                    for host in self.hosts
+                )
             )
-
         except APIError:
             return SandboxPage(items=[], next_page_id=None)
 
-    async def get_sandboxes(self, id: UUID) -> SandboxInfo | None:
+        merged = list(
+            heapq.merge(
+                *(sandboxes for sandboxes, _ in pages),
+                key=lambda sandbox_info: (
+                    sandbox_info.created_at,
+                    str(sandbox_info.id),
+                ),
+                reverse=True,
+            )
+        )
+        sandboxes = merged[:limit]
+        next_page_id = None
+        if sandboxes and (len(merged) > limit or any(next_id for _, next_id in pages)):
+            last = sandboxes[-1]
+            next_page_id = PageCursor(last.created_at, str(last.id)).encode()
+        return SandboxPage(items=sandboxes, next_page_id=next_page_id)
+
+    async def get_sandbox(self, id: UUID) -> SandboxInfo | None:
         """Get a single sandbox info"""
         try:
-            container_name = self._container_name_from_id(id)
-            container = self._get_client().containers.get(container_name)
-            return self._container_to_runtime_info(container)
-        except (NotFound, APIError):
-            return None
+            for host in self.hosts:
+                sandbox_info = await host.cache.get(id)
+                if sandbox_info:
+                    return sandbox_info
+        except APIError:
+            pass
+        return None
 
-    async def batch_get_sandboxes(
-        self, ids: list[UUID]
-    ) -> list[SandboxInfo | None]:
+    async def batch_get_sandboxes(self, ids: list[UUID]) -> list[SandboxInfo | None]:
         """Get a batch of sandbox info"""
-        results = []
-        for container_id in ids:
-            result = await self.get_sandboxes(container_id)
-            results.append(result)
+        results: list[SandboxInfo | None] = [None] * len(ids)
+        for host in self.hosts:
+            try:
+                host_results = await host.cache.batch_get(ids)
+            except APIError:
+                continue
+            for index, sandbox_info in enumerate(host_results):
+                if sandbox_info:
+                    results[index] = sandbox_info
         return results
 
     async def start_sandbox(self, user_id: UUID, sandbox_spec_id: str) -> UUID:
-        """Start a new sandbox"""
-        # Get runtime image info
-        sandbox_spec_service = get_default_sandbox_spec_service()
-        sandbox_spec = await sandbox_spec_service.get_sandbox_spec(sandbox_spec_id)
-        
+        """Start a new sandbox, claiming a warm one from the pool if available"""
+        claimed = await self._claim_warm_sandbox(user_id, sandbox_spec_id)
+        if claimed:
+            host, container_id = claimed
+            self._warm_pool_stats.hits += 1
+            self._idle_reaper.touch(container_id)
+            await host.cache.refresh(self._container_name_from_id(container_id))
+            self._schedule_refill(sandbox_spec_id)
+            return container_id
+
+        self._warm_pool_stats.misses += 1
+        sandbox_spec = await self.sandbox_spec_service.get_sandbox_spec(sandbox_spec_id)
         if sandbox_spec is None:
             raise ValueError(f"Runtime image {sandbox_spec_id} not found")
+        if sandbox_spec.status != SandboxSpecStatus.READY:
+            raise SandboxError(
+                f"Runtime image {sandbox_spec_id} is {sandbox_spec.status.value}"
+            )
 
-        # Generate container ID and name
         container_id = uuid4()
         container_name = self._container_name_from_id(container_id)
+        async with self._place(
+            *self._requested_resources(sandbox_spec.resources)
+        ) as host:
+            container = await self._run_container(
+                host,
+                sandbox_spec,
+                container_id,
+                container_name,
+                {"user_id": str(user_id)},
+            )
+            self._idle_reaper.touch(container_id)
+            self._schedule_readiness(host, container_id, container, sandbox_spec_id)
+            await host.cache.refresh(container_name)
+        self._schedule_refill(sandbox_spec_id)
+        return container_id
 
+    async def _run_container(
+        self,
+        host: DockerHost,
+        sandbox_spec: SandboxSpecInfo,
+        container_id: UUID,
+        container_name: str,
+        labels: dict[str, str],
+        image: str | None = None,
+    ):
+        """Create and start a container for the sandbox spec given on the host given. image
+        overrides the image of the spec (e.g.: to start from a snapshot)"""
         # Prepare environment variables
         env_vars = sandbox_spec.initial_env.copy()
-        
-        # Prepare port mappings and add port environment variables
-        port_mappings = {}
-        for container_port, description in sandbox_spec.exposed_ports.items():
-            host_port = self._find_unused_port()
-            port_mappings[container_port] = host_port
-            # Add port as environment variable
-            env_var_name = f"PORT_{container_port}"
-            env_vars[env_var_name] = str(host_port)
 
         # Prepare labels
         labels = {
-            "user_id": str(user_id),
-            "sandbox_spec_id": sandbox_spec_id,
+            **labels,
+            MANAGED_LABEL: "true",
+            "sandbox_spec_id": sandbox_spec.id,
         }
 
-        # TODO: Handle mounts - for now, we'll create a basic volume mount
+        # Mounts
+        resources = sandbox_spec.resources
         volumes = {
-            f"openhands-workspace-{container_id}": {
-                "bind": sandbox_spec.working_dir,
-                "mode": "rw"
-            }
+            mount.host_path: {"bind": mount.container_path, "mode": mount.mode}
+            for mount in self.mounts
         }
+        tmpfs = {}
+        workspace_volume = None
+        if resources.tmpfs_working_dir:
+            tmpfs[sandbox_spec.working_dir] = (
+                f"size={resources.tmpfs_size}" if resources.tmpfs_size else ""
+            )
+        else:
+            workspace_volume = f"openhands-workspace-{container_id}"
+            template = self.workspace_templates.get(sandbox_spec.id)
+            if template and image is None:
+                # Snapshots bring their own workspace, so templates only apply to new sandboxes
+                cloned_at = time.perf_counter()
+                await self._ensure_workspace_template(host, sandbox_spec, template)
+                await self._copy_volume(host, template.volume, workspace_volume)
+                self._observe_startup_phase(
+                    sandbox_spec.id, "template", time.perf_counter() - cloned_at
+                )
+            volumes[workspace_volume] = {"bind": sandbox_spec.working_dir, "mode": "rw"}
 
+        # Prepare port mappings and add port environment variables
+        port_mappings = {}
+        for exposed_port in self.exposed_port:
+            host_port = host.port_allocator.allocate()
+            port_mappings[host_port] = host_port
+            env_vars[exposed_port.name] = str(host_port)
+
+        # Resource limits
+        limits = {}
+        if resources.cpus:
+            limits["nano_cpus"] = int(resources.cpus * 1e9)
+        if resources.cpuset_cpus:
+            limits["cpuset_cpus"] = resources.cpuset_cpus
+        if resources.memory:
+            limits["mem_limit"] = resources.memory
+        if resources.pids_limit:
+            limits["pids_limit"] = resources.pids_limit
+        if tmpfs:
+            limits["tmpfs"] = tmpfs
+
+        create_kwargs = dict(
+            image=image or sandbox_spec.id,
+            command=sandbox_spec.command,
+            name=container_name,
+            environment=env_vars,
+            ports=port_mappings,
+            volumes=volumes,
+            working_dir=sandbox_spec.working_dir,
+            labels=labels,
+            **limits,
+        )
+        container = None
         try:
-            # Create and start the container
-            container = self._get_client().containers.run(
-                image=sandbox_spec_id,
-                command=sandbox_spec.command,
-                name=container_name,
-                environment=env_vars,
-                ports=port_mappings,
-                volumes=volumes,
-                working_dir=sandbox_spec.working_dir,
-                labels=labels,
-                detach=True,
-                remove=False,
+            # Create and start the container as separate steps so each can be timed
+            created_at = time.perf_counter()
+            try:
+                container = await host.async_docker.create_container(**create_kwargs)
+            except ImageNotFound:
+                # Specs are listed from a single daemon, so other hosts may not have the image
+                logger.info(f"sandbox_image_pull:{host.name}:{create_kwargs['image']}")
+                await host.async_docker.pull_image(create_kwargs["image"])
+                pulled_at = time.perf_counter()
+                self._observe_startup_phase(
+                    sandbox_spec.id, "pull", pulled_at - created_at
+                )
+                created_at = pulled_at
+                container = await host.async_docker.create_container(**create_kwargs)
+            started_at = time.perf_counter()
+            self._observe_startup_phase(
+                sandbox_spec.id, "create", started_at - created_at
+            )
+            await host.async_docker.run(container.start)
+            self._observe_startup_phase(
+                sandbox_spec.id, "start", time.perf_counter() - started_at
             )
+            self._sandbox_ports[container_id] = list(port_mappings.values())
+            return container
+        except APIError as e:
+            # Remove the container and workspace before the ports, so that no port is reused
+            # while a container still holds it
+            if container is not None:
+                try:
+                    await host.async_docker.run(container.remove, force=True)
+                except APIError:
+                    logger.exception(f"sandbox_remove_failed:{container_name}")
+            if workspace_volume:
+                await self._remove_volume(host, workspace_volume)
+            for host_port in port_mappings.values():
+                host.port_allocator.release(host_port)
+            raise SandboxError(f"Failed to start container: {e}") from e
 
-            return container_id
+    # Readiness
 
-        except APIError as e:
-            raise SandboxError(f"Failed to start container: {e}")
+    def _application_port(self, container) -> int | None:
+        """Get the host port of the application server (The first exposed port) from the
+        container environment"""
+        if not self.exposed_port:
+            return None
+        prefix = f"{self.exposed_port[0].name}="
+        for env_var in container.attrs.get("Config", {}).get("Env") or []:
+            if env_var.startswith(prefix):
+                try:
+                    return int(env_var[len(prefix) :])
+                except ValueError:
+                    return None
+        return None
+
+    async def _probe_once(self, readiness_host: str, port: int) -> bool:
+        """GET the readiness path, returning True for a 2xx response. A connection alone is not
+        enough, as the docker proxy accepts connections before anything in the container listens"""
+        reader, writer = await asyncio.open_connection(readiness_host, port)
+        try:
+            writer.write(
+                (
+                    f"GET {self.readiness_path} HTTP/1.1\r\n"
+                    f"Host: {readiness_host}:{port}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode()
+            )
+            await writer.drain()
+            status_line = await reader.readline()
+        finally:
+            writer.close()
+        parts = status_line.split()
+        return (
+            len(parts) >= 2
+            and parts[0].startswith(b"HTTP/")
+            and parts[1].startswith(b"2")
+        )
+
+    async def _probe(self, readiness_host: str, port: int) -> bool:
+        """Poll the application server with exponential backoff until it reports ready"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.readiness_timeout
+        delay = self.readiness_initial_delay
+        while True:
+            try:
+                if await asyncio.wait_for(
+                    self._probe_once(readiness_host, port), timeout=delay + 1
+                ):
+                    return True
+            except (TimeoutError, OSError):
+                pass
+            if loop.time() + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.readiness_max_delay)
+
+    async def _wait_until_ready(
+        self, host: DockerHost, container_id: UUID, container, sandbox_spec_id: str
+    ) -> bool:
+        """Wait for the application server in the container to report ready. The sandbox
+        reports STARTING until this succeeds, and ERROR if it times out"""
+        port = self._application_port(container)
+        if port is None:
+            return True
+        self._starting.add(container_id)
+        self._readiness_failed.discard(container_id)
+        probe_started_at = time.perf_counter()
+        try:
+            ready = await self._probe(host.readiness_host, port)
+        finally:
+            self._starting.discard(container_id)
+        if ready:
+            self._observe_startup_phase(
+                sandbox_spec_id, "ready", time.perf_counter() - probe_started_at
+            )
+        else:
+            logger.warning(f"sandbox_readiness_timeout:{container_id}")
+            self._readiness_failed.add(container_id)
+        return ready
+
+    def _schedule_readiness(
+        self, host: DockerHost, container_id: UUID, container, sandbox_spec_id: str
+    ):
+        """Probe the sandbox in the background, updating the cache when the probe completes"""
+        self._starting.add(container_id)
+
+        async def wait_and_refresh():
+            await self._wait_until_ready(host, container_id, container, sandbox_spec_id)
+            await host.cache.refresh(self._container_name_from_id(container_id))
+
+        task = asyncio.create_task(wait_and_refresh())
+        self._readiness_tasks.add(task)
+        task.add_done_callback(self._readiness_tasks.discard)
+
+    def _observe_startup_phase(self, sandbox_spec_id: str, phase: str, seconds: float):
+        histograms = self._startup_latency.setdefault(sandbox_spec_id, {})
+        histogram = histograms.get(phase)
+        if histogram is None:
+            histogram = histograms[phase] = Histogram()
+        histogram.observe(seconds)
+
+    def get_startup_latency_stats(self) -> dict[str, dict[str, HistogramInfo]]:
+        """Get latency histograms for each startup phase (template, pull, create, start, ready)
+        by sandbox spec"""
+        return {
+            sandbox_spec_id: {
+                phase: histogram.get_info() for phase, histogram in histograms.items()
+            }
+            for sandbox_spec_id, histograms in self._startup_latency.items()
+        }
+
+    # Warm pool
+
+    async def _claim_warm_sandbox(
+        self, user_id: UUID, sandbox_spec_id: str
+    ) -> tuple[DockerHost, UUID] | None:
+        """Assign a warm container to the user given, returning its host and id or None if
+        the pool is empty"""
+        pool = self._warm_pool.get(sandbox_spec_id)
+        while pool:
+            host_name, container_id = pool.popleft()
+            host = self._get_host(host_name)
+            if host is None:
+                continue
+            try:
+                container = await host.async_docker.get_container(
+                    self._warm_container_name_from_id(container_id)
+                )
+                if container.status != "running":
+                    continue
+                # The claim is recorded before the rename, so a restart in between
+                # completes the claim rather than returning the container to the pool
+                claim_volume = await host.async_docker.create_volume(
+                    name=self._claim_volume_name_from_id(container_id),
+                    labels={
+                        MANAGED_LABEL: "true",
+                        CLAIM_LABEL: str(container_id),
+                        "user_id": str(user_id),
+                    },
+                )
+                self._claimed_owners[container_id] = str(user_id)
+            except (NotFound, APIError):
+                logger.warning(f"warm_sandbox_unavailable:{container_id}")
+                continue
+            try:
+                # Renaming moves the container out of the pool and into the
+                # namespace of sandboxes visible to users
+                await host.async_docker.run(
+                    container.rename, self._container_name_from_id(container_id)
+                )
+                return host, container_id
+            except (NotFound, APIError):
+                logger.warning(f"warm_sandbox_unavailable:{container_id}")
+                self._claimed_owners.pop(container_id, None)
+                try:
+                    await host.async_docker.run(claim_volume.remove, force=True)
+                except APIError:
+                    logger.exception(f"claim_volume_remove_failed:{container_id}")
+        return None
+
+    def _schedule_refill(self, sandbox_spec_id: str):
+        """Top up the warm pool for the spec given in the background"""
+        if not self.warm_pool_sizes.get(sandbox_spec_id):
+            return
+        task = self._refill_tasks.get(sandbox_spec_id)
+        if task and not task.done():
+            return
+        self._refill_tasks[sandbox_spec_id] = asyncio.create_task(
+            self._refill_warm_pool(sandbox_spec_id)
+        )
+
+    async def _refill_warm_pool(self, sandbox_spec_id: str):
+        pool = self._warm_pool.setdefault(sandbox_spec_id, deque())
+        target = self.warm_pool_sizes.get(sandbox_spec_id, 0)
+
+        # Scale down
+        while len(pool) > target:
+            host_name, container_id = pool.pop()
+            host = self._get_host(host_name)
+            if host is None:
+                continue
+            try:
+                container = await host.async_docker.get_container(
+                    self._warm_container_name_from_id(container_id)
+                )
+                await host.async_docker.run(container.remove, force=True)
+                self._release_sandbox_ports(host, container_id, container)
+            except (NotFound, APIError):
+                pass
+
+        # Scale up
+        if len(pool) >= target:
+            return
+        sandbox_spec = await self.sandbox_spec_service.get_sandbox_spec(sandbox_spec_id)
+        if sandbox_spec is None:
+            logger.warning(f"warm_pool_spec_not_found:{sandbox_spec_id}")
+            return
+        if sandbox_spec.status != SandboxSpecStatus.READY:
+            # Refilled once the spec is ready, by the next claim or resize
+            logger.info(f"warm_pool_spec_not_ready:{sandbox_spec_id}")
+            return
+        while len(pool) < target:
+            container_id = uuid4()
+            try:
+                async with self._place(
+                    *self._requested_resources(sandbox_spec.resources)
+                ) as host:
+                    container = await self._run_container(
+                        host,
+                        sandbox_spec,
+                        container_id,
+                        self._warm_container_name_from_id(container_id),
+                        {"warm_pool": "true"},
+                    )
+                    # Only ready sandboxes are added to the pool, so claims are RUNNING immediately
+                    if not await self._wait_until_ready(
+                        host, container_id, container, sandbox_spec_id
+                    ):
+                        await host.async_docker.run(container.remove, force=True)
+                        self._release_sandbox_ports(host, container_id, container)
+                        return
+                    pool.append((host.name, container_id))
+            except SandboxError:
+                logger.exception(f"warm_pool_refill_failed:{sandbox_spec_id}")
+                return
+
+    async def _load_claims(self, host: DockerHost):
+        """Load the owners of sandboxes claimed from the warm pool from their claim volumes"""
+        volumes = await host.async_docker.list_volumes(filters={"label": CLAIM_LABEL})
+        for volume in volumes:
+            labels = volume.attrs.get("Labels") or {}
+            try:
+                container_id = UUID(labels[CLAIM_LABEL])
+            except (KeyError, ValueError):
+                continue
+            if labels.get("user_id"):
+                self._claimed_owners[container_id] = labels["user_id"]
+
+    async def _load_warm_pool(self, host: DockerHost):
+        """Rebuild the warm pool from any unassigned containers left on a host by a previous run"""
+        containers = await host.cache.list_containers()
+        for container in containers:
+            if not container.name.startswith(self.warm_container_name_prefix):
+                continue
+            if (container.labels or {}).get("warm_pool") != "true":
+                continue
+            try:
+                container_id = UUID(
+                    container.name[len(self.warm_container_name_prefix) :]
+                )
+            except ValueError:
+                continue
+            if container_id in self._claimed_owners:
+                # Claimed, but not yet renamed when the previous run stopped
+                try:
+                    await host.async_docker.run(
+                        container.rename, self._container_name_from_id(container_id)
+                    )
+                except APIError:
+                    logger.exception(f"warm_sandbox_claim_failed:{container_id}")
+                continue
+            sandbox_spec_id = (container.labels or {}).get("sandbox_spec_id")
+            if sandbox_spec_id:
+                self._warm_pool.setdefault(sandbox_spec_id, deque()).append(
+                    (host.name, container_id)
+                )
+
+    async def set_warm_pool_size(self, sandbox_spec_id: str, size: int):
+        """Set the desired number of warm sandboxes for a spec and scale the pool up or down"""
+        assert size >= 0
+        self.warm_pool_sizes[sandbox_spec_id] = size
+        task = self._refill_tasks.get(sandbox_spec_id)
+        if task and not task.done():
+            await task
+        self._refill_tasks[sandbox_spec_id] = asyncio.create_task(
+            self._refill_warm_pool(sandbox_spec_id)
+        )
+
+    def get_warm_pool_stats(self) -> WarmPoolStats:
+        """Get the hit / miss counters and current size of the warm pool"""
+        return self._warm_pool_stats.model_copy(
+            update={
+                "available": {
+                    sandbox_spec_id: len(pool)
+                    for sandbox_spec_id, pool in self._warm_pool.items()
+                }
+            }
+        )
 
     async def resume_sandbox(self, id: UUID) -> bool:
         """Resume a paused sandbox"""
+        host = await self._find_host(id)
+        if host is None:
+            return False
         try:
             container_name = self._container_name_from_id(id)
-            container = self._get_client().containers.get(container_name)
-            
+            container = await host.async_docker.get_container(container_name)
+
             if container.status == "paused":
-                container.unpause()
+                await host.async_docker.run(container.unpause)
             elif container.status == "exited":
-                container.start()
-            
+                await host.async_docker.run(container.start)
+                self._schedule_readiness(
+                    host,
+                    id,
+                    container,
+                    (container.labels or {}).get("sandbox_spec_id", ""),
+                )
+            self._idle_reaper.touch(id)
+            await host.cache.refresh(container_name)
+
             return True
         except (NotFound, APIError):
             return False
 
     async def pause_sandbox(self, id: UUID) -> bool:
         """Pause a running sandbox"""
+        host = await self._find_host(id)
+        if host is None:
+            return False
         try:
             container_name = self._container_name_from_id(id)
-            container = self._get_client().containers.get(container_name)
-            
+            container = await host.async_docker.get_container(container_name)
+
             if container.status == "running":
-                container.pause()
-            
+                await host.async_docker.run(container.pause)
+            await host.cache.refresh(container_name)
+
             return True
         except (NotFound, APIError):
             return False
 
-    async def delete_sandbox(self, id: UUID) -> bool:
-        """Delete a sandbox"""
+    async def stop_sandbox(self, id: UUID) -> bool:
+        """Stop a sandbox, releasing its memory while keeping its container and workspace.
+        resume_sandbox restarts it"""
+        host = await self._find_host(id)
+        if host is None:
+            return False
         try:
             container_name = self._container_name_from_id(id)
-            container = self._get_client().containers.get(container_name)
-            
-            # Stop the container if it's running
+            container = await host.async_docker.get_container(container_name)
+
             if container.status in ["running", "paused"]:
-                container.stop(timeout=10)
-            
-            # Remove the container
-            container.remove()
-            
-            # Remove associated volume
-            try:
-                volume_name = f"openhands-workspace-{id}"
-                volume = self._get_client().volumes.get(volume_name)
-                volume.remove()
-            except (NotFound, APIError):
-                # Volume might not exist or already removed
-                pass
-            
+                await host.async_docker.run_long(container.stop, timeout=10)
+            await host.cache.refresh(container_name)
+
             return True
         except (NotFound, APIError):
             return False
 
+    def touch_sandbox(self, id: UUID):
+        """Record activity on a sandbox, resetting its idle timer"""
+        self._idle_reaper.touch(id)
+
+    async def sample_sandbox_activity(self, id: UUID) -> bool | None:
+        """Check for network traffic in or out of a sandbox since the last sample. Traffic to the
+        agent server goes straight to the container rather than through this server, so this is
+        how use of a sandbox is seen. Return None if there is no earlier sample to compare with"""
+        host = await self._find_host(id)
+        if host is None:
+            return None
+        try:
+            container = await host.async_docker.get_container(
+                self._container_name_from_id(id)
+            )
+            # Takes a second or two, as the daemon waits for a second reading
+            stats = await host.async_docker.run_long(container.stats, stream=False)
+        except (NotFound, APIError):
+            return None
+        network_bytes = sum(
+            network.get("rx_bytes", 0) + network.get("tx_bytes", 0)
+            for network in (stats.get("networks") or {}).values()
+        )
+        previous = self._network_bytes.get(id)
+        self._network_bytes[id] = network_bytes
+        if previous is None:
+            return None
+        return network_bytes != previous
+
+    def get_idle_reaper_stats(self) -> IdleReaperStats:
+        """Get the number of sandboxes in each idle tier"""
+        return self._idle_reaper.get_stats()
+
+    async def delete_sandbox(self, id: UUID) -> bool:
+        """Mark a sandbox as DELETING and queue it for removal in the background"""
+        try:
+            host = await self._find_host(id)
+        except APIError:
+            return False
+        if host is None:
+            return False
+        if id in self._deleting:
+            return True
+
+        self._deleting.add(id)
+        self._idle_reaper.forget(id)
+        host.delete_queue.enqueue(
+            id,
+            self._container_name_from_id(id),
+            [f"openhands-workspace-{id}", self._claim_volume_name_from_id(id)],
+        )
+        await host.cache.refresh(self._container_name_from_id(id))
+        return True
+
+    def _on_container_removed_fn(self, host: DockerHost):
+        def on_container_removed(id: UUID, container):
+            self._release_sandbox_ports(host, id, container)
+            self._claimed_owners.pop(id, None)
+            self._network_bytes.pop(id, None)
+            self._stopped.discard(id)
+            self._readiness_failed.discard(id)
+            host.cache.discard(id)
+
+        return on_container_removed
+
+    def _on_delete_done(self, id: UUID):
+        self._deleting.discard(id)
+
+    def get_delete_queue_stats(self) -> DeleteQueueStats:
+        """Get the queue depth and drain rate of the delete pipeline, summed across hosts"""
+        stats = DeleteQueueStats()
+        for host in self.hosts:
+            host_stats = host.delete_queue.get_stats()
+            for key, value in host_stats.model_dump().items():
+                setattr(stats, key, getattr(stats, key) + value)
+        return stats
+
+    def get_stats(self) -> SandboxServiceStats:
+        return SandboxServiceStats(
+            warm_pool=self.get_warm_pool_stats(),
+            idle_reaper=self.get_idle_reaper_stats(),
+            delete_queue=self.get_delete_queue_stats(),
+            startup_latency=self.get_startup_latency_stats(),
+        )
+
+    # Workspace templates
+
+    async def _ensure_workspace_template(
+        self,
+        host: DockerHost,
+        sandbox_spec: SandboxSpecInfo,
+        template: WorkspaceTemplate,
+    ):
+        """Populate the template volume on the host given if it does not already exist"""
+        lock = self._template_locks.setdefault(
+            (host.name, template.volume), asyncio.Lock()
+        )
+        async with lock:
+            try:
+                await host.async_docker.get_volume(template.volume)
+                return
+            except NotFound:
+                pass
+            logger.info(f"populate_workspace_template:{host.name}:{template.volume}")
+            try:
+                await host.async_docker.create_volume(
+                    name=template.volume,
+                    labels={MANAGED_LABEL: "true", TEMPLATE_LABEL: sandbox_spec.id},
+                )
+                # A new named volume is seeded with the image content at the mount point
+                await host.async_docker.run_container(
+                    image=sandbox_spec.id,
+                    command=template.setup_command or ["true"],
+                    environment=sandbox_spec.initial_env,
+                    volumes={
+                        template.volume: {
+                            "bind": sandbox_spec.working_dir,
+                            "mode": "rw",
+                        }
+                    },
+                    working_dir=sandbox_spec.working_dir,
+                    labels={MANAGED_LABEL: "true"},
+                    remove=True,
+                )
+            except (APIError, ContainerError) as e:
+                # Remove the partial template so that the next sandbox retries rather than
+                # copying a half populated workspace
+                await self._remove_volume(host, template.volume)
+                raise SandboxError(
+                    f"Failed to populate workspace template {template.volume}: {e}"
+                ) from e
+
+    async def refresh_workspace_template(self, sandbox_spec_id: str) -> bool:
+        """Remove the template volume for the sandbox spec from every host, so that it is
+        populated again for the next sandbox. Return False if the spec has no template"""
+        template = self.workspace_templates.get(sandbox_spec_id)
+        if template is None:
+            return False
+        for host in self.hosts:
+            lock = self._template_locks.setdefault(
+                (host.name, template.volume), asyncio.Lock()
+            )
+            async with lock:
+                try:
+                    volume = await host.async_docker.get_volume(template.volume)
+                    await host.async_docker.run(volume.remove, force=True)
+                except NotFound:
+                    pass
+                except APIError as e:
+                    raise SandboxError(
+                        f"Failed to remove workspace template {template.volume}: {e}"
+                    ) from e
+        return True
+
+    # Snapshots
+
+    async def _remove_volume(self, host: DockerHost, name: str):
+        """Remove a volume if it exists, logging rather than raising any failure"""
+        try:
+            volume = await host.async_docker.get_volume(name)
+            await host.async_docker.run(volume.remove, force=True)
+        except NotFound:
+            pass
+        except APIError:
+            logger.exception(f"volume_remove_failed:{host.name}:{name}")
+
+    async def _copy_volume(self, host: DockerHost, source: str, target: str):
+        """Copy the content of one volume into another (Which is created if necessary)"""
+        cp = "cp -a --reflink=auto" if self.volume_helper_reflink else "cp -a"
+        try:
+            await host.async_docker.run_container(
+                image=self.volume_helper_image,
+                command=["sh", "-c", f"{cp} /source/. /target/"],
+                volumes={
+                    source: {"bind": "/source", "mode": "ro"},
+                    target: {"bind": "/target", "mode": "rw"},
+                },
+                labels={MANAGED_LABEL: "true"},
+                remove=True,
+            )
+        except (APIError, ContainerError) as e:
+            # Remove the partial copy
+            await self._remove_volume(host, target)
+            raise SandboxError(
+                f"Failed to copy volume {source} to {target}: {e}"
+            ) from e
+
+    def _image_to_snapshot_info(
+        self, host: DockerHost, image
+    ) -> SandboxSnapshotInfo | None:
+        labels = image.labels or {}
+        try:
+            snapshot_id = UUID(labels[SNAPSHOT_LABEL])
+            sandbox_id = UUID(labels[SNAPSHOT_OF_LABEL])
+        except (KeyError, ValueError):
+            return None
+        created_str = image.attrs.get("Created", "")
+        try:
+            created_at = datetime.fromisoformat(created_str.replace("Z", "+00:00"))
+        except (ValueError, AttributeError):
+            created_at = utc_now()
+        return SandboxSnapshotInfo(
+            id=snapshot_id,
+            sandbox_id=sandbox_id,
+            user_id=labels.get("user_id", ""),
+            sandbox_spec_id=labels.get("sandbox_spec_id", ""),
+            image=f"{self.snapshot_repository}:{snapshot_id}",
+            workspace_volume=f"openhands-snapshot-{snapshot_id}",
+            host=host.name,
+            created_at=created_at,
+        )
+
+    async def snapshot_sandbox(
+        self, user_id: UUID, id: UUID
+    ) -> SandboxSnapshotInfo | None:
+        """Commit a sandbox container to a local image and copy its workspace to a snapshot
+        volume. The sandbox is paused while this happens. Return None if the sandbox was not
+        found, or belongs to another user"""
+        host = await self._find_host(id)
+        if host is None:
+            return None
+        sandbox_info = await host.cache.get(id)
+        if sandbox_info is None or sandbox_info.user_id != str(user_id):
+            return None
+        if sandbox_info.resources.tmpfs_working_dir:
+            # The workspace is in memory rather than a volume, so there is nothing to copy
+            raise SandboxError(
+                f"Sandbox {id} has a tmpfs workspace and cannot be snapshotted"
+            )
+        snapshot_id = uuid4()
+        try:
+            container = await host.async_docker.get_container(
+                self._container_name_from_id(id)
+            )
+            was_running = container.status == "running"
+            if was_running:
+                await host.async_docker.run(container.pause)
+            try:
+                await host.async_docker.run_long(
+                    container.commit,
+                    repository=self.snapshot_repository,
+                    tag=str(snapshot_id),
+                    changes=[
+                        f"LABEL {SNAPSHOT_LABEL}={snapshot_id} {SNAPSHOT_OF_LABEL}={id} "
+                        f"user_id={sandbox_info.user_id} sandbox_spec_id={sandbox_info.sandbox_spec_id}"
+                    ],
+                    pause=False,
+                )
+                await self._copy_volume(
+                    host,
+                    f"openhands-workspace-{id}",
+                    f"openhands-snapshot-{snapshot_id}",
+                )
+            finally:
+                if was_running:
+                    await host.async_docker.run(container.unpause)
+        except NotFound:
+            await self._remove_snapshot_image(host, snapshot_id)
+            return None
+        except (APIError, SandboxError) as e:
+            # Remove the image if committed, so that a partial snapshot is not listed
+            await self._remove_snapshot_image(host, snapshot_id)
+            raise SandboxError(f"Failed to snapshot sandbox {id}: {e}") from e
+        self._idle_reaper.touch(id)
+        return await self.get_snapshot(snapshot_id)
+
+    async def _remove_snapshot_image(self, host: DockerHost, snapshot_id: UUID):
+        """Remove the image of a snapshot if it exists, logging rather than raising any failure"""
+        try:
+            await host.async_docker.remove_image(
+                f"{self.snapshot_repository}:{snapshot_id}"
+            )
+        except NotFound:
+            pass
+        except APIError:
+            logger.exception(f"snapshot_image_remove_failed:{snapshot_id}")
+
+    async def _find_snapshot(
+        self, snapshot_id: UUID
+    ) -> tuple[DockerHost, SandboxSnapshotInfo] | None:
+        for host in self.hosts:
+            try:
+                images = await host.async_docker.list_images(
+                    filters={"label": f"{SNAPSHOT_LABEL}={snapshot_id}"}
+                )
+            except APIError:
+                continue
+            for image in images:
+                snapshot_info = self._image_to_snapshot_info(host, image)
+                if snapshot_info:
+                    return host, snapshot_info
+        return None
+
+    async def get_snapshot(self, snapshot_id: UUID) -> SandboxSnapshotInfo | None:
+        """Get a snapshot, returning None if it was not found"""
+        found = await self._find_snapshot(snapshot_id)
+        return found[1] if found else None
+
+    async def search_snapshots(
+        self, user_id: UUID | None = None
+    ) -> list[SandboxSnapshotInfo]:
+        """Get snapshots across all hosts, newest first, optionally filtered by user"""
+        label_filters = [SNAPSHOT_LABEL]
+        if user_id is not None:
+            label_filters.append(f"user_id={user_id}")
+        snapshots = []
+        for host in self.hosts:
+            try:
+                images = await host.async_docker.list_images(
+                    filters={"label": label_filters}
+                )
+            except APIError:
+                continue
+            for image in images:
+                snapshot_info = self._image_to_snapshot_info(host, image)
+                if snapshot_info:
+                    snapshots.append(snapshot_info)
+        snapshots.sort(key=lambda snapshot_info: snapshot_info.created_at, reverse=True)
+        return snapshots
+
+    async def start_sandbox_from_snapshot(
+        self, user_id: UUID, snapshot_id: UUID
+    ) -> UUID:
+        """Start a new sandbox from a snapshot. The sandbox is placed on the host holding the
+        snapshot, and its workspace is a copy of the snapshot workspace"""
+        found = await self._find_snapshot(snapshot_id)
+        # Snapshots are only available to the user who took them
+        if found is None or found[1].user_id != str(user_id):
+            raise ValueError(f"Snapshot {snapshot_id} not found")
+        host, snapshot_info = found
+        sandbox_spec = await self.sandbox_spec_service.get_sandbox_spec(
+            snapshot_info.sandbox_spec_id
+        )
+        if sandbox_spec is None:
+            raise ValueError(f"Runtime image {snapshot_info.sandbox_spec_id} not found")
+        if sandbox_spec.resources.tmpfs_working_dir:
+            # The copied workspace would never be mounted
+            raise SandboxError(
+                f"Runtime image {sandbox_spec.id} has a tmpfs workspace and cannot start from a snapshot"
+            )
+
+        container_id = uuid4()
+        container_name = self._container_name_from_id(container_id)
+        workspace_volume = f"openhands-workspace-{container_id}"
+        await self._copy_volume(host, snapshot_info.workspace_volume, workspace_volume)
+        try:
+            container = await self._run_container(
+                host,
+                sandbox_spec,
+                container_id,
+                container_name,
+                {"user_id": str(user_id)},
+                image=snapshot_info.image,
+            )
+        except Exception:
+            await self._remove_volume(host, workspace_volume)
+            raise
+        self._idle_reaper.touch(container_id)
+        self._schedule_readiness(host, container_id, container, sandbox_spec.id)
+        await host.cache.refresh(container_name)
+        return container_id
+
+    async def delete_snapshot(self, user_id: UUID, snapshot_id: UUID) -> bool:
+        """Delete the image and workspace volume of a snapshot. Return False if it was not
+        found, or was taken by another user"""
+        found = await self._find_snapshot(snapshot_id)
+        if found is None or found[1].user_id != str(user_id):
+            return False
+        host, snapshot_info = found
+        try:
+            await host.async_docker.remove_image(snapshot_info.image)
+            volume = await host.async_docker.get_volume(snapshot_info.workspace_volume)
+            await host.async_docker.run(volume.remove)
+        except NotFound:
+            pass
+        except APIError as e:
+            raise SandboxError(f"Failed to delete snapshot {snapshot_id}: {e}") from e
+        return True
+
+    async def _load_host(self, host: DockerHost):
+        """Rebuild the state of a host from the daemon"""
+        await host.load_capacity()
+        await self._load_port_leases(host)
+        await self._load_claims(host)
+        await self._load_warm_pool(host)
+
     async def __aenter__(self):
         """Start using this sandbox service"""
+        await self.sandbox_spec_service.__aenter__()
+        self._warm_pool = {}
+        for host in self.hosts:
+            try:
+                await self._load_host(host)
+            except APIError:
+                logger.exception(f"sandbox_state_load_failed:{host.name}")
+        for sandbox_spec_id in self.warm_pool_sizes:
+            self._schedule_refill(sandbox_spec_id)
+        for host in self.hosts:
+            await host.cache.start()
+            await host.delete_queue.start()
+        await self._idle_reaper.start()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Stop using this sandbox service"""
-        pass
+        for task in self._refill_tasks.values():
+            task.cancel()
+        self._refill_tasks.clear()
+        for task in list(self._readiness_tasks):
+            task.cancel()
+        self._readiness_tasks.clear()
+        await self._idle_reaper.stop()
+        for host in self.hosts:
+            await host.delete_queue.stop()
+            await host.cache.stop()
+        await self.sandbox_spec_service.__aexit__(exc_type, exc_val, exc_tb)
 
     @classmethod
     def get_instance(cls) -> "SandboxService":
@@ -0,0 +1,92 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from openhands_server.sandbox.sandbox_errors import SandboxError
+
+
+@dataclass
+class PortAllocator:
+    """
+    Leases host ports to sandboxes from a range reserved for them, so that concurrent sandbox
+    starts never receive the same port. Leases are tracked in a bitmap (One bit per port in the
+    range). Allocation starts searching after the most recently leased port, so a port which
+    was just released is not immediately handed out again.
+    """
+
+    # The default range is below the Linux ephemeral range (32768-60999), so outgoing
+    # connections on the host never take a port leased to a sandbox
+    start: int = 20000
+    # Exclusive
+    end: int = 30000
+    _bitmap: bytearray = field(init=False)
+    _next: int = field(default=0, init=False)
+    _leased: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        assert 0 < self.start < self.end <= 65536
+        self._bitmap = bytearray((self.end - self.start + 7) // 8)
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    @property
+    def leased(self) -> int:
+        return self._leased
+
+    def _is_set(self, offset: int) -> bool:
+        return bool(self._bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    def _set(self, offset: int):
+        self._bitmap[offset >> 3] |= 1 << (offset & 7)
+        self._leased += 1
+
+    def _clear(self, offset: int):
+        self._bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+        self._leased -= 1
+
+    def allocate(self) -> int:
+        """Lease a free port, raising a SandboxError if the range is exhausted"""
+        size = self.size
+        if self._leased >= size:
+            raise SandboxError(f"No free ports in range {self.start}-{self.end - 1}")
+        offset = self._next
+        for _ in range(size):
+            # Skip whole bytes which are fully leased
+            if offset & 7 == 0 and self._bitmap[offset >> 3] == 0xFF:
+                offset = (offset + 8) % size
+                continue
+            if not self._is_set(offset):
+                self._set(offset)
+                self._next = (offset + 1) % size
+                return self.start + offset
+            offset = (offset + 1) % size
+        raise SandboxError(f"No free ports in range {self.start}-{self.end - 1}")
+
+    def reserve(self, port: int) -> bool:
+        """Mark a port as leased (e.g.: when rebuilding from existing containers). Return False
+        if the port is outside the range or already leased"""
+        if not self.start <= port < self.end:
+            return False
+        offset = port - self.start
+        if self._is_set(offset):
+            return False
+        self._set(offset)
+        return True
+
+    def release(self, port: int) -> bool:
+        """Return a leased port to the range. Return False if it was not leased"""
+        if not self.start <= port < self.end:
+            return False
+        offset = port - self.start
+        if not self._is_set(offset):
+            return False
+        self._clear(offset)
+        return True
+
+    def reset(self, ports: Iterable[int] = ()):
+        """Release all leases, then reserve the ports given"""
+        self._bitmap = bytearray(len(self._bitmap))
+        self._leased = 0
+        for port in ports:
+            self.reserve(port)
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import UUID
+
+from docker.errors import NotFound
+
+from openhands_server.sandbox.sandbox_models import DeleteQueueStats
+from openhands_server.utils.async_docker import AsyncDocker
+from openhands_server.utils.async_utils import bounded_gather
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _DeleteJob:
+    sandbox_id: UUID
+    container_name: str
+    volume_names: list[str]
+    attempts: int = 0
+    container_removed: bool = False
+
+
+@dataclass
+class SandboxDeleteQueue:
+    """
+    Background pipeline for deleting sandboxes, so that requests do not wait for containers
+    to stop. Containers are stopped gracefully (Or killed if configured) and removed
+    concurrently, up to container_batch_size at once, while their workspace volumes are
+    collected and removed in batches. Failed steps
+    (Including the daemon being unreachable) are retried after a delay, up to a maximum number
+    of attempts.
+    """
+
+    async_docker: AsyncDocker
+    # Invoked with the sandbox id and container once a container has been removed (The
+    # container is None if it was already gone)
+    on_container_removed: Callable[[UUID, Any | None], None] | None = None
+    # Invoked with the sandbox id once a job is complete (Whether or not it succeeded)
+    on_done: Callable[[UUID], None] | None = None
+    kill: bool = False
+    stop_timeout: int = 10
+    container_batch_size: int = 8
+    volume_batch_size: int = 16
+    max_attempts: int = 5
+    retry_delay: float = 5
+    # Window in seconds over which the drain rate is measured
+    drain_rate_window: float = 60
+    _queue: asyncio.Queue[_DeleteJob] = field(default_factory=asyncio.Queue, init=False)
+    _pending_volumes: list[_DeleteJob] = field(default_factory=list, init=False)
+    _completed_at: deque[float] = field(default_factory=deque, init=False)
+    _stats: DeleteQueueStats = field(default_factory=DeleteQueueStats, init=False)
+    _task: asyncio.Task | None = field(default=None, init=False)
+    _retry_tasks: set[asyncio.Task] = field(default_factory=set, init=False)
+
+    def enqueue(self, sandbox_id: UUID, container_name: str, volume_names: list[str]):
+        self._stats.queued += 1
+        self._queue.put_nowait(_DeleteJob(sandbox_id, container_name, volume_names))
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._retry_tasks):
+            task.cancel()
+        self._retry_tasks.clear()
+
+    async def _run(self):
+        while True:
+            try:
+                if self._pending_volumes and self._queue.empty():
+                    await self._remove_volumes()
+                jobs = [await self._queue.get()]
+                while not self._queue.empty() and len(jobs) < self.container_batch_size:
+                    jobs.append(self._queue.get_nowait())
+                await bounded_gather(
+                    (self._remove_container(job) for job in jobs),
+                    self.container_batch_size,
+                )
+                if len(self._pending_volumes) >= self.volume_batch_size:
+                    await self._remove_volumes()
+            except Exception:
+                # Keep draining whatever goes wrong
+                logger.exception("sandbox_delete_queue_error")
+
+    async def _remove_container(self, job: _DeleteJob):
+        try:
+            container = await self.async_docker.get_container(job.container_name)
+            if container.status in ["running", "paused", "restarting"]:
+                if self.kill:
+                    await self.async_docker.run(container.kill)
+                else:
+                    await self.async_docker.run_long(
+                        container.stop, timeout=self.stop_timeout
+                    )
+            await self.async_docker.run(container.remove, force=True)
+            if self.on_container_removed:
+                self.on_container_removed(job.sandbox_id, container)
+        except NotFound:
+            # Already gone
+            if self.on_container_removed:
+                self.on_container_removed(job.sandbox_id, None)
+        except Exception:
+            # Includes connection errors while the daemon is down
+            logger.warning(
+                f"sandbox_container_delete_failed:{job.sandbox_id}", exc_info=True
+            )
+            self._retry(job)
+            return
+        job.container_removed = True
+        self._pending_volumes.append(job)
+
+    async def _remove_volume(self, job: _DeleteJob) -> bool:
+        for volume_name in job.volume_names:
+            try:
+                volume = await self.async_docker.get_volume(volume_name)
+                await self.async_docker.run(volume.remove, force=True)
+            except NotFound:
+                pass
+            except Exception:
+                logger.warning(
+                    f"sandbox_volume_delete_failed:{job.sandbox_id}", exc_info=True
+                )
+                return False
+        return True
+
+    async def _remove_volumes(self):
+        jobs = self._pending_volumes
+        self._pending_volumes = []
+        results = await bounded_gather(
+            (self._remove_volume(job) for job in jobs), self.volume_batch_size
+        )
+        for job, removed in zip(jobs, results, strict=True):
+            if removed:
+                self._complete(job)
+            else:
+                self._retry(job)
+
+    def _retry(self, job: _DeleteJob):
+        job.attempts += 1
+        if job.attempts >= self.max_attempts:
+            logger.error(f"sandbox_delete_abandoned:{job.sandbox_id}")
+            self._stats.failed += 1
+            if self.on_done:
+                self.on_done(job.sandbox_id)
+            return
+        self._stats.retried += 1
+
+        async def requeue():
+            await asyncio.sleep(self.retry_delay)
+            if job.container_removed:
+                self._pending_volumes.append(job)
+                if self._queue.empty():
+                    await self._remove_volumes()
+            else:
+                self._queue.put_nowait(job)
+
+        task = asyncio.create_task(requeue())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    def _complete(self, job: _DeleteJob):
+        self._stats.deleted += 1
+        self._completed_at.append(time.monotonic())
+        if self.on_done:
+            self.on_done(job.sandbox_id)
+
+    def get_stats(self) -> DeleteQueueStats:
+        """Get the queue depth, drain rate and counters for the delete pipeline"""
+        cutoff = time.monotonic() - self.drain_rate_window
+        while self._completed_at and self._completed_at[0] < cutoff:
+            self._completed_at.popleft()
+        return self._stats.model_copy(
+            update={
+                "depth": self._queue.qsize() + len(self._pending_volumes),
+                "drain_rate": len(self._completed_at) / self.drain_rate_window,
+            }
+        )
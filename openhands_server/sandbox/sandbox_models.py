@@ -1,39 +1,126 @@
-
-
-from datetime import UTC, datetime
+from datetime import datetime
 from enum import Enum
 from uuid import UUID
+
 from pydantic import BaseModel, Field, SecretStr
 
+from openhands_server.sandbox_spec.sandbox_spec_models import SandboxResourceProfile
 from openhands_server.utils.date_utils import utc_now
+from openhands_server.utils.metrics import HistogramInfo
 
 
 class SandboxStatus(Enum):
-    STARTING = 'STARTING'
-    RUNNING = 'RUNNING'
-    PAUSED = 'PAUSED'
-    DELETED = 'DELETED'
-    ERROR = 'ERROR'
+    STARTING = "STARTING"
+    RUNNING = "RUNNING"
+    PAUSED = "PAUSED"
+    DELETING = "DELETING"
+    DELETED = "DELETED"
+    ERROR = "ERROR"
 
 
 class ExposedUrl(BaseModel):
-    """ URL to access some named service within the container. """
+    """URL to access some named service within the container."""
+
     name: str
     url: str
 
 
 class SandboxInfo(BaseModel):
     """Information about a sandbox"""
+
     id: UUID
     user_id: str
     sandbox_spec_id: str
     status: SandboxStatus
-    url: str | None = Field(description="URL to access sandbox. Sandboxes with a status STARTING / PAUSED / DELETED / ERROR will not have a url")
-    session_api_key: SecretStr | None = Field(description="Key to access sandbox, to be added as an `X-Session-API-Key` header in each request. Sandboxes with a status STARTING / PAUSED / DELETED / ERROR will not have a key")
-    exposed_urls: list[ExposedUrl] = Field(default_factory=list, description="URLs exposed by the sandbox (App server, Vscode, etc...)")
+    url: str | None = Field(
+        description="URL to access sandbox. Sandboxes with a status STARTING / PAUSED / DELETING / DELETED / ERROR will not have a url"
+    )
+    session_api_key: SecretStr | None = Field(
+        description="Key to access sandbox, to be added as an `X-Session-API-Key` header in each request. Sandboxes with a status STARTING / PAUSED / DELETING / DELETED / ERROR will not have a key"
+    )
+    exposed_urls: list[ExposedUrl] = Field(
+        default_factory=list,
+        description="URLs exposed by the sandbox (App server, Vscode, etc...)",
+    )
+    resources: SandboxResourceProfile = Field(
+        default_factory=SandboxResourceProfile,
+        description="Effective resource limits of the sandbox",
+    )
     created_at: datetime = Field(default_factory=utc_now)
 
 
 class SandboxPage(BaseModel):
     items: list[SandboxInfo]
     next_page_id: str | None = None
+
+
+class SandboxSnapshotInfo(BaseModel):
+    """A point in time copy of a sandbox (Its container filesystem and workspace) from which new sandboxes may be started"""
+
+    id: UUID
+    sandbox_id: UUID = Field(
+        description="Id of the sandbox from which the snapshot was taken"
+    )
+    user_id: str
+    sandbox_spec_id: str
+    image: str = Field(description="Image committed from the sandbox container")
+    workspace_volume: str = Field(
+        description="Volume holding a copy of the sandbox workspace"
+    )
+    host: str = Field(description="Docker host on which the snapshot is stored")
+    created_at: datetime = Field(default_factory=utc_now)
+
+
+class WarmPoolStats(BaseModel):
+    """Counters for the pool of pre-started sandboxes kept for each sandbox spec"""
+
+    hits: int = Field(
+        default=0, description="Number of sandbox starts served from the warm pool"
+    )
+    misses: int = Field(
+        default=0, description="Number of sandbox starts which required a cold start"
+    )
+    available: dict[str, int] = Field(
+        default_factory=dict,
+        description="Number of warm sandboxes currently available for each sandbox spec",
+    )
+
+
+class IdleReaperStats(BaseModel):
+    """Number of sandboxes in each idle tier, and counts of the transitions made by the reaper"""
+
+    active_count: int = 0
+    paused_count: int = 0
+    stopped_count: int = 0
+    paused: int = Field(default=0, description="Number of idle sandboxes paused")
+    stopped: int = Field(default=0, description="Number of idle sandboxes stopped")
+    deleted: int = Field(default=0, description="Number of idle sandboxes deleted")
+
+
+class DeleteQueueStats(BaseModel):
+    """State of the background pipeline which deletes sandboxes"""
+
+    depth: int = Field(
+        default=0, description="Number of sandboxes waiting to be deleted"
+    )
+    drain_rate: float = Field(
+        default=0, description="Sandboxes deleted per second over the recent window"
+    )
+    queued: int = 0
+    deleted: int = 0
+    retried: int = 0
+    failed: int = Field(
+        default=0, description="Number of deletions abandoned after repeated failures"
+    )
+
+
+class SandboxServiceStats(BaseModel):
+    """Operational stats for a sandbox service"""
+
+    warm_pool: WarmPoolStats = Field(default_factory=WarmPoolStats)
+    idle_reaper: IdleReaperStats = Field(default_factory=IdleReaperStats)
+    delete_queue: DeleteQueueStats = Field(default_factory=DeleteQueueStats)
+    startup_latency: dict[str, dict[str, HistogramInfo]] = Field(
+        default_factory=dict,
+        description="Latency histograms for each startup phase by sandbox spec",
+    )
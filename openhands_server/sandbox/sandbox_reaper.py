@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+from openhands_server.sandbox.sandbox_models import (
+    IdleReaperStats,
+    SandboxInfo,
+    SandboxStatus,
+)
+from openhands_server.utils.async_utils import bounded_gather
+from openhands_server.utils.date_utils import utc_now
+
+if TYPE_CHECKING:
+    from openhands_server.sandbox.docker_sandbox_service import DockerSandboxService
+
+
+logger = logging.getLogger(__name__)
+
+
+class IdleTier(Enum):
+    ACTIVE = "ACTIVE"
+    PAUSED = "PAUSED"
+    STOPPED = "STOPPED"
+
+
+@dataclass
+class SandboxIdleReaper:
+    """
+    Background scheduler which releases the resources held by idle sandboxes in tiers: idle
+    sandboxes are paused (Keeping their memory resident), then stopped (Releasing memory but
+    keeping the container and workspace), then deleted. Each threshold is measured in seconds
+    since the last recorded activity, and None disables that tier. resume_sandbox brings a
+    paused or stopped sandbox back and counts as activity. Before a running sandbox is moved
+    down a tier, its network traffic is sampled - a sandbox with traffic since the last sample
+    is active.
+    """
+
+    sandbox_service: "DockerSandboxService"
+    pause_after: float | None = None
+    stop_after: float | None = None
+    delete_after: float | None = None
+    check_interval: float = 60
+    # Max number of sandboxes sampled for activity at once
+    sample_concurrency: int = 8
+    _last_activity: dict[UUID, datetime] = field(default_factory=dict, init=False)
+    _tiers: dict[UUID, IdleTier] = field(default_factory=dict, init=False)
+    _stats: IdleReaperStats = field(default_factory=IdleReaperStats, init=False)
+    _task: asyncio.Task | None = field(default=None, init=False)
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            threshold is not None
+            for threshold in (self.pause_after, self.stop_after, self.delete_after)
+        )
+
+    def touch(self, id: UUID):
+        """Record activity on a sandbox"""
+        self._last_activity[id] = utc_now()
+        self._tiers[id] = IdleTier.ACTIVE
+
+    def forget(self, id: UUID):
+        self._last_activity.pop(id, None)
+        self._tiers.pop(id, None)
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.reap()
+            except Exception:
+                logger.exception("sandbox_reaper_error")
+
+    async def _all_sandboxes(self) -> list[SandboxInfo]:
+        sandboxes = []
+        page_id = None
+        while True:
+            page = await self.sandbox_service.search_sandboxes(
+                page_id=page_id, limit=100
+            )
+            sandboxes.extend(page.items)
+            page_id = page.next_page_id
+            if page_id is None:
+                return sandboxes
+
+    def _due(self, idle: float) -> bool:
+        """Check whether a sandbox idle for the number of seconds given has reached any tier"""
+        return any(
+            threshold is not None and idle >= threshold
+            for threshold in (self.pause_after, self.stop_after, self.delete_after)
+        )
+
+    async def reap(self):
+        """Move each idle sandbox to the tier matching how long it has been idle"""
+        now = utc_now()
+        sandboxes = await self._all_sandboxes()
+        candidates = []
+        for sandbox_info in sandboxes:
+            if sandbox_info.status == SandboxStatus.DELETING:
+                continue
+            # Sandboxes found with no recorded activity (e.g.: after a restart) are idle from now
+            last_activity = self._last_activity.setdefault(sandbox_info.id, now)
+            idle = (now - last_activity).total_seconds()
+            tier = self._tiers.get(sandbox_info.id)
+            if tier is None:
+                tier = (
+                    IdleTier.ACTIVE
+                    if sandbox_info.status == SandboxStatus.RUNNING
+                    else IdleTier.PAUSED
+                )
+                self._tiers[sandbox_info.id] = tier
+            candidates.append((sandbox_info, idle, tier))
+
+        # Sampling waits on the daemon for each container, so samples are taken concurrently
+        sample_ids = [
+            sandbox_info.id
+            for sandbox_info, idle, tier in candidates
+            if sandbox_info.status == SandboxStatus.RUNNING
+            and tier == IdleTier.ACTIVE
+            and self._due(idle)
+        ]
+        samples = await bounded_gather(
+            (self.sandbox_service.sample_sandbox_activity(id) for id in sample_ids),
+            self.sample_concurrency,
+        )
+        activity = dict(zip(sample_ids, samples, strict=True))
+
+        for sandbox_info, idle, tier in candidates:
+            if sandbox_info.id in activity:
+                active = activity[sandbox_info.id]
+                if active:
+                    self.touch(sandbox_info.id)
+                    continue
+                if active is None:
+                    # First sample, so compare against it on the next check
+                    continue
+
+            if self.delete_after is not None and idle >= self.delete_after:
+                if await self.sandbox_service.delete_sandbox(sandbox_info.id):
+                    self._stats.deleted += 1
+                self.forget(sandbox_info.id)
+            elif (
+                self.stop_after is not None
+                and idle >= self.stop_after
+                and tier != IdleTier.STOPPED
+            ):
+                if await self.sandbox_service.stop_sandbox(sandbox_info.id):
+                    self._stats.stopped += 1
+                self._tiers[sandbox_info.id] = IdleTier.STOPPED
+            elif (
+                self.pause_after is not None
+                and idle >= self.pause_after
+                and tier == IdleTier.ACTIVE
+                and sandbox_info.status == SandboxStatus.RUNNING
+            ):
+                if await self.sandbox_service.pause_sandbox(sandbox_info.id):
+                    self._stats.paused += 1
+                self._tiers[sandbox_info.id] = IdleTier.PAUSED
+
+        known_ids = {sandbox_info.id for sandbox_info in sandboxes}
+        for id in list(self._last_activity):
+            if id not in known_ids:
+                self.forget(id)
+
+    def get_stats(self) -> IdleReaperStats:
+        """Get the number of sandboxes currently in each tier along with the reaper counters"""
+        tiers = list(self._tiers.values())
+        return self._stats.model_copy(
+            update={
+                "active_count": tiers.count(IdleTier.ACTIVE),
+                "paused_count": tiers.count(IdleTier.PAUSED),
+                "stopped_count": tiers.count(IdleTier.STOPPED),
+            }
+        )
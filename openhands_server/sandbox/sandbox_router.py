@@ -1,10 +1,18 @@
 """Runtime Containers router for OpenHands Server."""
 
 from uuid import UUID
+
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from openhands_server.sandbox.sandbox_models import SandboxInfo, SandboxPage
-from openhands_server.sandbox.sandbox_service import SandboxService, get_default_sandbox_service
+from openhands_server.sandbox.sandbox_models import (
+    SandboxInfo,
+    SandboxPage,
+    SandboxServiceStats,
+)
+from openhands_server.sandbox.sandbox_service import (
+    SandboxService,
+    get_default_sandbox_service,
+)
 from openhands_server.user.user_dependencies import get_user_id
 from openhands_server.utils.success import Success
 
@@ -16,27 +24,39 @@ router.lifespan(sandbox_service)
 
 # Read methods
 
+
 @router.get("/search")
-async def search_sandboxes(page_id: str | None = None, limit: int = 100, user_id: UUID = Depends(get_user_id)) -> SandboxPage:
+async def search_sandboxes(
+    page_id: str | None = None, limit: int = 100, user_id: UUID = Depends(get_user_id)
+) -> SandboxPage:
     """Search / list sandboxes owned by the current user."""
     assert limit > 0
     assert limit <= 100
     return await sandbox_service.search_sandboxes(user_id, page_id, limit)
 
 
-@router.get("/{id}", responses={
-    404: {"description": "Item not found"}
-})
+@router.get("/stats")
+async def get_sandbox_stats(
+    user_id: UUID = Depends(get_user_id),
+) -> SandboxServiceStats:
+    """Get the warm pool, idle reaper, delete queue and startup latency stats of the service."""
+    return sandbox_service.get_stats()
+
+
+@router.get("/{id}", responses={404: {"description": "Item not found"}})
 async def get_sandboxes(id: UUID, user_id: UUID = Depends(get_user_id)) -> SandboxInfo:
     """Get a single sandbox given an id"""
-    sandboxes = await sandbox_service.get_sandboxes(id)
+    sandboxes = await sandbox_service.get_sandbox(id)
     if sandboxes is None or sandboxes.user_id != user_id:
         raise HTTPException(status.HTTP_404_NOT_FOUND)
+    sandbox_service.touch_sandbox(id)
     return sandboxes
 
 
 @router.get("/")
-async def batch_get_sandboxes(ids: list[UUID], user_id: UUID = Depends(get_user_id)) -> list[SandboxInfo | None]:
+async def batch_get_sandboxes(
+    ids: list[UUID], user_id: UUID = Depends(get_user_id)
+) -> list[SandboxInfo | None]:
     """Get a batch of sandboxes given their ids, returning null for any missing sandbox."""
     assert len(ids) < 100
     sandboxess = await sandbox_service.batch_get_sandboxes(user_id, ids)
@@ -44,11 +64,15 @@ async def batch_get_sandboxes(ids: list[UUID], user_id: UUID = Depends(get_user_
         sandboxes if sandboxes and sandboxes.user_id == user_id else None
         for sandboxes in sandboxess
     ]
+    for sandboxes in sandboxess:
+        if sandboxes:
+            sandbox_service.touch_sandbox(sandboxes.id)
     return sandboxess
 
 
 # Write Methods
 
+
 @router.post("/")
 async def start_sandbox(user_id: UUID = Depends(get_user_id)) -> UUID:
     id = await sandbox_service.start_sandbox(user_id)
@@ -59,14 +83,15 @@ async def start_sandbox(user_id: UUID = Depends(get_user_id)) -> UUID:
 async def pause_sandbox(id: UUID, user_id: UUID = Depends(get_user_id)) -> Success:
     exists = await sandbox_service.pause_sandbox(user_id, id)
     if not exists:
-        raise HTTPException(status.HTTP_404_NOT_FOUND) 
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
     return Success()
 
+
 @router.post("/{id}/resume")
 async def resume_sandbox(id: UUID, user_id: UUID = Depends(get_user_id)) -> Success:
     exists = await sandbox_service.resume_sandbox(user_id, id)
     if not exists:
-        raise HTTPException(status.HTTP_404_NOT_FOUND) 
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
     return Success()
 
 
@@ -74,5 +99,5 @@ async def resume_sandbox(id: UUID, user_id: UUID = Depends(get_user_id)) -> Succ
 async def delete_sandbox(id: UUID, user_id: UUID = Depends(get_user_id)) -> Success:
     exists = await sandbox_service.delete_sandbox(user_id, id)
     if not exists:
-        raise HTTPException(status.HTTP_404_NOT_FOUND) 
-    return Success()
\ No newline at end of file
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    return Success()
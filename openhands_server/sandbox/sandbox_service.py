@@ -1,9 +1,11 @@
-
-
 from abc import ABC, abstractmethod
 from uuid import UUID
 
-from openhands_server.sandbox.sandbox_models import SandboxInfo, SandboxPage
+from openhands_server.sandbox.sandbox_models import (
+    SandboxInfo,
+    SandboxPage,
+    SandboxServiceStats,
+)
 from openhands_server.utils.import_utils import get_impl
 
 
@@ -13,7 +15,9 @@ class SandboxService(ABC):
     """
 
     @abstractmethod
-    async def search_sandboxes(self, user_id: UUID | None = None, page_id: str | None = None, limit: int = 100) -> SandboxPage:
+    async def search_sandboxes(
+        self, user_id: UUID | None = None, page_id: str | None = None, limit: int = 100
+    ) -> SandboxPage:
         """Search for sandboxes"""
 
     @abstractmethod
@@ -26,7 +30,7 @@ class SandboxService(ABC):
 
     @abstractmethod
     async def start_sandbox(self, user_id: UUID, sandbox_spec_id: str) -> SandboxInfo:
-        """Begin the process of starting a sandbox. Return the info on the new sandbox """
+        """Begin the process of starting a sandbox. Return the info on the new sandbox"""
 
     @abstractmethod
     async def resume_sandbox(self, id: UUID) -> bool:
@@ -40,6 +44,14 @@ class SandboxService(ABC):
     async def delete_sandbox(self, id: UUID) -> bool:
         """Begin the process of deleting a sandbox (self, Which may involve stopping it first). Return False if the sandbox did not exist"""
 
+    @abstractmethod
+    def touch_sandbox(self, id: UUID):
+        """Record activity on a sandbox (e.g.: it was accessed by its owner), so that it is not reaped as idle"""
+
+    def get_stats(self) -> SandboxServiceStats:
+        """Get operational stats for this service. Services which do not collect any return the defaults"""
+        return SandboxServiceStats()
+
     # Lifecycle methods
 
     async def __aenter__(self):
@@ -51,7 +63,7 @@ class SandboxService(ABC):
     @classmethod
     @abstractmethod
     def get_instance(cls) -> "SandboxService":
-        """ Get an instance of sandbox service """
+        """Get an instance of sandbox service"""
 
 
 _sandbox_service = None
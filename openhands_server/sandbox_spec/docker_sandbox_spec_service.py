@@ -1,53 +1,210 @@
-
+import asyncio
+import logging
+import time
+from bisect import insort
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
-import docker
-from docker.errors import NotFound, APIError
+
+from docker.errors import APIError, NotFound
+
+from openhands_server.sandbox_spec.image_prewarmer import ImagePrewarmer
+from openhands_server.sandbox_spec.sandbox_spec_models import (
+    SandboxResourceProfile,
+    SandboxSpecInfo,
+    SandboxSpecInfoPage,
+    SandboxSpecStatus,
+)
 from openhands_server.sandbox_spec.sandbox_spec_service import SandboxSpecService
-from openhands_server.sandbox_spec.sandbox_spec_models import SandboxSpecInfo, SandboxSpecInfoPage
+from openhands_server.utils.async_docker import AsyncDocker, get_default_async_docker
+from openhands_server.utils.async_utils import bounded_gather
+from openhands_server.utils.date_utils import utc_now
+from openhands_server.utils.docker_events import DockerEventStream
+from openhands_server.utils.page_cursor import PageCursor, page_newest_first
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _RepositorySpecs:
+    """Specs for the images in the repository, as loaded into the cache"""
+
+    # Every tag of each image maps to the spec of the image
+    by_tag: dict[str, SandboxSpecInfo]
+    # Each spec once, sorted in ascending order of its page key
+    by_key: dict[PageCursor, SandboxSpecInfo]
+    sorted_keys: list[PageCursor]
+
+
+# Image events after which cached specs may be out of date
+IMAGE_EVENTS = ["pull", "tag", "untag", "delete", "import", "load"]
 
 
 @dataclass
 class DockerSandboxSpecService(SandboxSpecService):
     """
-    Sandbox spec service for docker images. By default, all images with the repository given 
-    are loaded and returned (They may have different tag) The combination of the repository 
+    Sandbox spec service for docker images. By default, all images with the repository given
+    are loaded and returned (They may have different tag) The combination of the repository
     and tag is treated as the id in the resulting image.
+
+    Tags listed in prewarm_tags are pulled on every host in the background, and are BUILDING
+    until present everywhere. Specs are cached in memory. The cache is invalidated by docker image events while the
+    service is running, and entries expire after cache_ttl seconds regardless.
     """
 
-    client: docker.DockerClient = field(default_factory=docker.from_env)
+    async_docker: AsyncDocker = field(default_factory=get_default_async_docker)
     repository: str = "ghcr.io/all-hands-ai/runtime"
     command: str = "python -u -m openhands_server.runtime"
     initial_env: dict[str, str] = field(default_factory=dict)
-    working_dir: str = '/openhands/code'
+    working_dir: str = "/openhands/code"
+    # Default resource limits, and overrides by sandbox spec id (repository:tag)
+    resources: SandboxResourceProfile = field(default_factory=SandboxResourceProfile)
+    resource_profiles: dict[str, SandboxResourceProfile] = field(default_factory=dict)
+    cache_ttl: float = 60
+    _repository_specs: _RepositorySpecs | None = field(default=None, init=False)
+    _specs_loaded_at: float = field(default=0, init=False)
+    # Lookups outside the repository, as (loaded at, spec or None if not found)
+    _other_specs: dict[str, tuple[float, SandboxSpecInfo | None]] = field(
+        default_factory=dict, init=False
+    )
+    # Incremented on invalidation, so that a load which overlaps an image event is discarded
+    _generation: int = field(default=0, init=False)
+    _load_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+    _event_stream: DockerEventStream | None = field(default=None, init=False)
+    # Tags in the repository to keep pulled, and the daemons to pull them on (Defaults to
+    # async_docker. The docker sandbox service sets this to its hosts)
+    prewarm_tags: list[str] = field(default_factory=list)
+    prewarm_hosts: list[AsyncDocker] = field(default_factory=list)
+    prewarm_interval: float = 300
+    # Number of unused old images to keep on each host (None to disable garbage collection)
+    prewarm_keep_unused: int | None = None
+    _prewarmer: ImagePrewarmer | None = field(default=None, init=False)
+
+    def _get_image_id(self, image) -> str:
+        """Get the id of the spec for an image: its first tag in the repository, falling back
+        to its first tag, or its short id if it has no tags"""
+        for tag in image.tags:
+            if tag.startswith(self.repository):
+                return tag
+        if image.tags:
+            return image.tags[0]
+        return image.id[:12]
+
+    def _get_resources(self, image) -> SandboxResourceProfile:
+        """Get the resource profile for an image, which may be configured under any of its tags"""
+        for tag in image.tags:
+            resources = self.resource_profiles.get(tag)
+            if resources:
+                return resources
+        return self.resources
 
     def _docker_image_to_sandbox_specs(self, image) -> SandboxSpecInfo:
         """Convert a Docker image to SandboxSpecInfo"""
-        # Extract repository and tag from image tags
-        # Use the first tag if multiple tags exist, or use the image ID if no tags
-        if image.tags:
-            image_id = image.tags[0]  # Use repository:tag as ID
-        else:
-            image_id = image.id[:12]  # Use short image ID if no tags
-        
+        image_id = self._get_image_id(image)
+
         # Parse creation time from image attributes
-        created_str = image.attrs.get('Created', '')
+        created_str = image.attrs.get("Created", "")
         try:
             # Docker timestamps are in ISO format
-            created_at = datetime.fromisoformat(created_str.replace('Z', '+00:00'))
+            created_at = datetime.fromisoformat(created_str.replace("Z", "+00:00"))
         except (ValueError, AttributeError):
-            created_at = datetime.now()
-        
+            created_at = utc_now()
+
         return SandboxSpecInfo(
             id=image_id,
             command=self.command,
             created_at=created_at,
             initial_env=self.initial_env,
-            working_dir=self.working_dir
+            working_dir=self.working_dir,
+            status=self._get_status(image),
+            resources=self._get_resources(image),
+        )
+
+    def _get_status(self, image) -> SandboxSpecStatus:
+        """Get the status of an image, which may be prewarmed under any of its tags"""
+        if self._prewarmer:
+            for tag in image.tags:
+                status = self._prewarmer.get_status(tag)
+                if status:
+                    return status
+        return SandboxSpecStatus.READY
+
+    def _get_pending_specs(self) -> dict[str, SandboxSpecInfo]:
+        """Get specs for prewarmed images which are not yet present locally"""
+        if self._prewarmer is None:
+            return {}
+        return {
+            image_id: SandboxSpecInfo(
+                id=image_id,
+                command=self.command,
+                created_at=since,
+                initial_env=self.initial_env,
+                working_dir=self.working_dir,
+                status=status,
+                resources=self.resource_profiles.get(image_id, self.resources),
+            )
+            for image_id, (status, since) in self._prewarmer.get_pending().items()
+        }
+
+    # Cache
+
+    def invalidate(self):
+        """Discard all cached specs"""
+        self._generation += 1
+        self._repository_specs = None
+        self._other_specs.clear()
+
+    async def _on_image_event(self, event: dict):
+        logger.debug(
+            f"sandbox_spec_invalidated:{event.get('Action')}:{event.get('id')}"
         )
+        self.invalidate()
+
+    async def _on_reconnect(self):
+        self.invalidate()
 
-    async def search_sandbox_specs(self, image_name__eq: str | None = None, page_id: str | None = None, limit: int = 100) -> SandboxSpecInfoPage:
+    async def _get_repository_specs(self) -> _RepositorySpecs:
+        """Get specs for all images in the repository, loading them if necessary"""
+        repository_specs = self._repository_specs
+        if (
+            repository_specs is not None
+            and time.monotonic() - self._specs_loaded_at < self.cache_ttl
+        ):
+            return repository_specs
+        async with self._load_lock:
+            # Another caller may have loaded the specs while we were waiting
+            repository_specs = self._repository_specs
+            if (
+                repository_specs is not None
+                and time.monotonic() - self._specs_loaded_at < self.cache_ttl
+            ):
+                return repository_specs
+            generation = self._generation
+            loaded_at = time.monotonic()
+            images = await self.async_docker.list_images(name=self.repository)
+            by_tag = {}
+            by_key = {}
+            for image in images:
+                if not any(tag.startswith(self.repository) for tag in image.tags):
+                    continue
+                sandbox_spec = self._docker_image_to_sandbox_specs(image)
+                for tag in image.tags:
+                    by_tag[tag] = sandbox_spec
+                by_key[PageCursor(sandbox_spec.created_at, sandbox_spec.id)] = (
+                    sandbox_spec
+                )
+            # Sorted once per load rather than on every search
+            repository_specs = _RepositorySpecs(by_tag, by_key, sorted(by_key))
+            if generation == self._generation:
+                self._repository_specs = repository_specs
+                self._specs_loaded_at = loaded_at
+            return repository_specs
+
+    async def search_sandbox_specs(
+        self,
+        image_name__eq: str | None = None,
+        page_id: str | None = None,
+        limit: int = 100,
+    ) -> SandboxSpecInfoPage:
         """Search for runtime images"""
         try:
             # If image_name__eq is provided, search for that specific image
@@ -56,62 +213,142 @@ class DockerSandboxSpecService(SandboxSpecService):
                 search_name = image_name__eq
             else:
                 search_name = self.repository
-            
-            # Get all images that match the repository
-            images = self.client.images.list(name=search_name)
-            
-            # Convert Docker images to SandboxSpecInfo
-            sandbox_specs = []
-            for image in images:
-                # Only include images that have tags matching our repository
-                if image.tags:
-                    for tag in image.tags:
-                        if tag.startswith(self.repository):
-                            sandbox_specs.append(self._docker_image_to_sandbox_specs(image))
-                            break  # Only add once per image, even if multiple matching tags
-            
-            # Apply pagination
-            start_idx = 0
-            if page_id:
-                try:
-                    start_idx = int(page_id)
-                except ValueError:
-                    start_idx = 0
-            
-            end_idx = start_idx + limit
-            paginated_images = sandbox_specs[start_idx:end_idx]
-            
-            # Determine next page ID
-            next_page_id = None
-            if end_idx < len(sandbox_specs):
-                next_page_id = str(end_idx)
-            
+
+            if search_name == self.repository:
+                repository_specs = await self._get_repository_specs()
+                sandbox_specs_by_key = repository_specs.by_key
+                sorted_keys = repository_specs.sorted_keys
+                # Prewarmed images not yet present locally (Usually none) are merged in
+                pending_specs = [
+                    sandbox_spec
+                    for id, sandbox_spec in self._get_pending_specs().items()
+                    if id not in repository_specs.by_tag
+                ]
+                if pending_specs:
+                    sandbox_specs_by_key = dict(sandbox_specs_by_key)
+                    sorted_keys = list(sorted_keys)
+                    for sandbox_spec in pending_specs:
+                        key = PageCursor(sandbox_spec.created_at, sandbox_spec.id)
+                        sandbox_specs_by_key[key] = sandbox_spec
+                        insort(sorted_keys, key)
+            else:
+                # Get all images that match the name
+                images = await self.async_docker.list_images(name=search_name)
+
+                # Convert Docker images to SandboxSpecInfo
+                sandbox_specs = []
+                for image in images:
+                    # Only include images that have tags matching our repository
+                    if image.tags:
+                        for tag in image.tags:
+                            if tag.startswith(self.repository):
+                                sandbox_specs.append(
+                                    self._docker_image_to_sandbox_specs(image)
+                                )
+                                break  # Only add once per image, even if multiple matching tags
+                sandbox_specs_by_key = {
+                    PageCursor(sandbox_spec.created_at, sandbox_spec.id): sandbox_spec
+                    for sandbox_spec in sandbox_specs
+                }
+                sorted_keys = sorted(sandbox_specs_by_key)
+
+            # Apply pagination (newest first)
+            keys, next_page_id = page_newest_first(sorted_keys, page_id, limit)
+
             return SandboxSpecInfoPage(
-                items=paginated_images,
-                next_page_id=next_page_id
+                items=[sandbox_specs_by_key[key] for key in keys],
+                next_page_id=next_page_id,
             )
-            
-        except APIError as e:
+
+        except APIError:
             # Return empty page if there's an API error
             return SandboxSpecInfoPage(items=[], next_page_id=None)
 
     async def get_sandbox_spec(self, id: str) -> SandboxSpecInfo | None:
         """Get a single runtime image info by ID"""
+        try:
+            sandbox_spec = (await self._get_repository_specs()).by_tag.get(id)
+        except APIError:
+            sandbox_spec = None
+        if sandbox_spec:
+            return sandbox_spec
+        sandbox_spec = self._get_pending_specs().get(id)
+        if sandbox_spec:
+            return sandbox_spec
+
+        # Images outside the repository are cached individually
+        cached = self._other_specs.get(id)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+        generation = self._generation
+        loaded_at = time.monotonic()
         try:
             # Try to get the image by ID (which should be repository:tag)
-            image = self.client.images.get(id)
-            return self._docker_image_to_sandbox_specs(image)
-        except (NotFound, APIError):
+            image = await self.async_docker.get_image(id)
+            sandbox_spec = self._docker_image_to_sandbox_specs(image)
+        except NotFound:
+            sandbox_spec = None
+        except APIError:
             return None
+        if generation == self._generation:
+            self._other_specs[id] = (loaded_at, sandbox_spec)
+        return sandbox_spec
 
-    async def batch_get_sandbox_specs(self, ids: list[str]) -> list[SandboxSpecInfo | None]:
-        """Get a batch of runtime image info"""
-        results = []
-        for image_id in ids:
-            result = await self.get_sandbox_spec(image_id)
-            results.append(result)
+    async def batch_get_sandbox_specs(
+        self, ids: list[str]
+    ) -> list[SandboxSpecInfo | None]:
+        """Get a batch of runtime image info. Images in the configured repository are resolved
+        from the cache, and any others are looked up concurrently"""
+        try:
+            specs_by_tag = (await self._get_repository_specs()).by_tag
+        except APIError:
+            specs_by_tag = {}
+        results: list[SandboxSpecInfo | None] = [specs_by_tag.get(id) for id in ids]
+
+        missing = [index for index, result in enumerate(results) if result is None]
+        found = await bounded_gather(
+            (self.get_sandbox_spec(ids[index]) for index in missing),
+            self.batch_get_concurrency,
+        )
+        for index, result in zip(missing, found, strict=True):
+            results[index] = result
         return results
 
+    # Lifecycle methods
+
+    async def __aenter__(self):
+        """Start following image events so that cached specs are invalidated, and start
+        prewarming images"""
+        if self.prewarm_tags and self._prewarmer is None:
+            self._prewarmer = ImagePrewarmer(
+                hosts=self.prewarm_hosts or [self.async_docker],
+                repository=self.repository,
+                image_ids=[f"{self.repository}:{tag}" for tag in self.prewarm_tags],
+                on_change=self.invalidate,
+                keep_unused=self.prewarm_keep_unused,
+                check_interval=self.prewarm_interval,
+            )
+            await self._prewarmer.start()
+        if self._event_stream is None:
+            self._event_stream = DockerEventStream(
+                async_docker=self.async_docker,
+                callback=self._on_image_event,
+                filters={"type": "image", "event": IMAGE_EVENTS},
+                on_reconnect=self._on_reconnect,
+            )
+            await self._event_stream.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Stop following image events and prewarming images"""
+        if self._prewarmer is not None:
+            await self._prewarmer.stop()
+            self._prewarmer = None
+        if self._event_stream is not None:
+            await self._event_stream.stop()
+            self._event_stream = None
+        self.invalidate()
+
     @classmethod
     def get_instance(cls) -> "SandboxSpecService":
         return DockerSandboxSpecService()
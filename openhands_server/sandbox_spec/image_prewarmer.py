@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from docker.errors import APIError, NotFound
+
+from openhands_server.sandbox_spec.sandbox_spec_models import SandboxSpecStatus
+from openhands_server.utils.async_docker import AsyncDocker
+from openhands_server.utils.async_utils import bounded_gather
+from openhands_server.utils.date_utils import utc_now
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImagePrewarmer:
+    """
+    Keeps a set of images pulled on every docker host, so that the first sandbox for a spec
+    does not wait for a pull. An image is BUILDING until it is present on every host, and
+    READY after that. Images in the repository which are not in the set and not used by any
+    container are removed, oldest first, beyond the newest keep_unused.
+    """
+
+    hosts: list[AsyncDocker]
+    repository: str
+    # Ids (repository:tag) of the images to keep pulled
+    image_ids: list[str]
+    # Invoked whenever the status of an image changes
+    on_change: Callable[[], None] | None = None
+    # Number of unused images to keep on each host (None to disable garbage collection)
+    keep_unused: int | None = None
+    check_interval: float = 300
+    pull_concurrency: int = 2
+    _status: dict[str, SandboxSpecStatus] = field(default_factory=dict, init=False)
+    # When each image was first seen as missing
+    _pending_since: dict[str, datetime] = field(default_factory=dict, init=False)
+    _task: asyncio.Task | None = field(default=None, init=False)
+
+    def get_status(self, image_id: str) -> SandboxSpecStatus | None:
+        """Get the status of a prewarmed image, or None if it is not prewarmed"""
+        return self._status.get(image_id)
+
+    def get_pending(self) -> dict[str, tuple[SandboxSpecStatus, datetime]]:
+        """Get the images which are not yet READY, with the time they were first seen"""
+        return {
+            image_id: (status, self._pending_since[image_id])
+            for image_id, status in self._status.items()
+            if status != SandboxSpecStatus.READY
+        }
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.prewarm()
+                if self.keep_unused is not None:
+                    for async_docker in self.hosts:
+                        await self.collect_garbage(async_docker)
+            except Exception:
+                logger.exception("image_prewarm_error")
+            await asyncio.sleep(self.check_interval)
+
+    def _set_status(self, image_id: str, status: SandboxSpecStatus):
+        if self._status.get(image_id) == status:
+            return
+        self._status[image_id] = status
+        if status == SandboxSpecStatus.READY:
+            self._pending_since.pop(image_id, None)
+        else:
+            self._pending_since.setdefault(image_id, utc_now())
+        if self.on_change:
+            self.on_change()
+
+    async def _is_present(self, async_docker: AsyncDocker, image_id: str) -> bool:
+        try:
+            await async_docker.get_image(image_id)
+            return True
+        except NotFound:
+            return False
+
+    async def _pull(self, async_docker: AsyncDocker, image_id: str):
+        logger.info(f"image_pull:{image_id}")
+        await async_docker.pull_image(image_id)
+
+    async def prewarm(self):
+        """Pull any images which are missing on any host"""
+        missing = []
+        for image_id in self.image_ids:
+            for async_docker in self.hosts:
+                try:
+                    if not await self._is_present(async_docker, image_id):
+                        missing.append((async_docker, image_id))
+                except APIError:
+                    logger.exception(f"image_check_failed:{image_id}")
+                    missing.append((async_docker, image_id))
+        missing_ids = {image_id for _, image_id in missing}
+        for image_id in self.image_ids:
+            if image_id in missing_ids:
+                if self._status.get(image_id) != SandboxSpecStatus.ERROR:
+                    self._set_status(image_id, SandboxSpecStatus.BUILDING)
+            else:
+                self._set_status(image_id, SandboxSpecStatus.READY)
+        if not missing:
+            return
+
+        async def pull(async_docker: AsyncDocker, image_id: str) -> bool:
+            try:
+                await self._pull(async_docker, image_id)
+                return True
+            except APIError:
+                logger.exception(f"image_pull_failed:{image_id}")
+                return False
+
+        results = await bounded_gather(
+            (pull(async_docker, image_id) for async_docker, image_id in missing),
+            self.pull_concurrency,
+        )
+        failed = {
+            image_id
+            for (_, image_id), ok in zip(missing, results, strict=True)
+            if not ok
+        }
+        for image_id in missing_ids:
+            self._set_status(
+                image_id,
+                SandboxSpecStatus.ERROR
+                if image_id in failed
+                else SandboxSpecStatus.READY,
+            )
+
+    async def collect_garbage(self, async_docker: AsyncDocker):
+        """Remove unused images in the repository on the host given, beyond the newest keep_unused"""
+        wanted = set(self.image_ids)
+        images = await async_docker.list_images(name=self.repository)
+        unused = []
+        for image in images:
+            if any(tag in wanted for tag in image.tags):
+                continue
+            containers = await async_docker.list_containers(
+                all=True, filters={"ancestor": image.id}
+            )
+            if not containers:
+                unused.append(image)
+        unused.sort(key=lambda image: image.attrs.get("Created", ""), reverse=True)
+        for image in unused[self.keep_unused :]:
+            for tag in image.tags:
+                if not tag.startswith(self.repository):
+                    continue
+                logger.info(f"image_gc:{tag}")
+                try:
+                    await async_docker.run(
+                        (await async_docker.ensure_client()).images.remove, tag
+                    )
+                except NotFound:
+                    pass
+                except APIError:
+                    # May be in use by a container created since the check
+                    logger.warning(f"image_gc_failed:{tag}", exc_info=True)
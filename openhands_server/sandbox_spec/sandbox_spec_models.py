@@ -1,8 +1,5 @@
-
-
 from datetime import datetime
 from enum import Enum
-from uuid import UUID
 
 from pydantic import BaseModel, Field
 
@@ -14,13 +11,42 @@ class SandboxSpecStatus(Enum):
     DELETING = "DELETING"
 
 
+class SandboxResourceProfile(BaseModel):
+    """Resource limits applied to sandboxes. Fields which are None are not limited"""
+
+    cpus: float | None = Field(
+        default=None, description="CPU quota, as a number of cpus"
+    )
+    cpuset_cpus: str | None = Field(
+        default=None,
+        description="CPUs to which sandboxes are pinned (e.g.: '0-3' or '0,2')",
+    )
+    memory: int | None = Field(default=None, description="Memory limit in bytes")
+    pids_limit: int | None = Field(default=None, description="Max number of processes")
+    tmpfs_working_dir: bool = Field(
+        default=False,
+        description="Mount the working dir as an in memory tmpfs rather than a volume",
+    )
+    tmpfs_size: int | None = Field(
+        default=None, description="Size limit in bytes of the tmpfs working dir"
+    )
+
+
 class SandboxSpecInfo(BaseModel):
-    """ A runtime image is a template for creating a runtime, analogous to a docker image """
+    """A runtime image is a template for creating a runtime, analogous to a docker image"""
+
     id: str
     command: str
     created_at: datetime
-    initial_env: dict[str, str] = Field(default_factory=dict, description="Initial Environment Variables")
-    working_dir: str = '/openhands/code'
+    initial_env: dict[str, str] = Field(
+        default_factory=dict, description="Initial Environment Variables"
+    )
+    working_dir: str = "/openhands/code"
+    status: SandboxSpecStatus = Field(
+        default=SandboxSpecStatus.READY,
+        description="Sandboxes may only be started from READY specs",
+    )
+    resources: SandboxResourceProfile = Field(default_factory=SandboxResourceProfile)
 
 
 class SandboxSpecInfoPage(BaseModel):
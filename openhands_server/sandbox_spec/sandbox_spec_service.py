@@ -1,7 +1,10 @@
-
-
 from abc import ABC, abstractmethod
-from openhands_server.sandbox_spec.sandbox_spec_models import SandboxSpecInfo, SandboxSpecInfoPage
+
+from openhands_server.sandbox_spec.sandbox_spec_models import (
+    SandboxSpecInfo,
+    SandboxSpecInfoPage,
+)
+from openhands_server.utils.async_utils import bounded_gather
 from openhands_server.utils.import_utils import get_impl
 
 
@@ -9,26 +12,31 @@ class SandboxSpecService(ABC):
     """
     Service for accessing sandbox specs. At present this is read only. The plan is that later this class
     will allow building and deleting sandbox specs and limiting access of images by user and group.
-    It would also be nice to be able to set the desired number of warm sandboxes for a spec and scale this
-    up and down.
+    The desired number of warm sandboxes for a spec is managed by the sandbox service (See
+    DockerSandboxService.set_warm_pool_size)
     """
 
+    # Max number of concurrent lookups in batch_get_sandbox_specs
+    batch_get_concurrency: int = 8
+
     @abstractmethod
-    async def search_sandbox_specs(self, page_id: str | None = None, limit: int = 100) -> SandboxSpecInfoPage:
+    async def search_sandbox_specs(
+        self, page_id: str | None = None, limit: int = 100
+    ) -> SandboxSpecInfoPage:
         """Search for sandbox specs"""
 
     @abstractmethod
     async def get_sandbox_spec(self, id: str) -> SandboxSpecInfo | None:
         """Get a single sandbox spec, returning None if not found."""
 
-    async def batch_get_sandbox_specs(self, ids: list[str]) -> list[SandboxSpecInfo | None]:
+    async def batch_get_sandbox_specs(
+        self, ids: list[str]
+    ) -> list[SandboxSpecInfo | None]:
         """Get a batch of sandbox specs, returning None for any spec which was not found"""
-        results = [
-            self.get_sandbox_spec(id)
-            for id in ids
-        ]
+        results = await bounded_gather(
+            (self.get_sandbox_spec(id) for id in ids), self.batch_get_concurrency
+        )
         return results
-        
 
     # Lifecycle methods
 
@@ -41,7 +49,7 @@ class SandboxSpecService(ABC):
     @classmethod
     @abstractmethod
     def get_instance(cls) -> "SandboxSpecService":
-        """ Get an instance of runtime image service """
+        """Get an instance of runtime image service"""
 
 
 _sandbox_spec_service = None
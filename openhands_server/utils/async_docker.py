@@ -0,0 +1,159 @@
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+import docker
+
+T = TypeVar("T")
+
+
+@dataclass
+class AsyncDocker:
+    """
+    Non blocking access to a docker daemon. The docker SDK is synchronous, so every call is
+    run in a dedicated thread pool rather than on the event loop (Or the default executor, which
+    is shared with other blocking work). The number of calls in flight is limited so that a slow
+    or busy daemon cannot stall the API - callers over the limit wait on the event loop, where
+    they may still be cancelled. Calls which may take seconds or minutes (Pulls, containers run
+    to completion, graceful stops) go through run_long, which has its own threads and limit, so
+    that they cannot take every slot from lookups.
+    """
+
+    client: docker.DockerClient | None = None
+    # Daemon url (e.g.: tcp://10.0.0.2:2376). If unset, the client is configured from the environment
+    base_url: str | None = None
+    max_concurrency: int = 8
+    max_long_concurrency: int = 4
+    _executor: ThreadPoolExecutor | None = field(default=None, init=False)
+    _semaphore: asyncio.Semaphore | None = field(default=None, init=False)
+    _long_executor: ThreadPoolExecutor | None = field(default=None, init=False)
+    _long_semaphore: asyncio.Semaphore | None = field(default=None, init=False)
+    _client_lock: asyncio.Lock = field(default_factory=asyncio.Lock, init=False)
+
+    def get_client(self) -> docker.DockerClient:
+        """Get Docker client, creating it if necessary. Creating the client queries the daemon
+        version, so on the event loop use ensure_client instead"""
+        if self.client is None:
+            if self.base_url:
+                self.client = docker.DockerClient(base_url=self.base_url)
+            else:
+                self.client = docker.from_env()
+        return self.client
+
+    async def ensure_client(self) -> docker.DockerClient:
+        """Get Docker client, creating it in the thread pool if necessary"""
+        if self.client is None:
+            async with self._client_lock:
+                if self.client is None:
+                    await self.run(self.get_client)
+        return self.client
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a blocking docker SDK call in the thread pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="docker"
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await self._run_in(self._executor, self._semaphore, fn, *args, **kwargs)
+
+    async def run_long(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a blocking docker SDK call which may take seconds or minutes in the thread pool
+        for long calls"""
+        if self._long_executor is None:
+            self._long_executor = ThreadPoolExecutor(
+                max_workers=self.max_long_concurrency, thread_name_prefix="docker-long"
+            )
+            self._long_semaphore = asyncio.Semaphore(self.max_long_concurrency)
+        return await self._run_in(
+            self._long_executor, self._long_semaphore, fn, *args, **kwargs
+        )
+
+    async def _run_in(
+        self,
+        executor: ThreadPoolExecutor,
+        semaphore: asyncio.Semaphore,
+        fn: Callable[..., T],
+        *args,
+        **kwargs,
+    ) -> T:
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                executor, functools.partial(fn, *args, **kwargs)
+            )
+
+    # Convenience wrappers for the calls the services make most often
+
+    async def list_containers(self, **kwargs) -> list[Any]:
+        client = await self.ensure_client()
+        return await self.run(client.containers.list, **kwargs)
+
+    async def get_container(self, container_id: str) -> Any:
+        client = await self.ensure_client()
+        return await self.run(client.containers.get, container_id)
+
+    async def run_container(self, **kwargs) -> Any:
+        """Run a container to completion (e.g.: a helper copying a volume)"""
+        client = await self.ensure_client()
+        return await self.run_long(client.containers.run, **kwargs)
+
+    async def create_container(self, **kwargs) -> Any:
+        client = await self.ensure_client()
+        return await self.run(client.containers.create, **kwargs)
+
+    async def get_volume(self, volume_id: str) -> Any:
+        client = await self.ensure_client()
+        return await self.run(client.volumes.get, volume_id)
+
+    async def create_volume(self, **kwargs) -> Any:
+        client = await self.ensure_client()
+        return await self.run(client.volumes.create, **kwargs)
+
+    async def list_volumes(self, **kwargs) -> list[Any]:
+        client = await self.ensure_client()
+        return await self.run(client.volumes.list, **kwargs)
+
+    async def list_images(self, **kwargs) -> list[Any]:
+        client = await self.ensure_client()
+        return await self.run(client.images.list, **kwargs)
+
+    async def get_image(self, name: str) -> Any:
+        client = await self.ensure_client()
+        return await self.run(client.images.get, name)
+
+    async def pull_image(self, name: str) -> Any:
+        """Pull an image, defaulting to the latest tag if the name has none"""
+        client = await self.ensure_client()
+        return await self.run_long(client.images.pull, name)
+
+    async def remove_image(self, name: str, **kwargs):
+        client = await self.ensure_client()
+        await self.run(client.images.remove, name, **kwargs)
+
+    def close(self):
+        """Release the thread pool. Calls already in flight are allowed to finish"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._semaphore = None
+        if self._long_executor is not None:
+            self._long_executor.shutdown(wait=False)
+            self._long_executor = None
+            self._long_semaphore = None
+
+
+_async_docker = None
+
+
+def get_default_async_docker() -> AsyncDocker:
+    """Get the docker access layer shared by the sandbox and sandbox spec services, so that the
+    concurrency limit applies to the daemon as a whole"""
+    global _async_docker
+    if _async_docker:
+        return _async_docker
+    _async_docker = AsyncDocker()
+    return _async_docker
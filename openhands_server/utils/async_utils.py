@@ -0,0 +1,18 @@
+import asyncio
+from collections.abc import Awaitable, Iterable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+# A TypeVar rather than PEP 695 type parameters, so that the module still imports on 3.11
+async def bounded_gather(awaitables: Iterable[Awaitable[T]], limit: int = 8) -> list[T]:  # noqa: UP047
+    """Await all the awaitables given with at most `limit` in flight at once, returning the
+    results in the order given"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(awaitable: Awaitable[T]) -> T:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables))
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from docker.errors import APIError
+
+from openhands_server.utils.async_docker import AsyncDocker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DockerEventStream:
+    """
+    Follows the docker events stream and passes each event to a callback on the event loop.
+    Reading the stream blocks indefinitely, so it runs in its own thread rather than in the
+    bounded pool used for other docker calls. If the stream drops, it is reopened after a delay
+    and on_reconnect is invoked so that the caller can correct for any events it missed.
+    """
+
+    async_docker: AsyncDocker
+    callback: Callable[[dict], Awaitable[None]]
+    filters: dict = field(default_factory=dict)
+    on_reconnect: Callable[[], Awaitable[None]] | None = None
+    retry_delay: float = 5
+    _task: asyncio.Task | None = field(default=None, init=False)
+    _stream: Any = field(default=None, init=False)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        stream = self._stream
+        if stream is not None:
+            stream.close()
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[dict | None] = asyncio.Queue()
+        first = True
+        while True:
+            if not first and self.on_reconnect:
+                try:
+                    await self.on_reconnect()
+                except Exception:
+                    logger.exception("docker_event_reconnect_error")
+            first = False
+            thread = threading.Thread(
+                target=self._read, args=(loop, queue), name="docker-events", daemon=True
+            )
+            thread.start()
+            try:
+                while True:
+                    event = await queue.get()
+                    if event is None:
+                        break
+                    try:
+                        await self.callback(event)
+                    except Exception:
+                        logger.exception("docker_event_callback_error")
+            finally:
+                stream = self._stream
+                if stream is not None:
+                    stream.close()
+            await asyncio.sleep(self.retry_delay)
+
+    def _read(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        try:
+            self._stream = self.async_docker.get_client().events(
+                decode=True, filters=self.filters
+            )
+            for event in self._stream:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        except (APIError, OSError):
+            logger.warning("docker_event_stream_closed", exc_info=True)
+        except Exception:
+            logger.exception("docker_event_stream_error")
+        finally:
+            self._stream = None
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+            except RuntimeError:
+                # Loop already closed
+                pass
@@ -0,0 +1,59 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+from pydantic import BaseModel
+
+# Default bucket upper bounds, in seconds
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+)
+
+
+class HistogramInfo(BaseModel):
+    """Snapshot of a histogram. counts[i] is the number of observations no greater than
+    buckets[i] (And greater than buckets[i - 1]), with a final count for values above the
+    last bucket"""
+
+    buckets: list[float]
+    counts: list[int]
+    count: int
+    sum: float
+
+
+@dataclass
+class Histogram:
+    """Fixed bucket histogram for latency measurements"""
+
+    buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS
+    _counts: list[int] = field(init=False)
+    _count: int = field(default=0, init=False)
+    _sum: float = field(default=0, init=False)
+
+    def __post_init__(self):
+        self._counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self._count += 1
+        self._sum += value
+
+    def get_info(self) -> HistogramInfo:
+        return HistogramInfo(
+            buckets=list(self.buckets),
+            counts=list(self._counts),
+            count=self._count,
+            sum=self._sum,
+        )
@@ -0,0 +1,55 @@
+import base64
+import binascii
+import json
+from bisect import bisect_left
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(frozen=True, order=True)
+class PageCursor:
+    """
+    Opaque keyset cursor used as a page_id. Results are ordered newest first by
+    (created_at, id), and a cursor holds the key of the last item on the previous page -
+    so the next page can be found by seeking to it, and does not shift as items are
+    created or deleted.
+    """
+
+    created_at: datetime
+    id: str
+
+    def encode(self) -> str:
+        payload = json.dumps([self.created_at.isoformat(), self.id])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, page_id: str | None) -> "PageCursor | None":
+        """Decode a page_id, returning None if it is missing or malformed. Cursors without a
+        time zone are malformed, as they cannot be compared with the keys they seek to"""
+        if not page_id:
+            return None
+        try:
+            padded = page_id + "=" * (-len(page_id) % 4)
+            created_at, id = json.loads(base64.urlsafe_b64decode(padded))
+            created_at = datetime.fromisoformat(created_at)
+        except (binascii.Error, ValueError, TypeError):
+            return None
+        if created_at.tzinfo is None:
+            return None
+        return PageCursor(created_at, str(id))
+
+
+def page_newest_first(
+    keys: Sequence[PageCursor], page_id: str | None, limit: int
+) -> tuple[list[PageCursor], str | None]:
+    """
+    Given keys sorted in ascending order, get the keys of the page following the page_id
+    given (newest first) and the page_id of the next page. Cost is O(log n + limit)
+    """
+    cursor = PageCursor.decode(page_id)
+    end = len(keys) if cursor is None else bisect_left(keys, cursor)
+    start = max(end - limit, 0)
+    page = list(reversed(keys[start:end]))
+    next_page_id = page[-1].encode() if start > 0 and page else None
+    return page, next_page_id
@@ -1,80 +1,187 @@
-from dataclasses import dataclass, field
+import asyncio
+import inspect
+import logging
 import uuid
-from typing import Dict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from openhands.sdk.event import Event
+    from openhands.sdk.utils.async_utils import AsyncConversationCallback
+
+logger = logging.getLogger(__name__)
 
-from openhands.sdk.utils.async_utils import AsyncConversationCallback
-from openhands.sdk.event import Event
-from openhands.sdk.logger import get_logger
 
+class OverflowPolicy(Enum):
+    # Wait for space in the queue. This slows the publisher down to the rate of the subscriber
+    BLOCK = "BLOCK"
+    # Discard the oldest queued event to make space for the new one
+    DROP_OLDEST = "DROP_OLDEST"
+    # Unsubscribe the subscriber
+    DISCONNECT = "DISCONNECT"
 
-logger = get_logger(__name__)
+
+class SubscriberStats(BaseModel):
+    callback_id: UUID
+    overflow_policy: OverflowPolicy
+    # Number of events queued but not yet delivered
+    lag: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    errors: int = 0
+
+
+@dataclass
+class _Subscriber:
+    callback: "AsyncConversationCallback"
+    queue: asyncio.Queue
+    stats: SubscriberStats
+    on_disconnect: Callable[[], None] | None = None
+    task: asyncio.Task | None = None
 
 
 @dataclass
 class PubSub:
     """A subscription service that extends ConversationCallbackType functionality.
-    This class maintains a dictionary of UUIDs to ConversationCallbackType instances
-    and provides methods to subscribe/unsubscribe callbacks. When invoked, it calls
-    all registered callbacks with proper error handling.
+    Each subscriber has its own bounded queue and a task which delivers events from it, so
+    a slow subscriber does not delay delivery to the others. What happens when a queue is
+    full is determined by the overflow policy of the subscriber.
     """
-    _callbacks: dict[uuid.UUID, AsyncConversationCallback] = field(default_factory=dict)
 
-    def subscribe(self, callback: AsyncConversationCallback) -> UUID:
+    max_queue_size: int = 1024
+    overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+    _subscribers: dict[uuid.UUID, _Subscriber] = field(default_factory=dict)
+
+    def subscribe(
+        self,
+        callback: "AsyncConversationCallback",
+        max_queue_size: int | None = None,
+        overflow_policy: OverflowPolicy | None = None,
+        on_disconnect: Callable[[], None] | None = None,
+    ) -> UUID:
         """Subscribe a callback and return its UUID for later unsubscription.
         Args:
-            callback: The callback function to register
+            callback: The callback function to register. May be sync or async
+            max_queue_size: Max events queued for the callback (Defaults to max_queue_size)
+            overflow_policy: Policy when the queue is full (Defaults to overflow_policy)
+            on_disconnect: Invoked if the subscriber is disconnected due to overflow
         Returns:
             str: UUID that can be used to unsubscribe this callback
         """
         callback_id = uuid.uuid4()
-        self._callbacks[callback_id] = callback
+        overflow_policy = overflow_policy or self.overflow_policy
+        subscriber = _Subscriber(
+            callback=callback,
+            queue=asyncio.Queue(max_queue_size or self.max_queue_size),
+            stats=SubscriberStats(
+                callback_id=callback_id, overflow_policy=overflow_policy
+            ),
+            on_disconnect=on_disconnect,
+        )
+        self._subscribers[callback_id] = subscriber
+        try:
+            asyncio.get_running_loop()
+            self._start(callback_id, subscriber)
+        except RuntimeError:
+            # Started on the first event instead
+            pass
         logger.debug(f"Subscribed callback with ID: {callback_id}")
         return callback_id
 
     def unsubscribe(self, callback_id: UUID) -> bool:
-        """Unsubscribe a callback by its UUID.
+        """Unsubscribe a callback by its UUID. Any events still queued for it are discarded.
         Args:
             callback_id: The UUID returned by subscribe()
         Returns:
             bool: True if callback was found and removed, False otherwise
         """
-        if callback_id in self._callbacks:
-            del self._callbacks[callback_id]
-            logger.debug(f"Unsubscribed callback with ID: {callback_id}")
-            return True
-        else:
+        subscriber = self._subscribers.pop(callback_id, None)
+        if subscriber is None:
             logger.warning(
                 f"Attempted to unsubscribe unknown callback ID: {callback_id}"
             )
             return False
+        if subscriber.task:
+            subscriber.task.cancel()
+        logger.debug(f"Unsubscribed callback with ID: {callback_id}")
+        return True
 
-    async def __call__(self, event: Event) -> None:
-        """Invoke all registered callbacks with the given event.
-        Each callback is invoked in its own try/catch block to prevent
-        one failing callback from affecting others.
-        Args:
-            event: The event to pass to all callbacks
-        """
-        for callback_id, callback in self._callbacks.items():
+    def _start(self, callback_id: UUID, subscriber: _Subscriber):
+        if subscriber.task is None:
+            subscriber.task = asyncio.create_task(
+                self._deliver(callback_id, subscriber)
+            )
+
+    async def _deliver(self, callback_id: UUID, subscriber: _Subscriber):
+        while True:
+            event = await subscriber.queue.get()
             try:
-                callback(event)
+                result = subscriber.callback(event)
+                if inspect.isawaitable(result):
+                    await result
+                subscriber.stats.delivered += 1
             except Exception as e:
+                subscriber.stats.errors += 1
                 logger.error(f"Error in callback {callback_id}: {e}", exc_info=True)
 
-    def on_event(self, event: Event) -> None:
-        """Alias for __call__ method.
+    async def __call__(self, event: "Event") -> None:
+        """Queue the given event for all registered callbacks. This only waits if a
+        subscriber with the BLOCK policy has a full queue.
         Args:
             event: The event to pass to all callbacks
         """
-        self(event)
+        for callback_id, subscriber in list(self._subscribers.items()):
+            self._start(callback_id, subscriber)
+            queue = subscriber.queue
+            if not queue.full():
+                queue.put_nowait(event)
+            elif subscriber.stats.overflow_policy == OverflowPolicy.BLOCK:
+                await queue.put(event)
+            elif subscriber.stats.overflow_policy == OverflowPolicy.DROP_OLDEST:
+                queue.get_nowait()
+                queue.put_nowait(event)
+                subscriber.stats.dropped += 1
+            else:
+                logger.warning(f"Disconnecting slow subscriber: {callback_id}")
+                subscriber.stats.dropped += 1
+                self.unsubscribe(callback_id)
+                if subscriber.on_disconnect:
+                    try:
+                        subscriber.on_disconnect()
+                    except Exception as e:
+                        logger.error(
+                            f"Error in disconnect callback {callback_id}: {e}",
+                            exc_info=True,
+                        )
+
+    def on_event(self, event: "Event") -> None:
+        """Alias for __call__ method, for use from synchronous code on the event loop.
+        Args:
+            event: The event to pass to all callbacks
+        """
+        asyncio.get_running_loop().create_task(self(event))
+
+    def get_stats(self) -> list[SubscriberStats]:
+        """Get delivery stats for each subscriber"""
+        stats = []
+        for subscriber in self._subscribers.values():
+            subscriber.stats.lag = subscriber.queue.qsize()
+            stats.append(subscriber.stats.model_copy())
+        return stats
 
     @property
     def callback_count(self) -> int:
         """Return the number of registered callbacks."""
-        return len(self._callbacks)
+        return len(self._subscribers)
 
     def clear(self) -> None:
         """Remove all registered callbacks."""
-        count = len(self._callbacks)
-        self._callbacks.clear()
-        logger.debug(f"Cleared {count} callbacks")
\ No newline at end of file
+        count = len(self._subscribers)
+        for callback_id in list(self._subscribers):
+            self.unsubscribe(callback_id)
+        logger.debug(f"Cleared {count} callbacks")
@@ -0,0 +1,250 @@
+import io
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Each record is a big endian uint32 length followed by the payload
+_LENGTH = struct.Struct(">I")
+
+
+@dataclass
+class _Segment:
+    base_offset: int
+    log_path: Path
+    index_path: Path
+    # Position in the log file of every index_interval-th record
+    positions: array = field(default_factory=lambda: array("Q"))
+    count: int = 0
+    size: int = 0
+    # Map of a sealed segment (Sealed segments no longer change, so the map is kept)
+    data: mmap.mmap | None = None
+
+
+@dataclass
+class SegmentedLog:
+    """
+    Append only log of binary records, addressed by offset. Records are written to segment
+    files which are rolled over once they reach max_segment_bytes. Each segment has a sparse
+    index holding the position of every index_interval-th record, so finding a record takes a
+    bisect over the segments, a direct index lookup and a scan of fewer than index_interval
+    records. Reads use mmap.
+
+    Appends must not be made concurrently with each other, but reads are safe from any thread.
+    After a crash, a partially written record at the end of the log is discarded on open.
+    A read only log never creates or modifies files - a partial record is skipped rather than
+    truncated.
+    """
+
+    path: Path
+    max_segment_bytes: int = 64 * 1024 * 1024
+    index_interval: int = 64
+    # fsync after every append (Otherwise records are only flushed to the OS)
+    fsync: bool = False
+    read_only: bool = False
+    _segments: list[_Segment] = field(default_factory=list, init=False)
+    _base_offsets: list[int] = field(default_factory=list, init=False)
+    _next_offset: int = field(default=0, init=False)
+    _log_file: object = field(default=None, init=False)
+    _index_file: object = field(default=None, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self):
+        if not self.read_only:
+            self.path.mkdir(parents=True, exist_ok=True)
+        base_offsets = sorted(
+            int(log_path.stem)
+            for log_path in self.path.glob("*.log")
+            if log_path.stem.isdigit()
+        )
+        for index, base_offset in enumerate(base_offsets):
+            segment = self._new_segment(base_offset)
+            segment.positions.frombytes(_read_bytes(segment.index_path))
+            segment.size = segment.log_path.stat().st_size
+            if index + 1 < len(base_offsets):
+                segment.count = base_offsets[index + 1] - base_offset
+            else:
+                self._recover(segment)
+            self._segments.append(segment)
+            self._base_offsets.append(base_offset)
+        if self._segments:
+            last = self._segments[-1]
+            self._next_offset = last.base_offset + last.count
+            if not self.read_only:
+                self._open_files(last)
+        elif not self.read_only:
+            self._roll()
+
+    def _new_segment(self, base_offset: int) -> _Segment:
+        return _Segment(
+            base_offset=base_offset,
+            log_path=self.path / f"{base_offset:020d}.log",
+            index_path=self.path / f"{base_offset:020d}.index",
+        )
+
+    def _recover(self, segment: _Segment):
+        """Count the records in the last segment, rebuilding any index entries which were lost
+        and truncating a partial record at the end"""
+        if segment.positions:
+            rel = (len(segment.positions) - 1) * self.index_interval
+            position = segment.positions[-1]
+        else:
+            rel = position = 0
+        with segment.log_path.open("rb") as file:
+            data = file.read()
+        while position + _LENGTH.size <= len(data):
+            (length,) = _LENGTH.unpack_from(data, position)
+            if position + _LENGTH.size + length > len(data):
+                break
+            if rel % self.index_interval == 0 and rel // self.index_interval == len(
+                segment.positions
+            ):
+                segment.positions.append(position)
+            position += _LENGTH.size + length
+            rel += 1
+        segment.count = rel
+        segment.size = position
+        if self.read_only:
+            return
+        if position < len(data):
+            with segment.log_path.open("r+b") as file:
+                file.truncate(position)
+        with segment.index_path.open("wb") as file:
+            segment.positions.tofile(file)
+
+    def _open_files(self, segment: _Segment):
+        self._log_file = segment.log_path.open("ab")
+        self._index_file = segment.index_path.open("ab")
+
+    def _close_files(self):
+        if self._log_file is not None:
+            self._log_file.close()
+            self._index_file.close()
+            self._log_file = self._index_file = None
+
+    def _roll(self):
+        """Start a new segment at the next offset"""
+        self._close_files()
+        segment = self._new_segment(self._next_offset)
+        segment.log_path.touch()
+        segment.index_path.touch()
+        self._open_files(segment)
+        with self._lock:
+            self._segments.append(segment)
+            self._base_offsets.append(segment.base_offset)
+
+    @property
+    def next_offset(self) -> int:
+        """The offset which will be assigned to the next record"""
+        return self._next_offset
+
+    def append(self, payload: bytes) -> int:
+        """Append a record, returning its offset"""
+        if self.read_only:
+            raise io.UnsupportedOperation(f"{self.path} is read only")
+        segment = self._segments[-1]
+        if (
+            segment.count
+            and segment.size + _LENGTH.size + len(payload) > self.max_segment_bytes
+        ):
+            self._roll()
+            segment = self._segments[-1]
+        position = segment.size
+        self._log_file.write(_LENGTH.pack(len(payload)))
+        self._log_file.write(payload)
+        self._log_file.flush()
+        new_index_entry = segment.count % self.index_interval == 0
+        if new_index_entry:
+            self._index_file.write(array("Q", [position]).tobytes())
+            self._index_file.flush()
+        if self.fsync:
+            os.fsync(self._log_file.fileno())
+            os.fsync(self._index_file.fileno())
+        with self._lock:
+            if new_index_entry:
+                segment.positions.append(position)
+            segment.size = position + _LENGTH.size + len(payload)
+            segment.count += 1
+            self._next_offset += 1
+            offset = self._next_offset - 1
+        return offset
+
+    def read(self, offset: int, limit: int) -> list[bytes]:
+        """Read up to limit records starting at the offset given"""
+        with self._lock:
+            end = min(self._next_offset, offset + limit)
+            segments = list(self._segments)
+            base_offsets = list(self._base_offsets)
+            # Bounds of the active segment as of now, as it may grow while reading
+            active_count = segments[-1].count if segments else 0
+            active_size = segments[-1].size if segments else 0
+        records = []
+        while offset < end:
+            segment_index = bisect_right(base_offsets, offset) - 1
+            if segment_index < 0:
+                break
+            segment = segments[segment_index]
+            active = segment_index == len(segments) - 1
+            count = active_count if active else segment.count
+            size = active_size if active else segment.size
+            if not count:
+                break
+            data = self._map(segment, size, active)
+            try:
+                rel = offset - segment.base_offset
+                position = segment.positions[rel // self.index_interval]
+                for _ in range(rel % self.index_interval):
+                    (length,) = _LENGTH.unpack_from(data, position)
+                    position += _LENGTH.size + length
+                while offset < end and rel < count:
+                    (length,) = _LENGTH.unpack_from(data, position)
+                    start = position + _LENGTH.size
+                    records.append(bytes(data[start : start + length]))
+                    position = start + length
+                    offset += 1
+                    rel += 1
+            finally:
+                if active:
+                    data.close()
+        return records
+
+    def tail(self, limit: int) -> list[bytes]:
+        """Read the last limit records"""
+        next_offset = self._next_offset
+        return self.read(max(0, next_offset - limit), limit)
+
+    def _map(self, segment: _Segment, size: int, active: bool) -> mmap.mmap:
+        if not active and segment.data is not None:
+            return segment.data
+        with segment.log_path.open("rb") as file:
+            data = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+        if active:
+            return data
+        with self._lock:
+            # Another reader may have mapped the segment meanwhile, in which case theirs is kept
+            if segment.data is None:
+                segment.data = data
+                return data
+            cached = segment.data
+        data.close()
+        return cached
+
+    def close(self):
+        self._close_files()
+        with self._lock:
+            for segment in self._segments:
+                if segment.data is not None:
+                    segment.data.close()
+                    segment.data = None
+
+
+def _read_bytes(path: Path) -> bytes:
+    if not path.exists():
+        return b""
+    data = path.read_bytes()
+    # Drop a partially written entry
+    return data[: len(data) - len(data) % 8]
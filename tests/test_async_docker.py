@@ -0,0 +1,53 @@
+"""Tests for the non blocking docker access layer."""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+docker = pytest.importorskip("docker")
+
+from openhands_server.utils.async_docker import AsyncDocker  # noqa: E402
+
+
+def test_client_is_created_off_the_event_loop(monkeypatch) -> None:
+    """Test that the client, whose creation queries the daemon, is created once in the pool."""
+    threads = []
+
+    def from_env():
+        threads.append(threading.current_thread())
+        return SimpleNamespace(containers=SimpleNamespace(list=lambda **kwargs: []))
+
+    monkeypatch.setattr(docker, "from_env", from_env)
+
+    async def check():
+        async_docker = AsyncDocker()
+        await asyncio.gather(*(async_docker.list_containers() for _ in range(4)))
+        assert len(threads) == 1
+        assert threads[0] is not threading.current_thread()
+        async_docker.close()
+
+    asyncio.run(check())
+
+
+def test_long_calls_do_not_take_slots_from_short_calls() -> None:
+    """Test that short calls still run while every slot for long calls is taken."""
+
+    async def check():
+        release = threading.Event()
+        async_docker = AsyncDocker(
+            client=SimpleNamespace(), max_concurrency=1, max_long_concurrency=1
+        )
+        long_calls = [
+            asyncio.create_task(async_docker.run_long(release.wait, 5))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        assert await asyncio.wait_for(async_docker.run(lambda: "short"), 1) == "short"
+        assert not any(task.done() for task in long_calls)
+        release.set()
+        assert await asyncio.gather(*long_calls) == [True, True]
+        async_docker.close()
+
+    asyncio.run(check())
@@ -0,0 +1,33 @@
+"""Tests for the laned conversation executor."""
+
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from openhands_server.local_conversation.conversation_executor import ExecutorLane  # noqa: E402
+
+
+def test_cancelled_calls_leave_the_queue() -> None:
+    """Test that a call cancelled while waiting for a worker is no longer counted as queued."""
+
+    async def check():
+        lane = ExecutorLane("test", 1)
+        release = threading.Event()
+        busy = asyncio.create_task(lane.run(release.wait))
+        waiting = asyncio.create_task(lane.run(lambda: None))
+        await asyncio.sleep(0.05)
+        assert lane.get_stats().queued == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert lane.get_stats().queued == 0
+        release.set()
+        await busy
+        stats = lane.get_stats()
+        assert (stats.active, stats.queued) == (0, 0)
+        lane.shutdown()
+
+    asyncio.run(check())
@@ -0,0 +1,170 @@
+"""Tests for the SQLite index of conversation metadata."""
+
+import asyncio
+import os
+import shutil
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+import pytest
+
+pytest.importorskip("openhands.sdk")
+pytest.importorskip("sqlalchemy")
+
+from openhands.sdk import LLM  # noqa: E402
+
+from openhands_server.local_conversation.agent_info import AgentInfo  # noqa: E402
+from openhands_server.local_conversation.conversation_index import (  # noqa: E402
+    ConversationIndex,
+)
+from openhands_server.local_conversation.model import (  # noqa: E402
+    ConversationSortOrder,
+    StoredLocalConversation,
+)
+
+_START = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def _conversation(
+    n: int, title: str | None = None, created_minutes: int | None = None
+) -> StoredLocalConversation:
+    created_at = _START + timedelta(
+        minutes=n if created_minutes is None else created_minutes
+    )
+    return StoredLocalConversation(
+        id=UUID(int=n + 1),
+        title=title,
+        agent=AgentInfo(llm=LLM(model="gpt-4o"), tools=[]),
+        created_at=created_at,
+        # Updated in the reverse order to created
+        updated_at=_START + timedelta(hours=1, minutes=-n),
+    )
+
+
+def _write_meta(file_store_path, conversation: StoredLocalConversation):
+    conversation_path = file_store_path / conversation.id.hex
+    conversation_path.mkdir(parents=True, exist_ok=True)
+    (conversation_path / "meta.json").write_text(conversation.model_dump_json())
+
+
+async def _search_all(index: ConversationIndex, limit: int, **kwargs) -> list[int]:
+    """Follow next_page_id to the end, returning the n of each conversation"""
+    ids = []
+    page_id = None
+    while True:
+        conversations, page_id = await index.search(
+            page_id=page_id, limit=limit, **kwargs
+        )
+        ids.extend(conversation.id.int - 1 for conversation in conversations)
+        if page_id is None:
+            return ids
+
+
+def test_reconcile_only_reads_modified_meta_files(tmp_path) -> None:
+    """Test that reconcile adds, updates and removes rows to match the meta files, and skips
+    meta files which have not been modified since they were indexed."""
+
+    async def check():
+        file_store_path = tmp_path / "conversations"
+        index = ConversationIndex(tmp_path / "index.db")
+        conversations = [_conversation(n, f"Title {n}") for n in range(3)]
+        for conversation in conversations:
+            _write_meta(file_store_path, conversation)
+        assert await index.reconcile(file_store_path) == 3
+        assert await index.reconcile(file_store_path) == 0
+
+        # Changed while the index was stale
+        renamed = conversations[0].model_copy(update={"title": "Renamed"})
+        _write_meta(file_store_path, renamed)
+        meta_file = file_store_path / renamed.id.hex / "meta.json"
+        written_at = meta_file.stat().st_mtime
+        os.utime(meta_file, (written_at + 60, written_at + 60))
+        shutil.rmtree(file_store_path / conversations[1].id.hex)
+        assert await index.reconcile(file_store_path) == 2
+        assert (await index.get(renamed.id)).title == "Renamed"
+        assert await index.get(conversations[1].id) is None
+        assert await index.count() == 2
+
+        # An unmodified meta file is not read again, even if its row differs
+        os.utime(meta_file, (written_at, written_at))
+        await index.upsert(conversations[2].model_copy(update={"title": "Indexed"}))
+        assert await index.reconcile(file_store_path) == 0
+        assert (await index.get(conversations[2].id)).title == "Indexed"
+        index.close()
+
+    asyncio.run(check())
+
+
+def test_rebuild_replaces_the_index(tmp_path) -> None:
+    """Test that rebuild drops rows without a meta file and indexes every meta file."""
+
+    async def check():
+        file_store_path = tmp_path / "conversations"
+        index = ConversationIndex(tmp_path / "index.db")
+        await index.upsert(_conversation(9))
+        for n in range(2):
+            _write_meta(file_store_path, _conversation(n))
+        (file_store_path / "broken").mkdir()
+        (file_store_path / "broken" / "meta.json").write_text("{")
+        assert await index.rebuild(file_store_path) == 2
+        assert await index.get(_conversation(9).id) is None
+        assert await index.count() == 2
+        index.close()
+
+    asyncio.run(check())
+
+
+def test_pages_follow_each_sort_order(tmp_path) -> None:
+    """Test that following next_page_id visits every conversation once in each sort order,
+    including conversations which share a sort key."""
+
+    async def check():
+        index = ConversationIndex(tmp_path / "index.db")
+        # 3 and 4 are created at the same time as 2, so ties are broken by id
+        for n in range(7):
+            await index.upsert(
+                _conversation(n, created_minutes=2 if n in (3, 4) else n)
+            )
+        assert await _search_all(
+            index, 2, sort_order=ConversationSortOrder.CREATED_AT
+        ) == [0, 1, 2, 3, 4, 5, 6]
+        assert await _search_all(
+            index, 2, sort_order=ConversationSortOrder.CREATED_AT_DESC
+        ) == [6, 5, 4, 3, 2, 1, 0]
+        assert await _search_all(
+            index, 3, sort_order=ConversationSortOrder.UPDATED_AT
+        ) == [6, 5, 4, 3, 2, 1, 0]
+        assert await _search_all(
+            index, 3, sort_order=ConversationSortOrder.UPDATED_AT_DESC
+        ) == [0, 1, 2, 3, 4, 5, 6]
+        assert await _search_all(
+            index,
+            10,
+            sort_order=ConversationSortOrder.CREATED_AT,
+            created_at__gte=_START + timedelta(minutes=2),
+            created_at__lt=_START + timedelta(minutes=6),
+        ) == [2, 3, 4, 5]
+        index.close()
+
+    asyncio.run(check())
+
+
+def test_title_search_escapes_wildcards(tmp_path) -> None:
+    """Test that % and _ in a title search match literally."""
+
+    async def check():
+        index = ConversationIndex(tmp_path / "index.db")
+        titles = ["100% done", "100 done", "a_b", "axb", None]
+        for n, title in enumerate(titles):
+            await index.upsert(_conversation(n, title))
+
+        async def search(title__contains):
+            conversations, _ = await index.search(title__contains=title__contains)
+            return sorted(conversation.title for conversation in conversations)
+
+        assert await search("%") == ["100% done"]
+        assert await search("_") == ["a_b"]
+        assert await search("done") == ["100 done", "100% done"]
+        index.close()
+
+    asyncio.run(check())
@@ -0,0 +1,115 @@
+"""Tests for conversation admission control."""
+
+import asyncio
+from uuid import uuid4
+
+from openhands_server.local_conversation.conversation_scheduler import (
+    ConversationScheduler,
+)
+
+
+def test_admission_order() -> None:
+    """Test that starts beyond the limit are queued, and admitted by priority and then by
+    the number of conversations each user already has running."""
+
+    async def check():
+        scheduler = ConversationScheduler(max_running=2)
+        started = []
+
+        def submit(user_id, priority=0):
+            conversation_id = uuid4()
+
+            async def start():
+                started.append(conversation_id)
+
+            return conversation_id, scheduler.submit(
+                conversation_id, start, user_id, priority
+            )
+
+        first, position = submit("alice")
+        assert position is None
+        blocker, _ = submit("dave")
+        alice_2, alice_2_position = submit("alice")
+        alice_3, _ = submit("alice")
+        bob, _ = submit("bob")
+        urgent, _ = submit("carol", priority=5)
+        assert alice_2_position == 0
+        assert scheduler.is_queued(alice_2)
+        # Carol is first on priority. Bob is ahead of alice's second start, as alice has one running
+        assert [
+            scheduler.get_queue_position(id) for id in (urgent, bob, alice_2, alice_3)
+        ] == [0, 1, 2, 3]
+
+        # Alice's first conversation keeps running while the other slot is handed on
+        await asyncio.sleep(0)
+        scheduler.finished(blocker)
+        for _ in range(3):
+            await asyncio.sleep(0)
+            scheduler.finished(started[-1])
+        await asyncio.sleep(0)
+        assert started == [first, blocker, urgent, bob, alice_2, alice_3]
+        assert scheduler.queued_count == 0
+        assert scheduler.running_count == 2
+
+    asyncio.run(check())
+
+
+def test_cancel_and_failed_start() -> None:
+    """Test that cancelled starts leave the queue, and failed starts release their slot."""
+
+    async def check():
+        scheduler = ConversationScheduler(max_running=1)
+        started = []
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def start():
+            started.append(True)
+
+        failing, waiting, cancelled = uuid4(), uuid4(), uuid4()
+        scheduler.submit(failing, fail)
+        scheduler.submit(cancelled, start)
+        scheduler.submit(waiting, start)
+        assert scheduler.cancel(cancelled)
+        assert scheduler.get_queue_position(waiting) == 0
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert started == [True]
+        assert scheduler.running_count == 1
+        assert not scheduler.is_queued(cancelled)
+
+    asyncio.run(check())
+
+
+def test_resume_before_paused_run_ends() -> None:
+    """Test that a conversation resumed while its paused run is still ending is started again
+    once that run finishes, rather than being dropped."""
+
+    async def check():
+        scheduler = ConversationScheduler(max_running=1)
+        started = []
+        conversation_id = uuid4()
+
+        async def start():
+            started.append(conversation_id)
+
+        assert scheduler.submit(conversation_id, start) is None
+        await asyncio.sleep(0)
+        # Paused, then resumed before the run has reported that it finished
+        assert scheduler.submit(conversation_id, start) is None
+        await asyncio.sleep(0)
+        assert started == [conversation_id]
+        scheduler.finished(conversation_id)
+        await asyncio.sleep(0)
+        assert started == [conversation_id, conversation_id]
+        assert scheduler.running_count == 1
+
+        # A cancelled conversation is not started again when its run finishes
+        scheduler.submit(conversation_id, start)
+        scheduler.cancel(conversation_id)
+        await asyncio.sleep(0)
+        assert len(started) == 2
+        assert scheduler.running_count == 0
+
+    asyncio.run(check())
@@ -0,0 +1,45 @@
+"""Tests for conversation worker processes."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("openhands.sdk")
+
+from openhands_server.local_conversation.conversation_worker import (  # noqa: E402
+    ConversationWorker,
+    ConversationWorkerError,
+)
+
+
+def test_dead_worker_fails_calls_and_is_restarted() -> None:
+    """Test that calls to a worker whose process died fail rather than hang, that its
+    conversations are reported as finished, and that a new process is spawned."""
+
+    async def check():
+        finished = []
+
+        async def on_event(*args):
+            pass
+
+        worker = ConversationWorker(
+            on_event=on_event, on_run_finished=finished.append, restart_delay=0
+        )
+        conversation_id = uuid4()
+        worker.conversation_ids.add(conversation_id)
+        await worker.start()
+        process = worker._process
+        process.kill()
+        with pytest.raises(ConversationWorkerError):
+            await asyncio.wait_for(worker.call("get_status", conversation_id), 10)
+        for _ in range(100):
+            if worker._process is not process and worker._process is not None:
+                break
+            await asyncio.sleep(0.1)
+        assert worker._process is not process
+        assert conversation_id in finished
+        assert conversation_id in worker.conversation_ids
+        await worker.stop()
+
+    asyncio.run(check())
@@ -0,0 +1,71 @@
+"""Tests for the default local conversation service, for conversations not loaded since a restart."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("openhands.sdk")
+
+from openhands.sdk import LLM  # noqa: E402
+
+from openhands_server.local_conversation.agent_info import AgentInfo  # noqa: E402
+from openhands_server.local_conversation.default_local_conversation_manager import (  # noqa: E402
+    DefaultLocalConversationService,
+)
+from openhands_server.local_conversation.model import StoredLocalConversation  # noqa: E402
+
+
+def _service(tmp_path) -> DefaultLocalConversationService:
+    # No free slots, so that resumed conversations are queued rather than run
+    return DefaultLocalConversationService(
+        file_store_path=tmp_path / "conversations",
+        workspace_path=tmp_path / "workspace",
+        max_running_conversations=0,
+    )
+
+
+def _write_meta(tmp_path, stored: StoredLocalConversation):
+    conversation_path = tmp_path / "conversations" / stored.id.hex
+    conversation_path.mkdir(parents=True)
+    (conversation_path / "meta.json").write_text(stored.model_dump_json())
+    (tmp_path / "workspace" / stored.id.hex).mkdir(parents=True)
+
+
+def test_delete_conversation_which_is_not_running(tmp_path) -> None:
+    """Test that a stored conversation which is not running can be deleted, and that deleting
+    an unknown conversation reports it as not found."""
+
+    async def check():
+        service = _service(tmp_path)
+        stored = StoredLocalConversation(
+            id=uuid4(), title="Old", agent=AgentInfo(llm=LLM(model="gpt-4o"), tools=[])
+        )
+        _write_meta(tmp_path, stored)
+        await service._index.upsert(stored)
+        assert await service.delete_local_conversation(stored.id) is True
+        assert not (tmp_path / "conversations" / stored.id.hex).exists()
+        assert not (tmp_path / "workspace" / stored.id.hex).exists()
+        assert await service._index.get(stored.id) is None
+        assert await service.delete_local_conversation(stored.id) is False
+        service._index.close()
+
+    asyncio.run(check())
+
+
+def test_resume_conversation_after_restart(tmp_path) -> None:
+    """Test that a conversation which is only on disk is loaded when resumed."""
+
+    async def check():
+        service = _service(tmp_path)
+        stored = StoredLocalConversation(
+            id=uuid4(), title="Old", agent=AgentInfo(llm=LLM(model="gpt-4o"), tools=[])
+        )
+        _write_meta(tmp_path, stored)
+        assert await service.resume_local_conversation(stored.id) is True
+        assert service._running_conversations[stored.id].stored == stored
+        assert service._scheduler.is_queued(stored.id)
+        assert await service.resume_local_conversation(uuid4()) is False
+        service._index.close()
+
+    asyncio.run(check())
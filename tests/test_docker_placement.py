@@ -0,0 +1,37 @@
+"""Tests for placement of sandboxes across docker hosts."""
+
+from openhands_server.sandbox.docker_placement import HostLoad, choose_host
+
+GIB = 1024**3
+
+
+def test_best_fit_prefers_fullest_host_with_room() -> None:
+    """Test that sandboxes are packed onto the host with the least room left."""
+    loads = [
+        HostLoad("empty", cpus=16, memory=64 * GIB),
+        HostLoad(
+            "busy", cpus=16, memory=64 * GIB, cpus_reserved=12, memory_reserved=48 * GIB
+        ),
+    ]
+    assert choose_host(loads, cpus=2, memory=8 * GIB) == "busy"
+
+
+def test_skips_hosts_without_room() -> None:
+    """Test that hosts short of cpu, memory or sandbox slots are not chosen."""
+    loads = [
+        HostLoad("no-cpu", cpus=4, memory=64 * GIB, cpus_reserved=3),
+        HostLoad("no-memory", cpus=16, memory=8 * GIB, memory_reserved=7 * GIB),
+        HostLoad("full", cpus=16, memory=64 * GIB, sandbox_count=10, max_sandboxes=10),
+        HostLoad("ok", cpus=16, memory=64 * GIB),
+    ]
+    assert choose_host(loads, cpus=2, memory=4 * GIB) == "ok"
+    assert choose_host(loads[:3], cpus=2, memory=4 * GIB) is None
+
+
+def test_ties_go_to_fewest_sandboxes() -> None:
+    """Test that equally loaded hosts are chosen by sandbox count."""
+    loads = [
+        HostLoad("a", cpus=8, memory=32 * GIB, sandbox_count=3),
+        HostLoad("b", cpus=8, memory=32 * GIB, sandbox_count=1),
+    ]
+    assert choose_host(loads, cpus=1, memory=GIB) == "b"
@@ -0,0 +1,79 @@
+"""Tests for the in memory sandbox cache."""
+
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("docker")
+pytest.importorskip("pydantic")
+
+from openhands_server.sandbox.docker_sandbox_cache import DockerSandboxCache  # noqa: E402
+from openhands_server.sandbox.sandbox_models import SandboxInfo, SandboxStatus  # noqa: E402
+
+
+class _AsyncDocker:
+    """Daemon whose listings are held until released, so that refreshes can overtake them"""
+
+    def __init__(self, containers: list):
+        self.containers = containers
+        self.listing = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def list_containers(self, **kwargs) -> list:
+        listed = [SimpleNamespace(**vars(container)) for container in self.containers]
+        self.listing.set()
+        await self.release.wait()
+        return listed
+
+    async def get_container(self, container_id: str):
+        for container in self.containers:
+            if container_id in (container.id, container.name):
+                return container
+        raise AssertionError(container_id)
+
+
+def test_resync_does_not_overwrite_newer_refresh() -> None:
+    """Test that a resync which listed before a refresh keeps the refreshed info, and does not
+    bring back a sandbox discarded while it was listing."""
+
+    async def check():
+        sandbox_id, deleted_id = uuid4(), uuid4()
+        containers = [
+            SimpleNamespace(
+                id="c1", name="sandbox", sandbox_id=sandbox_id, status="running"
+            ),
+            SimpleNamespace(
+                id="c2", name="deleted", sandbox_id=deleted_id, status="running"
+            ),
+        ]
+        async_docker = _AsyncDocker(containers)
+
+        def to_sandbox_info(container):
+            return SandboxInfo(
+                id=container.sandbox_id,
+                user_id="alice",
+                sandbox_spec_id="spec",
+                status=SandboxStatus.RUNNING
+                if container.status == "running"
+                else SandboxStatus.PAUSED,
+                url=None,
+                session_api_key=None,
+            )
+
+        cache = DockerSandboxCache(
+            async_docker=async_docker, to_sandbox_info=to_sandbox_info
+        )
+        resync = asyncio.create_task(cache.resync())
+        await async_docker.listing.wait()
+        containers[0].status = "paused"
+        await cache.refresh("c1")
+        cache.discard(deleted_id)
+        async_docker.release.set()
+        await resync
+
+        assert (await cache.get(sandbox_id)).status == SandboxStatus.PAUSED
+        assert await cache.get(deleted_id) is None
+
+    asyncio.run(check())
@@ -0,0 +1,509 @@
+"""Tests for the docker sandbox service, against an in memory docker daemon."""
+
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("docker")
+pytest.importorskip("pydantic")
+
+from docker.errors import APIError, ContainerError, ImageNotFound, NotFound  # noqa: E402
+
+from openhands_server.sandbox.docker_host import DockerHost  # noqa: E402
+from openhands_server.sandbox.docker_sandbox_cache import MANAGED_LABEL  # noqa: E402
+from openhands_server.sandbox.docker_sandbox_service import (  # noqa: E402
+    CLAIM_LABEL,
+    SNAPSHOT_LABEL,
+    SNAPSHOT_OF_LABEL,
+    DockerSandboxService,
+    WorkspaceTemplate,
+)
+from openhands_server.sandbox.sandbox_errors import SandboxError  # noqa: E402
+from openhands_server.sandbox_spec.sandbox_spec_models import (  # noqa: E402
+    SandboxResourceProfile,
+    SandboxSpecInfo,
+)
+from openhands_server.utils.async_docker import AsyncDocker  # noqa: E402
+from openhands_server.utils.date_utils import utc_now  # noqa: E402
+
+
+def _matches(labels: dict, filters: dict | None) -> bool:
+    label_filters = (filters or {}).get("label") or []
+    if isinstance(label_filters, str):
+        label_filters = [label_filters]
+    for label_filter in label_filters:
+        key, _, value = label_filter.partition("=")
+        if key not in labels or (value and labels[key] != value):
+            return False
+    return True
+
+
+class _Container:
+    def __init__(self, name: str, labels: dict, status: str = "running"):
+        self.id = uuid4().hex
+        self.name = name
+        self.labels = labels
+        self.status = status
+        self.attrs = {"Created": "2025-01-01T00:00:00Z", "State": {"ExitCode": 0}}
+        self.start_error: APIError | None = None
+        self._containers: _Containers | None = None
+
+    def rename(self, name: str):
+        self.name = name
+
+    def start(self):
+        if self.start_error:
+            raise self.start_error
+        self.status = "running"
+
+    def remove(self, force: bool = False):
+        self._containers.by_id.pop(self.id, None)
+
+
+class _Volume:
+    def __init__(self, volumes: dict, name: str, labels: dict):
+        self._volumes = volumes
+        self.name = name
+        self.attrs = {"Name": name, "Labels": labels}
+
+    def remove(self, force: bool = False):
+        self._volumes.pop(self.name, None)
+
+
+class _Containers:
+    def __init__(self, images: "_Images"):
+        self._images = images
+        self.by_id: dict[str, _Container] = {}
+        # Exit status of containers run to completion, and error raised by starting containers
+        self.run_exit_status = 0
+        self.start_error: APIError | None = None
+
+    def create(self, image: str, name: str, labels: dict, **kwargs) -> _Container:
+        if image not in self._images.pulled:
+            raise ImageNotFound(image)
+        container = _Container(name, labels, status="created")
+        container.create_kwargs = {"image": image, **kwargs}
+        container.start_error = self.start_error
+        self.add(container)
+        return container
+
+    def run(self, image: str, command=None, **kwargs):
+        if self.run_exit_status:
+            raise ContainerError(None, self.run_exit_status, command, image, b"")
+
+    def add(self, container: _Container):
+        container._containers = self
+        self.by_id[container.id] = container
+
+    def get(self, container_id: str) -> _Container:
+        for container in self.by_id.values():
+            if container_id in (container.id, container.name):
+                return container
+        raise NotFound(container_id)
+
+    def list(self, all: bool = False, filters: dict | None = None) -> list[_Container]:
+        name = (filters or {}).get("name", "")
+        return [
+            c
+            for c in self.by_id.values()
+            if _matches(c.labels, filters) and name in c.name
+        ]
+
+
+class _Volumes:
+    def __init__(self):
+        self.by_name: dict[str, _Volume] = {}
+
+    def create(self, name: str, labels: dict | None = None) -> _Volume:
+        volume = self.by_name[name] = _Volume(self.by_name, name, labels or {})
+        return volume
+
+    def get(self, name: str) -> _Volume:
+        if name not in self.by_name:
+            raise NotFound(name)
+        return self.by_name[name]
+
+    def list(self, filters: dict | None = None) -> list[_Volume]:
+        return [
+            v for v in self.by_name.values() if _matches(v.attrs["Labels"], filters)
+        ]
+
+
+class _Image:
+    def __init__(self, labels: dict):
+        self.labels = labels
+        self.attrs = {"Created": "2025-01-01T00:00:00Z"}
+
+
+class _Images:
+    def __init__(self):
+        self.images: list[_Image] = []
+        # Names of the images present on the daemon
+        self.pulled: set[str] = set()
+
+    def pull(self, name: str):
+        self.pulled.add(name)
+
+    def list(self, filters: dict | None = None) -> list[_Image]:
+        return [i for i in self.images if _matches(i.labels, filters)]
+
+
+class _Client:
+    def __init__(self):
+        self.images = _Images()
+        self.containers = _Containers(self.images)
+        self.volumes = _Volumes()
+
+    def info(self) -> dict:
+        return {"NCPU": 4, "MemTotal": 16 * 1024**3}
+
+
+def _service(client: _Client) -> tuple[DockerSandboxService, DockerHost]:
+    host = DockerHost(async_docker=AsyncDocker(client=client))
+    service = DockerSandboxService(
+        hosts=[host],
+        sandbox_spec_service=SimpleNamespace(prewarm_hosts=[host.async_docker]),
+    )
+    return service, host
+
+
+def _warm_container(service: DockerSandboxService, client: _Client):
+    container_id = uuid4()
+    client.containers.add(
+        _Container(
+            service._warm_container_name_from_id(container_id),
+            {MANAGED_LABEL: "true", "warm_pool": "true", "sandbox_spec_id": "spec"},
+        )
+    )
+    return container_id
+
+
+def test_claimed_sandbox_survives_restart() -> None:
+    """Test that the owner of a sandbox claimed from the warm pool is found after a restart."""
+
+    async def check():
+        client = _Client()
+        service, host = _service(client)
+        container_id = _warm_container(service, client)
+        await service._load_host(host)
+        user_id = uuid4()
+        assert await service._claim_warm_sandbox(user_id, "spec") == (
+            host,
+            container_id,
+        )
+
+        restarted, restarted_host = _service(client)
+        await restarted._load_host(restarted_host)
+        sandbox_info = await restarted.get_sandbox(container_id)
+        assert sandbox_info is not None
+        assert sandbox_info.user_id == str(user_id)
+        assert not restarted._warm_pool.get("spec")
+
+    asyncio.run(check())
+
+
+def test_interrupted_claim_is_completed_on_restart() -> None:
+    """Test that a warm container recorded as claimed but not yet renamed is not returned to the pool."""
+
+    async def check():
+        client = _Client()
+        service, host = _service(client)
+        container_id = _warm_container(service, client)
+        client.volumes.create(
+            service._claim_volume_name_from_id(container_id),
+            {MANAGED_LABEL: "true", CLAIM_LABEL: str(container_id), "user_id": "alice"},
+        )
+        await service._load_host(host)
+        assert not service._warm_pool.get("spec")
+        sandbox_info = await service.get_sandbox(container_id)
+        assert sandbox_info is not None
+        assert sandbox_info.user_id == "alice"
+
+    asyncio.run(check())
+
+
+def test_failed_template_setup_removes_template() -> None:
+    """Test that a template volume is removed if its setup command fails, so it is not copied."""
+
+    async def check():
+        client = _Client()
+        service, host = _service(client)
+        client.containers.run_exit_status = 1
+        template = WorkspaceTemplate(volume="template", setup_command="false")
+        sandbox_spec = SimpleNamespace(
+            id="spec", initial_env={}, working_dir="/workspace"
+        )
+        with pytest.raises(SandboxError):
+            await service._ensure_workspace_template(host, sandbox_spec, template)
+        assert "template" not in client.volumes.by_name
+
+    asyncio.run(check())
+
+
+def test_readiness_probe_requires_http_success() -> None:
+    """Test that accepting a connection is not enough to pass the readiness probe."""
+
+    async def check():
+        responses = [
+            b"",
+            b"HTTP/1.1 503 Service Unavailable\r\n\r\n",
+            b"HTTP/1.1 200 OK\r\n\r\n",
+        ]
+        requests = []
+
+        async def handle(reader, writer):
+            requests.append(await reader.readline())
+            # An empty response closes the connection, as the docker proxy does
+            writer.write(responses.pop(0))
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        service, _ = _service(_Client())
+        service.readiness_initial_delay = 0.01
+        async with server:
+            assert not await service._probe_once("127.0.0.1", port)
+            assert not await service._probe_once("127.0.0.1", port)
+            assert await service._probe("127.0.0.1", port)
+        assert requests[0] == b"GET /alive HTTP/1.1\r\n"
+
+    asyncio.run(check())
+
+
+def test_snapshots_are_private_to_their_owner() -> None:
+    """Test that snapshots cannot be taken of, started from or deleted by another user."""
+
+    async def check():
+        client = _Client()
+        service, host = _service(client)
+        owner = uuid4()
+        snapshot_id = uuid4()
+        client.images.images.append(
+            _Image(
+                {
+                    SNAPSHOT_LABEL: str(snapshot_id),
+                    SNAPSHOT_OF_LABEL: str(uuid4()),
+                    "user_id": str(owner),
+                    "sandbox_spec_id": "spec",
+                }
+            )
+        )
+        assert (await service.get_snapshot(snapshot_id)).user_id == str(owner)
+        with pytest.raises(ValueError):
+            await service.start_sandbox_from_snapshot(uuid4(), snapshot_id)
+        assert not await service.delete_snapshot(uuid4(), snapshot_id)
+        assert len(client.images.images) == 1
+
+        container_id = uuid4()
+        client.containers.add(
+            _Container(
+                service._container_name_from_id(container_id),
+                {
+                    MANAGED_LABEL: "true",
+                    "user_id": str(owner),
+                    "sandbox_spec_id": "spec",
+                },
+            )
+        )
+        await service._load_host(host)
+        assert await service.snapshot_sandbox(uuid4(), container_id) is None
+        assert await service.snapshot_sandbox(owner, uuid4()) is None
+
+    asyncio.run(check())
+
+
+def test_placement_reserves_hosts_and_ignores_stopped_sandboxes() -> None:
+    """Test that concurrent placements do not over-commit a host, and that stopped sandboxes do
+    not count against the host they are on."""
+
+    async def check():
+        clients = [_Client(), _Client()]
+        for client in clients:
+            client.info = lambda: {"NCPU": 1, "MemTotal": 4 * 1024**3}
+        hosts = [
+            DockerHost(name=name, async_docker=AsyncDocker(client=client))
+            for name, client in zip(("a", "b"), clients, strict=True)
+        ]
+        service = DockerSandboxService(
+            hosts=hosts, sandbox_spec_service=SimpleNamespace(prewarm_hosts=[])
+        )
+        stopped = _Container(
+            service._container_name_from_id(uuid4()),
+            {MANAGED_LABEL: "true", "user_id": "alice", "sandbox_spec_id": "spec"},
+            status="exited",
+        )
+        stopped.attrs["State"]["ExitCode"] = 143
+        clients[0].containers.add(stopped)
+
+        async with service._place(1, 1024**3) as first:
+            async with service._place(1, 1024**3) as second:
+                assert {first.name, second.name} == {"a", "b"}
+                with pytest.raises(SandboxError):
+                    async with service._place(1, 1024**3):
+                        pass
+
+    asyncio.run(check())
+
+
+def test_unlabelled_sandboxes_are_still_listed() -> None:
+    """Test that sandboxes created before the managed label was applied are found by name."""
+
+    async def check():
+        client = _Client()
+        service, host = _service(client)
+        container_id = uuid4()
+        client.containers.add(
+            _Container(
+                service._container_name_from_id(container_id),
+                {"user_id": "alice", "sandbox_spec_id": "spec"},
+            )
+        )
+        client.containers.add(
+            _Container("unrelated", {"user_id": "bob", "sandbox_spec_id": "spec"})
+        )
+        await service._load_host(host)
+        sandbox_info = await service.get_sandbox(container_id)
+        assert sandbox_info is not None
+        assert sandbox_info.user_id == "alice"
+        assert len((await service.search_sandboxes()).items) == 1
+
+    asyncio.run(check())
+
+
+def test_image_is_pulled_on_hosts_which_do_not_have_it() -> None:
+    """Test that a sandbox placed on a host without the image of its spec pulls the image
+    rather than failing, and that the pull is timed as a startup phase."""
+
+    async def check():
+        clients = [_Client(), _Client()]
+        clients[0].images.pulled.add("spec")
+        hosts = [
+            DockerHost(name="a", async_docker=AsyncDocker(client=clients[0])),
+            DockerHost(name="b", async_docker=AsyncDocker(client=clients[1])),
+        ]
+        # The only host with the image is full
+        hosts[0].max_sandboxes = 0
+
+        async def get_sandbox_spec(id: str) -> SandboxSpecInfo:
+            return SandboxSpecInfo(id=id, command="run", created_at=utc_now())
+
+        service = DockerSandboxService(
+            hosts=hosts,
+            sandbox_spec_service=SimpleNamespace(
+                prewarm_hosts=[], get_sandbox_spec=get_sandbox_spec
+            ),
+        )
+        for host in hosts:
+            await service._load_host(host)
+        container_id = await service.start_sandbox(uuid4(), "spec")
+        assert clients[1].images.pulled == {"spec"}
+        assert await hosts[1].cache.get(container_id) is not None
+        assert "pull" in service.get_startup_latency_stats()["spec"]
+        await asyncio.gather(*service._readiness_tasks)
+
+    asyncio.run(check())
+
+
+def test_failed_start_removes_container_and_workspace() -> None:
+    """Test that a container which fails to start is removed along with its workspace, and
+    that its ports are released."""
+
+    async def check():
+        client = _Client()
+        client.images.pulled.add("spec")
+        client.containers.start_error = APIError("start failed")
+        service, host = _service(client)
+        sandbox_spec = SandboxSpecInfo(id="spec", command="run", created_at=utc_now())
+        container_id = uuid4()
+        workspace_volume = f"openhands-workspace-{container_id}"
+        client.volumes.create(workspace_volume)
+        with pytest.raises(SandboxError) as exc_info:
+            await service._run_container(
+                host,
+                sandbox_spec,
+                container_id,
+                service._container_name_from_id(container_id),
+                {"user_id": "alice"},
+            )
+        assert isinstance(exc_info.value.__cause__, APIError)
+        assert not client.containers.by_id
+        assert workspace_volume not in client.volumes.by_name
+        assert host.port_allocator.leased == 0
+        assert container_id not in service._sandbox_ports
+
+    asyncio.run(check())
+
+
+def test_resource_profile_limits_the_container() -> None:
+    """Test that the resource profile of a spec is applied to its containers, that a tmpfs
+    working dir replaces the workspace volume, and that unlimited resources are reserved at
+    the defaults when placing."""
+
+    async def check():
+        client = _Client()
+        client.images.pulled.add("spec")
+        service, host = _service(client)
+        resources = SandboxResourceProfile(
+            cpus=1.5,
+            cpuset_cpus="0-1",
+            memory=512 * 1024**2,
+            pids_limit=100,
+            tmpfs_working_dir=True,
+            tmpfs_size=1024**3,
+        )
+        sandbox_spec = SandboxSpecInfo(
+            id="spec",
+            command="run",
+            created_at=utc_now(),
+            working_dir="/workspace",
+            resources=resources,
+        )
+        container_id = uuid4()
+        container = await service._run_container(
+            host,
+            sandbox_spec,
+            container_id,
+            service._container_name_from_id(container_id),
+            {"user_id": "alice"},
+        )
+        create_kwargs = container.create_kwargs
+        assert create_kwargs["nano_cpus"] == 1_500_000_000
+        assert create_kwargs["cpuset_cpus"] == "0-1"
+        assert create_kwargs["mem_limit"] == 512 * 1024**2
+        assert create_kwargs["pids_limit"] == 100
+        assert create_kwargs["tmpfs"] == {"/workspace": f"size={1024**3}"}
+        assert not any(
+            mount["bind"] == "/workspace" for mount in create_kwargs["volumes"].values()
+        )
+
+        assert service._requested_resources(resources) == (1.5, 512 * 1024**2)
+        assert service._requested_resources(SandboxResourceProfile()) == (
+            service.sandbox_cpus,
+            service.sandbox_memory,
+        )
+
+    asyncio.run(check())
+
+
+def test_stats_cover_each_background_process() -> None:
+    """Test that the service stats combine the warm pool, idle reaper, delete queue and startup
+    latency stats."""
+
+    async def check():
+        client = _Client()
+        client.images.pulled.add("spec")
+        service, host = _service(client)
+        service._observe_startup_phase("spec", "create", 0.2)
+        service._warm_pool_stats.hits = 1
+        service._warm_pool_stats.misses = 2
+        host.delete_queue.enqueue(uuid4(), "openhands-sandbox-gone", [])
+        stats = service.get_stats()
+        assert (stats.warm_pool.hits, stats.warm_pool.misses) == (1, 2)
+        assert stats.idle_reaper == service.get_idle_reaper_stats()
+        assert stats.delete_queue.queued == 1
+        assert stats.startup_latency["spec"]["create"].count == 1
+
+    asyncio.run(check())
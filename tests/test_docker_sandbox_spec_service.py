@@ -0,0 +1,156 @@
+"""Tests for the docker sandbox spec service and its cache, against an in memory docker daemon."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("docker")
+pytest.importorskip("pydantic")
+
+from docker.errors import NotFound  # noqa: E402
+
+from openhands_server.sandbox_spec.docker_sandbox_spec_service import (  # noqa: E402
+    DockerSandboxSpecService,
+)
+from openhands_server.sandbox_spec.sandbox_spec_models import (  # noqa: E402
+    SandboxResourceProfile,
+)
+from openhands_server.utils.async_docker import AsyncDocker  # noqa: E402
+
+REPOSITORY = "ghcr.io/all-hands-ai/runtime"
+
+
+class _Image:
+    def __init__(self, tags: list[str], created: str = "2025-01-01T00:00:00Z"):
+        self.id = f"sha256:{uuid4().hex}"
+        self.tags = tags
+        self.attrs = {"Created": created}
+
+
+class _Images:
+    def __init__(self, images: list[_Image]):
+        self.images = images
+        self.list_calls = 0
+
+    def list(self, name: str | None = None) -> list[_Image]:
+        self.list_calls += 1
+        return [
+            image
+            for image in self.images
+            if not name or any(tag.startswith(name) for tag in image.tags)
+        ]
+
+    def get(self, name: str) -> _Image:
+        for image in self.images:
+            if name in image.tags or name == image.id:
+                return image
+        raise NotFound(name)
+
+
+class _Client:
+    def __init__(self, images: list[_Image]):
+        self.images = _Images(images)
+
+
+def _service(images: list[_Image], **kwargs) -> DockerSandboxSpecService:
+    return DockerSandboxSpecService(
+        async_docker=AsyncDocker(client=_Client(images)), **kwargs
+    )
+
+
+def test_image_is_found_by_any_tag() -> None:
+    """Test that an image with several tags has the id of its first tag in the repository, is
+    found by each of its tags, and takes a resource profile configured under any of them."""
+
+    async def check():
+        profile = SandboxResourceProfile(cpus=2, memory=1024**3)
+        image = _Image(["other:latest", f"{REPOSITORY}:1.0", f"{REPOSITORY}:stable"])
+        service = _service([image], resource_profiles={f"{REPOSITORY}:stable": profile})
+        for tag in image.tags[1:]:
+            sandbox_spec = await service.get_sandbox_spec(tag)
+            assert sandbox_spec.id == f"{REPOSITORY}:1.0"
+            assert sandbox_spec.resources == profile
+        page = await service.search_sandbox_specs()
+        assert [sandbox_spec.id for sandbox_spec in page.items] == [f"{REPOSITORY}:1.0"]
+        assert await service.get_sandbox_spec(f"{REPOSITORY}:missing") is None
+
+    asyncio.run(check())
+
+
+def test_specs_are_cached_until_expired_or_invalidated() -> None:
+    """Test that specs are listed once per TTL, and listed again after an image event."""
+
+    async def check():
+        image = _Image([f"{REPOSITORY}:1.0"])
+        service = _service([image])
+        images = service.async_docker.client.images
+        for _ in range(3):
+            assert await service.get_sandbox_spec(f"{REPOSITORY}:1.0")
+        assert images.list_calls == 1
+
+        service._specs_loaded_at -= service.cache_ttl
+        await service.get_sandbox_spec(f"{REPOSITORY}:1.0")
+        assert images.list_calls == 2
+
+        images.images.append(_Image([f"{REPOSITORY}:2.0"]))
+        assert await service.get_sandbox_spec(f"{REPOSITORY}:2.0") is not None
+        await service._on_image_event({"Action": "delete", "id": image.id})
+        images.images.remove(image)
+        assert await service.get_sandbox_spec(f"{REPOSITORY}:1.0") is None
+
+    asyncio.run(check())
+
+
+def test_load_overlapping_an_invalidation_is_not_cached() -> None:
+    """Test that specs listed before an image event are not cached after it."""
+
+    async def check():
+        service = _service([_Image([f"{REPOSITORY}:1.0"])])
+        list_images = service.async_docker.list_images
+        listed = asyncio.Event()
+        release = asyncio.Event()
+        list_calls = []
+
+        async def slow_list_images(**kwargs):
+            list_calls.append(kwargs)
+            images = await list_images(**kwargs)
+            listed.set()
+            await release.wait()
+            return images
+
+        service.async_docker.list_images = slow_list_images
+        load = asyncio.create_task(service.get_sandbox_spec(f"{REPOSITORY}:1.0"))
+        await listed.wait()
+        service.invalidate()
+        release.set()
+        assert await load is not None
+        await service.get_sandbox_spec(f"{REPOSITORY}:1.0")
+        assert len(list_calls) == 2
+
+    asyncio.run(check())
+
+
+def test_specs_are_paged_newest_first() -> None:
+    """Test that following next_page_id visits every spec once, newest first, from a single
+    listing of the images."""
+
+    async def check():
+        service = _service(
+            [
+                _Image([f"{REPOSITORY}:{day}"], f"2025-01-0{day}T00:00:00Z")
+                for day in (3, 1, 2, 5, 4)
+            ]
+        )
+        ids = []
+        page_id = None
+        while True:
+            page = await service.search_sandbox_specs(page_id=page_id, limit=2)
+            ids.extend(sandbox_spec.id for sandbox_spec in page.items)
+            page_id = page.next_page_id
+            if page_id is None:
+                break
+        assert ids == [f"{REPOSITORY}:{day}" for day in (5, 4, 3, 2, 1)]
+        assert service.async_docker.client.images.list_calls == 1
+
+    asyncio.run(check())
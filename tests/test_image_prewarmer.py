@@ -0,0 +1,136 @@
+"""Tests for keeping sandbox spec images pulled across docker hosts."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("docker")
+pytest.importorskip("pydantic")
+
+from docker.errors import APIError, NotFound  # noqa: E402
+
+from openhands_server.sandbox_spec.image_prewarmer import ImagePrewarmer  # noqa: E402
+from openhands_server.sandbox_spec.sandbox_spec_models import (  # noqa: E402
+    SandboxSpecStatus,
+)
+from openhands_server.utils.async_docker import AsyncDocker  # noqa: E402
+
+REPOSITORY = "runtime"
+
+
+class _Image:
+    def __init__(self, tag: str, created: str = "2025-01-01T00:00:00Z"):
+        self.id = f"sha256:{uuid4().hex}"
+        self.tags = [tag]
+        self.attrs = {"Created": created}
+
+
+class _Images:
+    def __init__(self):
+        self.images: list[_Image] = []
+        self.pulled: list[str] = []
+        self.removed: list[str] = []
+        # Error raised by pulls
+        self.pull_error: APIError | None = None
+
+    def list(self, name: str | None = None) -> list[_Image]:
+        return [image for image in self.images if image.tags[0].startswith(name or "")]
+
+    def get(self, name: str) -> _Image:
+        for image in self.images:
+            if name in image.tags:
+                return image
+        raise NotFound(name)
+
+    def pull(self, repository: str, tag: str | None = None) -> _Image:
+        if self.pull_error:
+            raise self.pull_error
+        name = f"{repository}:{tag}" if tag else repository
+        self.pulled.append(name)
+        image = _Image(name)
+        self.images.append(image)
+        return image
+
+    def remove(self, name: str, **kwargs):
+        self.removed.append(name)
+        self.images = [image for image in self.images if name not in image.tags]
+
+
+class _Containers:
+    def __init__(self):
+        # Ids of the images which containers were created from
+        self.ancestors: set[str] = set()
+
+    def list(self, all: bool = False, filters: dict | None = None) -> list:
+        return ["container"] if filters["ancestor"] in self.ancestors else []
+
+
+class _Client:
+    def __init__(self):
+        self.images = _Images()
+        self.containers = _Containers()
+
+
+def test_images_are_pulled_on_every_host() -> None:
+    """Test that an image missing on any host is pulled there, is BUILDING until then, and is
+    in ERROR if the pull fails."""
+
+    async def check():
+        clients = [_Client(), _Client()]
+        clients[0].images.images.append(_Image(f"{REPOSITORY}:1.0"))
+        changes = []
+        prewarmer = ImagePrewarmer(
+            hosts=[AsyncDocker(client=client) for client in clients],
+            repository=REPOSITORY,
+            image_ids=[f"{REPOSITORY}:1.0", f"{REPOSITORY}:2.0"],
+            on_change=lambda: changes.append(dict(prewarmer._status)),
+        )
+        await prewarmer.prewarm()
+        assert clients[0].images.pulled == [f"{REPOSITORY}:2.0"]
+        assert clients[1].images.pulled == [f"{REPOSITORY}:1.0", f"{REPOSITORY}:2.0"]
+        # Both are BUILDING before either is pulled
+        assert changes[1] == {
+            f"{REPOSITORY}:1.0": SandboxSpecStatus.BUILDING,
+            f"{REPOSITORY}:2.0": SandboxSpecStatus.BUILDING,
+        }
+        assert prewarmer.get_status(f"{REPOSITORY}:1.0") == SandboxSpecStatus.READY
+        assert prewarmer.get_status(f"{REPOSITORY}:2.0") == SandboxSpecStatus.READY
+        assert prewarmer.get_status(f"{REPOSITORY}:3.0") is None
+        assert prewarmer.get_pending() == {}
+
+        prewarmer.image_ids.append(f"{REPOSITORY}:3.0")
+        clients[1].images.pull_error = APIError("pull failed")
+        await prewarmer.prewarm()
+        assert prewarmer.get_status(f"{REPOSITORY}:3.0") == SandboxSpecStatus.ERROR
+        assert list(prewarmer.get_pending()) == [f"{REPOSITORY}:3.0"]
+
+    asyncio.run(check())
+
+
+def test_unused_images_beyond_keep_unused_are_removed() -> None:
+    """Test that the oldest unused images in the repository are removed, keeping the newest
+    keep_unused, prewarmed images and images used by containers."""
+
+    async def check():
+        client = _Client()
+        images = {
+            tag: _Image(f"{REPOSITORY}:{tag}", f"2025-01-0{day}T00:00:00Z")
+            for day, tag in enumerate(["first", "used", "second", "third", "wanted"], 1)
+        }
+        client.images.images.extend(images.values())
+        client.images.images.append(_Image("other:latest"))
+        client.containers.ancestors.add(images["used"].id)
+        prewarmer = ImagePrewarmer(
+            hosts=[AsyncDocker(client=client)],
+            repository=REPOSITORY,
+            image_ids=[f"{REPOSITORY}:wanted"],
+            keep_unused=1,
+        )
+        await prewarmer.collect_garbage(prewarmer.hosts[0])
+        assert sorted(client.images.removed) == [
+            f"{REPOSITORY}:first",
+            f"{REPOSITORY}:second",
+        ]
+
+    asyncio.run(check())
@@ -0,0 +1,177 @@
+"""Tests for the event routes of the local conversation router, against a stub service."""
+
+import asyncio
+import json
+from uuid import UUID, uuid4
+
+import pytest
+
+pytest.importorskip("openhands.sdk")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from openhands_server.local_conversation import manager  # noqa: E402
+from openhands_server.local_conversation.manager import (  # noqa: E402
+    LocalConversationService,
+)
+from openhands_server.local_conversation.model import StoredEvent  # noqa: E402
+
+
+def _event(offset: int) -> StoredEvent:
+    return StoredEvent(
+        offset=offset, kind="MessageEvent", source="agent", event={"n": offset}
+    )
+
+
+class _Service(LocalConversationService):
+    """Conversation with stored events, and live events published once subscribed to"""
+
+    def __init__(
+        self, stored: list[StoredEvent], live: list[StoredEvent] | None = None
+    ):
+        self.conversation_id = uuid4()
+        self.stored = stored
+        # None if the conversation is not running
+        self.live = live
+        self.unsubscribed = []
+
+    async def read_events(self, conversation_id, offset=0, limit=100):
+        if conversation_id != self.conversation_id:
+            return None
+        return [event for event in self.stored if event.offset >= offset][:limit]
+
+    async def iter_events(
+        self,
+        conversation_id,
+        offset=None,
+        limit=100,
+        kind__eq=None,
+        source__eq=None,
+        reverse=False,
+    ):
+        events = await self.read_events(conversation_id, offset or 0, limit)
+        if events is None:
+            return None
+
+        async def iter_events():
+            for event in events:
+                yield event
+
+        return iter_events()
+
+    async def subscribe_to_events(self, conversation_id, callback, on_disconnect=None):
+        if self.live is None:
+            return None
+
+        async def publish():
+            for event in self.live:
+                await callback(event)
+            on_disconnect()
+
+        asyncio.get_running_loop().create_task(publish())
+        return uuid4()
+
+    async def unsubscribe_from_events(self, conversation_id, subscriber_id):
+        self.unsubscribed.append(subscriber_id)
+        return True
+
+    async def search_local_conversations(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    async def get_local_conversation(self, conversation_id):
+        raise NotImplementedError()
+
+    async def batch_get_local_conversations(self, conversation_ids):
+        raise NotImplementedError()
+
+    async def start_local_conversation(self, request):
+        raise NotImplementedError()
+
+    async def pause_local_conversation(self, conversation_id):
+        raise NotImplementedError()
+
+    async def resume_local_conversation(self, conversation_id):
+        raise NotImplementedError()
+
+    async def delete_local_conversation(self, conversation_id):
+        raise NotImplementedError()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+    @classmethod
+    def get_instance(cls):
+        raise NotImplementedError()
+
+
+def _client(monkeypatch, service: _Service) -> TestClient:
+    monkeypatch.setattr(manager, "_local_conversation_service", service)
+    from openhands_server.local_conversation import router
+
+    monkeypatch.setattr(router, "local_conversation_service", service)
+    app = FastAPI()
+    app.include_router(router.router)
+    return TestClient(app)
+
+
+def _offsets(events: list[dict]) -> list[int]:
+    return [event["offset"] for event in events]
+
+
+def test_events_are_paged_as_ndjson(monkeypatch) -> None:
+    """Test that each event is a line of JSON, and that unknown conversations are not found."""
+    service = _Service([_event(offset) for offset in range(5)])
+    client = _client(monkeypatch, service)
+    response = client.get(
+        f"/local-conversations/{service.conversation_id}/events?offset=1&limit=3"
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.split("\n")
+    assert lines[-1] == ""
+    assert _offsets([json.loads(line) for line in lines[:-1]]) == [1, 2, 3]
+    assert client.get(f"/local-conversations/{uuid4()}/events").status_code == 404
+
+
+def test_socket_replays_then_streams_live_events_once(monkeypatch) -> None:
+    """Test that stored events are replayed before live ones, and that a live event which was
+    also replayed is only sent once."""
+    service = _Service(
+        [_event(offset) for offset in range(3)], live=[_event(1), _event(2), _event(3)]
+    )
+    client = _client(monkeypatch, service)
+    url = f"/local-conversations/{service.conversation_id}/events/socket?offset=1"
+    with client.websocket_connect(url) as websocket:
+        received = [json.loads(websocket.receive_text()) for _ in range(3)]
+    assert _offsets(received) == [1, 2, 3]
+
+
+def test_stream_resumes_from_last_event_id(monkeypatch) -> None:
+    """Test that the server sent events stream resumes after the Last-Event-ID given, and
+    that each event is framed with its offset as the id."""
+    service = _Service([_event(offset) for offset in range(5)])
+    client = _client(monkeypatch, service)
+    response = client.get(
+        f"/local-conversations/{service.conversation_id}/events/stream",
+        headers={"Last-Event-ID": "2"},
+    )
+    assert response.status_code == 200
+    frames = [frame for frame in response.text.split("\n\n") if frame]
+    assert [frame.split("\n")[0] for frame in frames] == ["id: 3", "id: 4"]
+    assert frames[0].split("\n")[1] == "event: MessageEvent"
+    assert json.loads(frames[0].split("\n")[2].removeprefix("data: "))["offset"] == 3
+
+
+def test_unknown_conversation_is_not_streamed(monkeypatch) -> None:
+    """Test that the stream of an unknown conversation is not found."""
+    service = _Service([])
+    client = _client(monkeypatch, service)
+    assert (
+        client.get(f"/local-conversations/{UUID(int=0)}/events/stream").status_code
+        == 404
+    )
@@ -0,0 +1,115 @@
+"""Tests for the write behind persistence of conversation metadata."""
+
+import asyncio
+import os
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from openhands_server.local_conversation.meta_persister import MetaPersister
+
+
+def _conversation():
+    return SimpleNamespace(stored=SimpleNamespace(id=uuid4()))
+
+
+def _persister(debounce: float = 0.01) -> tuple[MetaPersister, list]:
+    saved = []
+
+    async def save(conversation):
+        saved.append(conversation.stored.id)
+
+    return MetaPersister(save=save, debounce=debounce), saved
+
+
+def test_changes_are_coalesced() -> None:
+    """Test that changes within the debounce window are written once."""
+
+    async def check():
+        persister, saved = _persister()
+        conversation = _conversation()
+        for _ in range(3):
+            persister.mark_dirty(conversation)
+        await asyncio.sleep(0.05)
+        assert saved == [conversation.stored.id]
+        persister.mark_dirty(conversation)
+        await asyncio.sleep(0.05)
+        assert saved == [conversation.stored.id] * 2
+
+    asyncio.run(check())
+
+
+def test_flush_writes_immediately() -> None:
+    """Test that flushing writes pending changes without waiting for the debounce, and that
+    they are not written again once the window ends."""
+
+    async def check():
+        persister, saved = _persister(debounce=0.02)
+        first, second, clean = _conversation(), _conversation(), _conversation()
+        persister.mark_dirty(first)
+        await persister.flush(first.stored.id)
+        assert saved == [first.stored.id]
+        await persister.flush(clean.stored.id)
+        assert saved == [first.stored.id]
+
+        persister.mark_dirty(first)
+        persister.mark_dirty(second)
+        await persister.flush_all()
+        assert sorted(saved[1:]) == sorted([first.stored.id, second.stored.id])
+        await asyncio.sleep(0.05)
+        assert len(saved) == 3
+
+    asyncio.run(check())
+
+
+def test_discard_drops_pending_changes() -> None:
+    """Test that discarded changes are never written."""
+
+    async def check():
+        persister, saved = _persister()
+        conversation = _conversation()
+        persister.mark_dirty(conversation)
+        persister.discard(conversation.stored.id)
+        await asyncio.sleep(0.05)
+        await persister.flush_all()
+        assert saved == []
+
+    asyncio.run(check())
+
+
+def test_failed_write_is_not_raised() -> None:
+    """Test that a failing write is logged rather than raised to the caller of flush."""
+
+    async def check():
+        async def save(conversation):
+            raise OSError("disk full")
+
+        persister = MetaPersister(save=save)
+        conversation = _conversation()
+        persister.mark_dirty(conversation)
+        await persister.flush(conversation.stored.id)
+
+    asyncio.run(check())
+
+
+def test_meta_is_synced_before_it_is_renamed(tmp_path, monkeypatch) -> None:
+    """Test that the temp file is synced to disk before it replaces the meta file."""
+    pytest.importorskip("openhands.sdk")
+    from openhands_server.local_conversation import local_conversation
+
+    calls = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(
+        local_conversation.os, "fsync", lambda fd: calls.append("fsync") or fsync(fd)
+    )
+    monkeypatch.setattr(
+        local_conversation.os,
+        "replace",
+        lambda src, dst: calls.append("replace") or replace(src, dst),
+    )
+    path = tmp_path / "meta.json"
+    local_conversation._write_atomic(path, "{}")
+    assert calls == ["fsync", "replace"]
+    assert path.read_text() == "{}"
+    assert [child.name for child in tmp_path.iterdir()] == ["meta.json"]
@@ -0,0 +1,61 @@
+"""Tests for keyset page cursors."""
+
+import base64
+import json
+from datetime import UTC, datetime, timedelta
+
+from openhands_server.utils.page_cursor import PageCursor, page_newest_first
+
+
+def _keys(count: int) -> list[PageCursor]:
+    start = datetime(2025, 1, 1, tzinfo=UTC)
+    return sorted(
+        PageCursor(start + timedelta(minutes=i), f"id-{i:03d}") for i in range(count)
+    )
+
+
+def test_cursor_round_trip() -> None:
+    """Test that an encoded cursor decodes to the same key."""
+    cursor = PageCursor(datetime(2025, 1, 1, 12, tzinfo=UTC), "abc")
+    assert PageCursor.decode(cursor.encode()) == cursor
+
+
+def test_decode_malformed_cursor() -> None:
+    """Test that malformed page ids are treated as the first page."""
+    assert PageCursor.decode(None) is None
+    assert PageCursor.decode("not-a-cursor") is None
+    assert PageCursor.decode("10") is None
+
+
+def test_decode_naive_cursor() -> None:
+    """Test that a cursor without a time zone is treated as malformed, rather than failing
+    when compared with the keys."""
+    payload = json.dumps(["2025-01-01T12:00:00", "abc"]).encode()
+    page_id = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+    assert PageCursor.decode(page_id) is None
+    page, _ = page_newest_first(_keys(3), page_id, 10)
+    assert page == list(reversed(_keys(3)))
+
+
+def test_pages_cover_all_keys_newest_first() -> None:
+    """Test that following next_page_id visits every key exactly once."""
+    keys = _keys(25)
+    seen = []
+    page_id = None
+    while True:
+        page, page_id = page_newest_first(keys, page_id, 10)
+        seen.extend(page)
+        if page_id is None:
+            break
+    assert seen == list(reversed(keys))
+
+
+def test_pages_stable_under_inserts() -> None:
+    """Test that inserting a newer key does not shift the following page."""
+    keys = _keys(20)
+    first_page, page_id = page_newest_first(keys, None, 5)
+    newer = PageCursor(keys[-1].created_at + timedelta(minutes=1), "id-new")
+    keys = sorted([*keys, newer])
+    second_page, _ = page_newest_first(keys, page_id, 5)
+    assert second_page[0] < first_page[-1]
+    assert second_page == list(reversed(keys[10:15]))
@@ -0,0 +1,39 @@
+"""Tests for the sandbox host port allocator."""
+
+import pytest
+
+from openhands_server.sandbox.port_allocator import PortAllocator
+from openhands_server.sandbox.sandbox_errors import SandboxError
+
+
+def test_allocate_unique_ports_until_exhausted() -> None:
+    """Test that every port in the range is leased once before the range is exhausted."""
+    allocator = PortAllocator(start=40000, end=40020)
+    ports = [allocator.allocate() for _ in range(20)]
+    assert sorted(ports) == list(range(40000, 40020))
+    assert allocator.leased == 20
+    with pytest.raises(SandboxError):
+        allocator.allocate()
+
+
+def test_release_and_reuse() -> None:
+    """Test that released ports are reclaimed, but not handed straight back out."""
+    allocator = PortAllocator(start=40000, end=40010)
+    first = allocator.allocate()
+    assert allocator.release(first)
+    assert not allocator.release(first)
+    assert allocator.allocate() != first
+    for _ in range(9):
+        allocator.allocate()
+    assert allocator.leased == 10
+
+
+def test_reset_rebuilds_leases() -> None:
+    """Test that rebuilding from existing bindings ignores ports outside the range."""
+    allocator = PortAllocator(start=40000, end=40016)
+    allocator.allocate()
+    allocator.reset([40003, 40008, 8080])
+    assert allocator.leased == 2
+    assert not allocator.reserve(40003)
+    ports = {allocator.allocate() for _ in range(14)}
+    assert not ports & {40003, 40008}
@@ -0,0 +1,117 @@
+"""Tests for the delivery of events to subscribers with bounded queues."""
+
+import asyncio
+
+from openhands_server.utils.pub_sub import OverflowPolicy, PubSub
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_block_waits_for_the_subscriber() -> None:
+    """Test that publishing to a full queue with the BLOCK policy waits until the subscriber
+    catches up, and that no event is lost."""
+
+    async def check():
+        pub_sub = PubSub(max_queue_size=1, overflow_policy=OverflowPolicy.BLOCK)
+        release = asyncio.Event()
+        received = []
+
+        async def callback(event):
+            await release.wait()
+            received.append(event)
+
+        pub_sub.subscribe(callback)
+        await pub_sub(1)
+        await _settle()
+        # 1 is being delivered and 2 is queued, so 3 has to wait
+        await pub_sub(2)
+        publish = asyncio.create_task(pub_sub(3))
+        await _settle()
+        assert not publish.done()
+        release.set()
+        await publish
+        await _settle()
+        assert received == [1, 2, 3]
+        assert pub_sub.get_stats()[0].dropped == 0
+
+    asyncio.run(check())
+
+
+def test_drop_oldest_keeps_the_newest_events() -> None:
+    """Test that the oldest queued events are discarded to make space with the DROP_OLDEST
+    policy, and that the drops are counted."""
+
+    async def check():
+        pub_sub = PubSub(max_queue_size=2, overflow_policy=OverflowPolicy.DROP_OLDEST)
+        received = []
+        pub_sub.subscribe(received.append)
+        for event in range(4):
+            await pub_sub(event)
+        stats = pub_sub.get_stats()[0]
+        assert stats.lag == 2
+        assert stats.dropped == 2
+        await _settle()
+        assert received == [2, 3]
+        stats = pub_sub.get_stats()[0]
+        assert (stats.lag, stats.delivered) == (0, 2)
+
+    asyncio.run(check())
+
+
+def test_disconnect_unsubscribes_the_subscriber() -> None:
+    """Test that a subscriber with the DISCONNECT policy is unsubscribed and notified when its
+    queue overflows."""
+
+    async def check():
+        pub_sub = PubSub(max_queue_size=1)
+        received = []
+        disconnected = []
+        pub_sub.subscribe(
+            received.append,
+            overflow_policy=OverflowPolicy.DISCONNECT,
+            on_disconnect=lambda: disconnected.append(True),
+        )
+        await pub_sub(1)
+        await pub_sub(2)
+        assert disconnected == [True]
+        assert pub_sub.callback_count == 0
+        await _settle()
+        assert received == []
+
+    asyncio.run(check())
+
+
+def test_slow_subscriber_does_not_stall_others() -> None:
+    """Test that a subscriber which never returns does not hold up delivery to the others, and
+    that failing callbacks are counted as errors."""
+
+    async def check():
+        pub_sub = PubSub(max_queue_size=2)
+        stalled = asyncio.Event()
+        received = []
+
+        async def slow(event):
+            await stalled.wait()
+
+        def failing(event):
+            raise RuntimeError("boom")
+
+        slow_id = pub_sub.subscribe(slow)
+        pub_sub.subscribe(received.append, max_queue_size=10)
+        failing_id = pub_sub.subscribe(failing, max_queue_size=10)
+        for event in range(5):
+            await pub_sub(event)
+            await _settle()
+        assert received == [0, 1, 2, 3, 4]
+        stats = {stats.callback_id: stats for stats in pub_sub.get_stats()}
+        assert stats[slow_id].delivered == 0
+        assert stats[slow_id].lag == 2
+        assert stats[slow_id].dropped == 2
+        assert (stats[failing_id].errors, stats[failing_id].delivered) == (5, 0)
+        pub_sub.clear()
+        assert pub_sub.callback_count == 0
+
+    asyncio.run(check())
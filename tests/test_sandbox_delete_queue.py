@@ -0,0 +1,120 @@
+"""Tests for the background sandbox delete pipeline."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("docker")
+pytest.importorskip("pydantic")
+
+import requests  # noqa: E402
+from docker.errors import NotFound  # noqa: E402
+
+from openhands_server.sandbox.sandbox_delete_queue import SandboxDeleteQueue  # noqa: E402
+
+
+class _AsyncDocker:
+    """Daemon which is unreachable for the first call, and on which the container is already gone"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_container(self, name: str):
+        self.calls += 1
+        if self.calls == 1:
+            raise requests.ConnectionError("daemon down")
+        raise NotFound(name)
+
+    async def get_volume(self, name: str):
+        raise NotFound(name)
+
+
+def test_retries_connection_errors_and_releases_missing_containers() -> None:
+    """Test that the drain survives an unreachable daemon, and that a container which is already
+    gone is still reported as removed."""
+
+    async def check():
+        removed, done = [], []
+        queue = SandboxDeleteQueue(
+            async_docker=_AsyncDocker(),
+            on_container_removed=lambda id, container: removed.append((id, container)),
+            on_done=done.append,
+            retry_delay=0,
+        )
+        sandbox_id = uuid4()
+        await queue.start()
+        queue.enqueue(sandbox_id, "container", ["volume"])
+        for _ in range(20):
+            await asyncio.sleep(0)
+            if done:
+                break
+        await queue.stop()
+        assert removed == [(sandbox_id, None)]
+        assert done == [sandbox_id]
+        assert queue.get_stats().retried == 1
+
+    asyncio.run(check())
+
+
+class _Container:
+    def __init__(self):
+        self.status = "running"
+
+    def stop(self, timeout: int):
+        pass
+
+    def remove(self, force: bool = False):
+        pass
+
+
+class _SlowAsyncDocker:
+    """Daemon on which stopping a container takes until released"""
+
+    def __init__(self):
+        self.stopping = 0
+        self.max_stopping = 0
+        self.release = asyncio.Event()
+
+    async def get_container(self, name: str) -> _Container:
+        return _Container()
+
+    async def get_volume(self, name: str):
+        raise NotFound(name)
+
+    async def run(self, fn, *args, **kwargs):
+        if fn.__name__ == "stop":
+            self.stopping += 1
+            self.max_stopping = max(self.max_stopping, self.stopping)
+            await self.release.wait()
+            self.stopping -= 1
+        return fn(*args, **kwargs)
+
+    run_long = run
+
+
+def test_containers_are_removed_concurrently() -> None:
+    """Test that queued containers are stopped concurrently, up to the batch size."""
+
+    async def check():
+        async_docker = _SlowAsyncDocker()
+        done = []
+        queue = SandboxDeleteQueue(
+            async_docker=async_docker, on_done=done.append, container_batch_size=3
+        )
+        for _ in range(5):
+            queue.enqueue(uuid4(), "container", ["volume"])
+        await queue.start()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert async_docker.stopping == 3
+        async_docker.release.set()
+        for _ in range(20):
+            await asyncio.sleep(0)
+            if len(done) == 5:
+                break
+        await queue.stop()
+        assert async_docker.max_stopping == 3
+        assert len(done) == 5
+
+    asyncio.run(check())
@@ -0,0 +1,114 @@
+"""Tests for the idle sandbox reaper."""
+
+import asyncio
+from datetime import timedelta
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from openhands_server.sandbox.sandbox_models import (  # noqa: E402
+    SandboxInfo,
+    SandboxPage,
+    SandboxStatus,
+)
+from openhands_server.sandbox.sandbox_reaper import IdleTier, SandboxIdleReaper  # noqa: E402
+
+
+class _SandboxService:
+    def __init__(self, sandbox_info: SandboxInfo, samples: list[bool | None]):
+        self.sandbox_info = sandbox_info
+        self.samples = samples
+        self.paused = []
+
+    async def search_sandboxes(self, page_id=None, limit=100) -> SandboxPage:
+        return SandboxPage(items=[self.sandbox_info])
+
+    async def sample_sandbox_activity(self, id) -> bool | None:
+        return self.samples.pop(0)
+
+    async def pause_sandbox(self, id) -> bool:
+        self.paused.append(id)
+        return True
+
+
+def test_network_traffic_keeps_sandbox_active() -> None:
+    """Test that an idle sandbox is only paused once a sample shows no traffic since the last."""
+
+    async def check():
+        sandbox_info = SandboxInfo(
+            id=uuid4(),
+            user_id="alice",
+            sandbox_spec_id="spec",
+            status=SandboxStatus.RUNNING,
+            url=None,
+            session_api_key=None,
+        )
+        service = _SandboxService(sandbox_info, [None, True, False])
+        reaper = SandboxIdleReaper(sandbox_service=service, pause_after=60)
+
+        def age():
+            reaper._last_activity[sandbox_info.id] -= timedelta(seconds=120)
+
+        reaper.touch(sandbox_info.id)
+        age()
+        # No earlier sample to compare with
+        await reaper.reap()
+        assert service.paused == []
+        # Traffic since the last sample counts as activity
+        await reaper.reap()
+        assert service.paused == []
+        assert reaper._tiers[sandbox_info.id] == IdleTier.ACTIVE
+        age()
+        await reaper.reap()
+        assert service.paused == [sandbox_info.id]
+        assert reaper._tiers[sandbox_info.id] == IdleTier.PAUSED
+
+    asyncio.run(check())
+
+
+class _SlowSandboxService(_SandboxService):
+    """Sampling takes until every sandbox is being sampled at once"""
+
+    def __init__(self, sandbox_infos: list[SandboxInfo]):
+        super().__init__(sandbox_infos[0], [])
+        self.sandbox_infos = sandbox_infos
+        self.sampling = 0
+        self.all_sampling = asyncio.Event()
+
+    async def search_sandboxes(self, page_id=None, limit=100) -> SandboxPage:
+        return SandboxPage(items=self.sandbox_infos)
+
+    async def sample_sandbox_activity(self, id) -> bool | None:
+        self.sampling += 1
+        if self.sampling == len(self.sandbox_infos):
+            self.all_sampling.set()
+        await self.all_sampling.wait()
+        return False
+
+
+def test_sandboxes_are_sampled_concurrently() -> None:
+    """Test that idle sandboxes are sampled at the same time rather than one after another."""
+
+    async def check():
+        sandbox_infos = [
+            SandboxInfo(
+                id=uuid4(),
+                user_id="alice",
+                sandbox_spec_id="spec",
+                status=SandboxStatus.RUNNING,
+                url=None,
+                session_api_key=None,
+            )
+            for _ in range(3)
+        ]
+        service = _SlowSandboxService(sandbox_infos)
+        reaper = SandboxIdleReaper(sandbox_service=service, pause_after=60)
+        for sandbox_info in sandbox_infos:
+            reaper.touch(sandbox_info.id)
+            reaper._last_activity[sandbox_info.id] -= timedelta(seconds=120)
+        await asyncio.wait_for(reaper.reap(), timeout=1)
+        assert service.paused == [sandbox_info.id for sandbox_info in sandbox_infos]
+
+    asyncio.run(check())
@@ -0,0 +1,123 @@
+"""Tests for the segmented append only log."""
+
+import io
+import threading
+
+import pytest
+
+from openhands_server.utils import segmented_log
+from openhands_server.utils.segmented_log import SegmentedLog
+
+
+def _payload(offset: int) -> bytes:
+    return f"record-{offset}".encode() * (offset % 5 + 1)
+
+
+def test_read_across_segments(tmp_path) -> None:
+    """Test that records are read back by offset after rolling over several segments."""
+    log = SegmentedLog(tmp_path, max_segment_bytes=256, index_interval=4)
+    offsets = [log.append(_payload(offset)) for offset in range(100)]
+    assert offsets == list(range(100))
+    assert len(list(tmp_path.glob("*.log"))) > 1
+    assert log.read(0, 100) == [_payload(offset) for offset in range(100)]
+    assert log.read(37, 5) == [_payload(offset) for offset in range(37, 42)]
+    assert log.read(98, 10) == [_payload(98), _payload(99)]
+    assert log.read(100, 10) == []
+    assert log.tail(3) == [_payload(offset) for offset in range(97, 100)]
+    log.close()
+
+
+def test_reopen_discards_partial_record(tmp_path) -> None:
+    """Test that a partial record at the end of the log is dropped when reopened, and that
+    appends continue from the last complete record."""
+    log = SegmentedLog(tmp_path, max_segment_bytes=1024, index_interval=4)
+    for offset in range(10):
+        log.append(_payload(offset))
+    log.close()
+    last_segment = sorted(tmp_path.glob("*.log"))[-1]
+    with last_segment.open("ab") as file:
+        file.write(b"\x00\x00\x01\x00partial")
+
+    log = SegmentedLog(tmp_path, max_segment_bytes=1024, index_interval=4)
+    assert log.next_offset == 10
+    assert log.append(b"next") == 10
+    assert log.read(8, 5) == [_payload(8), _payload(9), b"next"]
+    log.close()
+
+
+def test_reopen_rebuilds_missing_index(tmp_path) -> None:
+    """Test that index entries lost from the last segment are rebuilt when reopened."""
+    log = SegmentedLog(tmp_path, index_interval=2)
+    for offset in range(9):
+        log.append(_payload(offset))
+    log.close()
+    for index_path in tmp_path.glob("*.index"):
+        index_path.write_bytes(b"")
+
+    log = SegmentedLog(tmp_path, index_interval=2)
+    assert log.next_offset == 9
+    assert log.read(5, 2) == [_payload(5), _payload(6)]
+    log.close()
+
+
+def test_read_only_leaves_files_untouched(tmp_path) -> None:
+    """Test that a read only log skips a partial record without truncating it, and never
+    creates a missing log."""
+    log = SegmentedLog(tmp_path, max_segment_bytes=1024, index_interval=4)
+    for offset in range(6):
+        log.append(_payload(offset))
+    log.close()
+    last_segment = sorted(tmp_path.glob("*.log"))[-1]
+    with last_segment.open("ab") as file:
+        file.write(b"\x00\x00\x01\x00partial")
+    size = last_segment.stat().st_size
+
+    log = SegmentedLog(tmp_path, index_interval=4, read_only=True)
+    assert log.next_offset == 6
+    assert log.read(4, 5) == [_payload(4), _payload(5)]
+    with pytest.raises(io.UnsupportedOperation):
+        log.append(b"next")
+    log.close()
+    assert last_segment.stat().st_size == size
+
+    missing = SegmentedLog(tmp_path / "missing", read_only=True)
+    assert missing.read(0, 10) == []
+    assert not (tmp_path / "missing").exists()
+
+
+def test_concurrent_readers_share_one_map(tmp_path, monkeypatch) -> None:
+    """Test that readers mapping a sealed segment at the same time keep a single map, and that
+    the extra map is closed."""
+    log = SegmentedLog(tmp_path, max_segment_bytes=256, index_interval=4)
+    for offset in range(20):
+        log.append(_payload(offset))
+    sealed = log._segments[0]
+    maps = []
+    barrier = threading.Barrier(2)
+    real_mmap = segmented_log.mmap.mmap
+
+    class _Mmap:
+        def __new__(cls, *args, **kwargs):
+            data = real_mmap(*args, **kwargs)
+            maps.append(data)
+            # Both readers map the segment before either caches it
+            barrier.wait(timeout=5)
+            return data
+
+    monkeypatch.setattr(segmented_log.mmap, "mmap", _Mmap)
+    results = []
+    readers = [
+        threading.Thread(target=lambda: results.append(log.read(0, 2)))
+        for _ in range(2)
+    ]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    monkeypatch.undo()
+    assert results == [[_payload(0), _payload(1)]] * 2
+    assert len(maps) == 2
+    assert [data.closed for data in maps].count(True) == 1
+    assert sealed.data in maps and not sealed.data.closed
+    log.close()
+    assert all(data.closed for data in maps)